@@ -0,0 +1,257 @@
+# admission.py
+import asyncio
+import math
+import os
+import re
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional, Pattern, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+
+from auth import verify_token
+from filemeta.database import DB_POOL_SIZE, DB_MAX_OVERFLOW
+
+# Admission control for the API: every request belongs to an endpoint class ('cheap' or
+# 'expensive'). Per user and class, a token bucket limits the request rate and a gate
+# limits concurrent requests; per class, a global gate keeps concurrent requests below
+# what the database pool can serve. A request that cannot be admitted within
+# ADMISSION_QUEUE_TIMEOUT_SECONDS is rejected with 429 and Retry-After instead of
+# waiting for a pool connection. Limits apply per API worker process.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1").strip().lower() in ("1", "true", "yes", "on")
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "2"))
+
+def _class_limits(name: str, rate: float, burst: int, per_user: int, total: int) -> Dict[str, float]:
+    prefix = f"ADMISSION_{name.upper()}_"
+    return {
+        'rate': float(os.getenv(prefix + "RATE", str(rate))),              # requests per second per user
+        'burst': int(os.getenv(prefix + "BURST", str(burst))),             # bucket size per user
+        'per_user': int(os.getenv(prefix + "PER_USER", str(per_user))),    # concurrent requests per user
+        'total': int(os.getenv(prefix + "TOTAL", str(total))),             # concurrent requests overall
+    }
+
+# Expensive requests may use at most the pool's base size, leaving the overflow for cheap ones
+ENDPOINT_CLASS_LIMITS = {
+    'cheap': _class_limits('cheap', rate=50, burst=100, per_user=16, total=DB_POOL_SIZE + DB_MAX_OVERFLOW),
+    'expensive': _class_limits('expensive', rate=2, burst=5, per_user=2, total=max(DB_POOL_SIZE, 1)),
+}
+
+# Per-user state is dropped once this many users are tracked and a user's state is idle
+MAX_TRACKED_CLIENTS = 10000
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, with bursts of up to `burst`.
+    `clock` returns the current time in seconds (time.monotonic by default).
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def reserve(self, max_wait: float) -> float:
+        """
+        Takes a token, returning how long the caller must wait before using it.
+        Raises AdmissionRejected (without taking a token) if that exceeds max_wait.
+        """
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        if wait > max_wait:
+            raise AdmissionRejected('rate', wait)
+        self.tokens -= 1
+        return wait
+
+    def is_full(self) -> bool:
+        return self.tokens + (self.clock() - self.updated) * self.rate >= self.burst
+
+class ConcurrencyGate:
+    """Admits up to `limit` concurrent holders; others wait in FIFO order until their deadline."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self, deadline: float) -> bool:
+        """Returns True once admitted, or False if the deadline (loop time) passed first."""
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return True
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=max(0.0, deadline - loop.time()))
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release() # The slot was handed over just before the request was cancelled
+            raise
+        finally:
+            try:
+                self.waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self):
+        """Hands the slot to the next waiter, or frees it."""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def is_idle(self) -> bool:
+        return self.active == 0 and not self.waiters
+
+class AdmissionController:
+    """Classifies requests, applies the limits and keeps the admission metrics."""
+
+    def __init__(
+        self,
+        expensive_requests: Iterable[Tuple[str, str]],
+        exempt_paths: Iterable[str] = (),
+        limits: Dict[str, Dict[str, float]] = ENDPOINT_CLASS_LIMITS,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.expensive_requests: Tuple[Tuple[str, Pattern], ...] = tuple(
+            (method, re.compile(pattern + r"\Z")) for method, pattern in expensive_requests)
+        self.exempt_paths = frozenset(exempt_paths)
+        self.limits = limits
+        self.queue_timeout = queue_timeout
+        self.clock = clock # For the token buckets
+        self.total_gates = {name: ConcurrencyGate(int(limit['total'])) for name, limit in limits.items()}
+        self.clients: Dict[Tuple[str, str], Tuple[TokenBucket, ConcurrencyGate]] = {}
+        self.stats = {name: {'admitted': 0, 'queued': 0, 'queue_wait_seconds': 0.0,
+                             'rejected_rate': 0, 'rejected_user_concurrency': 0, 'rejected_total_concurrency': 0}
+                      for name in limits}
+
+    def classify(self, method: str, path: str) -> Optional[str]:
+        """Returns the endpoint class of a request, or None if it is not admission-controlled."""
+        if path in self.exempt_paths:
+            return None
+        for expensive_method, pattern in self.expensive_requests:
+            if method == expensive_method and pattern.match(path):
+                return 'expensive'
+        return 'cheap'
+
+    def _client_state(self, client: str, endpoint_class: str) -> Tuple[TokenBucket, ConcurrencyGate]:
+        key = (client, endpoint_class)
+        state = self.clients.get(key)
+        if state is None:
+            if len(self.clients) >= MAX_TRACKED_CLIENTS:
+                for idle_key in [k for k, (bucket, gate) in self.clients.items() if gate.is_idle() and bucket.is_full()]:
+                    del self.clients[idle_key]
+            limit = self.limits[endpoint_class]
+            state = self.clients[key] = (
+                TokenBucket(limit['rate'], int(limit['burst']), self.clock), ConcurrencyGate(int(limit['per_user'])))
+        return state
+
+    async def admit(self, client: str, endpoint_class: str):
+        """
+        Waits until the request may run and returns a release callback.
+        Raises AdmissionRejected if it cannot be admitted within the queue timeout.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.queue_timeout
+        stats = self.stats[endpoint_class]
+        bucket, user_gate = self._client_state(client, endpoint_class)
+        total_gate = self.total_gates[endpoint_class]
+
+        try:
+            wait = bucket.reserve(self.queue_timeout)
+        except AdmissionRejected:
+            stats['rejected_rate'] += 1
+            raise
+        if wait or user_gate.active >= user_gate.limit or total_gate.active >= total_gate.limit:
+            stats['queued'] += 1
+        if wait:
+            await asyncio.sleep(wait)
+        if not await user_gate.acquire(deadline):
+            stats['rejected_user_concurrency'] += 1
+            raise AdmissionRejected('user_concurrency', 1.0)
+        try:
+            admitted = await total_gate.acquire(deadline)
+        except asyncio.CancelledError:
+            user_gate.release()
+            raise
+        if not admitted:
+            user_gate.release()
+            stats['rejected_total_concurrency'] += 1
+            raise AdmissionRejected('total_concurrency', 1.0)
+        stats['admitted'] += 1
+        stats['queue_wait_seconds'] += loop.time() - started
+
+        def release():
+            total_gate.release()
+            user_gate.release()
+        return release
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per endpoint class: limits, requests in flight and queued, admissions and rejections."""
+        classes = {}
+        for name, stats in self.stats.items():
+            gate = self.total_gates[name]
+            classes[name] = {
+                'limits': dict(self.limits[name]),
+                'in_flight': gate.active,
+                'queue_depth': len(gate.waiters) + sum(
+                    len(user_gate.waiters) for (_, endpoint_class), (_, user_gate) in self.clients.items()
+                    if endpoint_class == name),
+                'admitted': stats['admitted'],
+                'queued': stats['queued'],
+                'avg_queue_wait_ms': round(1000 * stats['queue_wait_seconds'] / stats['admitted'], 3) if stats['admitted'] else None,
+                'rejected': {
+                    'rate': stats['rejected_rate'],
+                    'user_concurrency': stats['rejected_user_concurrency'],
+                    'total_concurrency': stats['rejected_total_concurrency'],
+                },
+            }
+        return {
+            'enabled': ADMISSION_ENABLED,
+            'queue_timeout_seconds': self.queue_timeout,
+            'tracked_clients': len(self.clients),
+            'classes': classes,
+        }
+
+def request_client(authorization: Optional[str], client_host: Optional[str]) -> str:
+    """
+    Identifies the caller for admission limits: the user in a valid bearer token,
+    otherwise the client address. The token is verified so a forged token cannot
+    use up another user's limits; verified tokens are cached (auth.token_cache).
+    """
+    if authorization and authorization.lower().startswith("bearer "):
+        try:
+            return f"user:{verify_token(authorization[7:]).username}"
+        except HTTPException:
+            pass
+    return f"address:{client_host or 'unknown'}"
+
+def rejection_response(rejected: AdmissionRejected, endpoint_class: str) -> JSONResponse:
+    retry_after = max(1, math.ceil(rejected.retry_after))
+    if rejected.reason == 'rate':
+        detail = f"Too many {endpoint_class} requests. Retry after {retry_after} seconds."
+    else:
+        detail = f"Too many concurrent {endpoint_class} requests. Retry after {retry_after} seconds."
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": detail},
+        headers={"Retry-After": str(retry_after)}
+    )
@@ -1,18 +1,34 @@
 # auth.py
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.orm import Session
 import os # Import os for SECRET_KEY
+import sys
+import threading
+import time
+import uuid
 
 from schemas import TokenData, User # Import Pydantic User model
+from filemeta.database import get_async_db
+from filemeta.models import User as UserRecord
+from filemeta.users import get_user_by_username, get_user_by_username_async
+from filemeta.tokens import revoke_token, unexpired_revocations_async
 
 # --- Configuration ---
 SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-key-that-should-be-random-and-long")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Verified tokens are cached per process, by token and until the token's exp, so repeated
+# requests with the same bearer token skip the signature check and the user lookup
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+# How often each process reloads the revoked tokens: a token revoked through another
+# process may still be accepted here for up to this long
+AUTH_REVOCATION_REFRESH_SECONDS = float(os.getenv("AUTH_REVOCATION_REFRESH_SECONDS", "5"))
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -20,10 +36,6 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2PasswordBearer for getting token from request headers
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# --- In-memory "User Database" (for demonstration purposes only) ---
-FAKE_USERS_DB: Dict[str, User] = {}
-
-
 # --- Password Hashing Functions ---
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies a plain password against a hashed password."""
@@ -34,13 +46,21 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 # --- User Authentication and Retrieval ---
-def get_user(db_users: Dict[str, User], username: str) -> Optional[User]:
-    """Retrieves a user from the in-memory database by username."""
-    return db_users.get(username)
+def user_from_record(record: UserRecord) -> User:
+    """Converts a users table row to the API's User model."""
+    return User(
+        id=record.id, username=record.username, hashed_password=record.hashed_password,
+        role="admin" if record.is_admin else "user"
+    )
+
+def get_user(db: Session, username: str) -> Optional[User]:
+    """Retrieves a user from the database by username."""
+    record = get_user_by_username(db, username)
+    return user_from_record(record) if record else None
 
-def authenticate_user(db_users: Dict[str, User], username: str, password: str) -> Optional[User]:
-    """Authenticates a user against the in-memory database."""
-    user = get_user(db_users, username)
+def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+    """Authenticates a user against the users table."""
+    user = get_user(db, username)
     if not user:
         return None
     if not verify_password(password, user.hashed_password):
@@ -58,15 +78,120 @@ def create_access_token(data: Dict[str, Union[str, int]], expires_delta: Optiona
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex}) # jti identifies the token for revocation
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str) -> TokenData:
+class _VerifiedToken:
+    """A token whose signature and claims have been checked, and the user it resolved to."""
+    __slots__ = ('token_data', 'expires', 'jti', 'user')
+
+    def __init__(self, token_data: TokenData, expires: Optional[float], jti: Optional[str]):
+        self.token_data = token_data
+        self.expires = expires # exp claim, seconds since the epoch
+        self.jti = jti
+        self.user: Optional[User] = None
+
+class VerifiedTokenCache:
     """
-    Verifies a JWT token and returns the decoded payload.
-    Raises HTTPException if token is invalid or expired.
+    Bounded LRU cache of verified tokens, each dropped at its exp, plus the IDs (jti) of
+    revoked tokens. Learning of a revocation removes the token's entry, so it is verified
+    again and rejected on its next use.
     """
+
+    def __init__(self, max_size: int = AUTH_TOKEN_CACHE_SIZE, refresh_interval: float = AUTH_REVOCATION_REFRESH_SECONDS):
+        self.max_size = max_size
+        self.refresh_interval = refresh_interval
+        self.entries: "OrderedDict[str, _VerifiedToken]" = OrderedDict()
+        self.tokens_by_jti: Dict[str, str] = {}
+        self.revoked: Dict[str, float] = {} # jti -> exp of the revoked token
+        self.refreshed_at: Optional[float] = None # Monotonic time of the last reload
+        self.lock = threading.Lock() # Sync endpoints verify tokens from the thread pool
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[_VerifiedToken]:
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is not None and entry.expires <= time.time():
+                self._remove(token, entry)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(token)
+            self.hits += 1
+            return entry
+
+    def put(self, token: str, entry: _VerifiedToken):
+        if self.max_size <= 0 or entry.expires is None: # Never cache a token that does not expire
+            return
+        with self.lock:
+            if entry.jti is not None:
+                if entry.jti in self.revoked:
+                    return
+                self.tokens_by_jti[entry.jti] = token
+            self.entries[token] = entry
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_size:
+                evicted_token, evicted = self.entries.popitem(last=False)
+                self._remove(evicted_token, evicted)
+                self.evictions += 1
+
+    def _remove(self, token: str, entry: _VerifiedToken):
+        self.entries.pop(token, None)
+        if entry.jti is not None and self.tokens_by_jti.get(entry.jti) == token:
+            del self.tokens_by_jti[entry.jti]
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        return jti is not None and jti in self.revoked
+
+    def add_revocations(self, revocations: Dict[str, float]):
+        """Adds revoked token IDs (jti -> exp) and drops their cached entries."""
+        now = time.time()
+        with self.lock:
+            self.revoked = {jti: expires for jti, expires in self.revoked.items() if expires > now}
+            for jti, expires in revocations.items():
+                self.revoked[jti] = expires
+                token = self.tokens_by_jti.pop(jti, None)
+                if token is not None:
+                    self.entries.pop(token, None)
+
+    async def refresh_revocations(self):
+        """Reloads the revoked tokens from the database once the last reload is refresh_interval old."""
+        now = time.monotonic()
+        if self.refreshed_at is not None and now - self.refreshed_at < self.refresh_interval:
+            return
+        self.refreshed_at = now # Concurrent requests use the current list meanwhile
+        try:
+            async with get_async_db() as db:
+                revocations = await unexpired_revocations_async(db)
+        except Exception as e:
+            print(f"WARNING: Could not reload revoked tokens, using the previous list: {e}", file=sys.stderr)
+            return
+        self.add_revocations({jti: expires_at.timestamp() for jti, expires_at in revocations.items()})
+
+    def metrics(self) -> Dict[str, Union[int, float, None]]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "revoked_tokens": len(self.revoked),
+            "revocations_age_seconds": round(time.monotonic() - self.refreshed_at, 3) if self.refreshed_at is not None else None,
+        }
+
+token_cache = VerifiedTokenCache()
+
+def _verified_token(token: str) -> _VerifiedToken:
+    """Returns the cached verification of a token, or verifies and caches it."""
+    entry = token_cache.get(token)
+    if entry is not None:
+        return entry
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -81,18 +206,48 @@ def verify_token(token: str) -> TokenData:
         token_data = TokenData(username=username, role=user_role)
     except JWTError:
         raise credentials_exception
-    return token_data
+    jti = payload.get("jti")
+    if token_cache.is_revoked(jti):
+        raise credentials_exception
+    expires = payload.get("exp")
+    entry = _VerifiedToken(token_data, float(expires) if expires is not None else None, jti)
+    token_cache.put(token, entry)
+    return entry
+
+def verify_token(token: str) -> TokenData:
+    """
+    Verifies a JWT token and returns the decoded payload.
+    Raises HTTPException if token is invalid, expired or revoked.
+    """
+    return _verified_token(token).token_data
+
+def revoke_access_token(db: Session, token: str):
+    """
+    Revokes a valid access token until it expires: at once in this process, and in the
+    other API processes within AUTH_REVOCATION_REFRESH_SECONDS.
+    Raises HTTPException if the token is invalid, and ValueError if it has no ID (jti).
+    """
+    entry = _verified_token(token)
+    if entry.jti is None or entry.expires is None:
+        raise ValueError("This token has no ID and cannot be revoked; it stays valid until it expires.")
+    revoke_token(db, entry.jti, entry.token_data.username, datetime.fromtimestamp(entry.expires, tz=timezone.utc))
+    token_cache.add_revocations({entry.jti: entry.expires})
 
 # --- FastAPI Dependencies for Authentication and Authorization ---
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     """
     Dependency to get the currently authenticated user based on the JWT token.
     """
-    token_data = verify_token(token)
-    user = get_user(FAKE_USERS_DB, token_data.username)
-    if user is None:
+    await token_cache.refresh_revocations()
+    entry = _verified_token(token)
+    if entry.user is not None: # Users cannot be deleted or change role, so the lookup is cached with the token
+        return entry.user
+    async with get_async_db() as db:
+        record = await get_user_by_username_async(db, entry.token_data.username)
+    if record is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
+    entry.user = user_from_record(record)
+    return entry.user
 
 async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
     """
@@ -1,7 +1,40 @@
 # dependencies.py
-from typing import Generator
+import hashlib
+import hmac
+from typing import AsyncGenerator, Generator, Optional
+from fastapi import Depends, Request
 from sqlalchemy.orm import Session
-from filemeta.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from filemeta.database import get_db, get_async_db
+from auth import get_current_user, SECRET_KEY
+from schemas import User
+
+# Read-your-writes marker: after a write, the client gets back (as a cookie and a response
+# header) the signed time until which its reads must stay on the primary. Sending it back,
+# as the cookie or the same header, keeps its reads off the replicas in every API worker
+# process without a database lookup.
+READ_YOUR_WRITES_COOKIE = "filemeta_primary_until"
+READ_YOUR_WRITES_HEADER = "X-Primary-Until"
+
+def _marker_signature(username: str, until: str) -> str:
+    return hmac.new(SECRET_KEY.encode(), f"{username}:{until}".encode(), hashlib.sha256).hexdigest()
+
+def sign_primary_until(username: str, primary_until: float) -> str:
+    """Returns the read-your-writes marker of `username` for `primary_until` (a time.time() value)."""
+    until = f"{primary_until:.3f}"
+    return f"{until}.{_marker_signature(username, until)}"
+
+def verify_primary_until(username: str, marker: Optional[str]) -> Optional[float]:
+    """The time in a marker from sign_primary_until(), or None if it is missing or not this user's."""
+    if not marker:
+        return None
+    until, _, signature = marker.rpartition(".")
+    if not until or not hmac.compare_digest(signature, _marker_signature(username, until)):
+        return None
+    try:
+        return float(until)
+    except ValueError:
+        return None
 
 def get_db_session() -> Generator[Session, None, None]:
     """
@@ -9,3 +42,26 @@ def get_db_session() -> Generator[Session, None, None]:
     """
     with get_db() as db:
         yield db
+
+async def get_async_db_session(request: Request, current_user: User = Depends(get_current_user)) -> AsyncGenerator[AsyncSession, None]:
+    """
+    FastAPI dependency that provides an async (asyncpg) SQLAlchemy session on the primary,
+    for endpoints whose queries should not block the event loop.
+    A commit on it keeps the user's following reads on the primary (read-your-writes); the
+    marker for other worker processes is left in request.state for the response.
+    """
+    def on_write(primary_until: float):
+        request.state.primary_until_marker = sign_primary_until(current_user.username, primary_until)
+
+    async with get_async_db(client=current_user.username, on_write=on_write) as db:
+        yield db
+
+async def get_async_read_db_session(request: Request, current_user: User = Depends(get_current_user)) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Like get_async_db_session, but for read-only endpoints: the session may be on a
+    read replica (DATABASE_READ_URLS) unless the user has just written.
+    """
+    marker = request.headers.get(READ_YOUR_WRITES_HEADER) or request.cookies.get(READ_YOUR_WRITES_COOKIE)
+    primary_until = verify_primary_until(current_user.username, marker)
+    async with get_async_db(read_only=True, client=current_user.username, primary_until=primary_until) as db:
+        yield db
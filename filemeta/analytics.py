@@ -0,0 +1,295 @@
+# filemeta/analytics.py
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import BigInteger, TIMESTAMP, func, select
+from sqlalchemy.orm import Session
+
+from .models import File
+from .metadata_manager import inferred_tag_column, SAVED_SEARCH_REFRESH_OVERLAP
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+GROUP_BY_OPTIONS = ('mime', 'owner')
+TOP_KEYS = ('size', 'mtime', 'atime')
+HISTOGRAM_SCALES = ('log', 'linear')
+
+# How long the shared snapshot is served before it is incrementally refreshed
+SNAPSHOT_MAX_AGE_SECONDS = 60
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("Analytics require NumPy. Install it with 'pip install numpy'.")
+
+def _epoch_column(field_name: str):
+    """Seconds since the epoch for an inferred_tags timestamp (NULL if missing)."""
+    return func.extract('epoch', inferred_tag_column(field_name).cast(TIMESTAMP))
+
+def _snapshot_statement():
+    return select(
+        File.id,
+        inferred_tag_column('file_size').cast(BigInteger).label('file_size'),
+        _epoch_column('last_modified_at').label('mtime'),
+        _epoch_column('last_accessed_at').label('atime'),
+        File.owner,
+        inferred_tag_column('mime_type').label('mime_type'),
+    ).order_by(File.id)
+
+class SnapshotColumns(NamedTuple):
+    """
+    One consistent version of the snapshot: read-only arrays of equal length and the
+    labels their codes index into. A refresh builds a new instance and swaps it in.
+    """
+    ids: Any
+    sizes: Any
+    mtimes: Any
+    atimes: Any
+    owner_codes: Any
+    mime_codes: Any
+    owners: Tuple[Optional[str], ...]
+    mime_types: Tuple[Optional[str], ...]
+    refreshed_at: Optional[datetime]
+
+class FileSnapshot:
+    """
+    Columnar in-memory copy of the fields analytics need, one NumPy array per column:
+
+        ids, sizes (-1 if unknown), mtimes and atimes (epoch seconds, NaN if unknown),
+        owner_codes and mime_codes (indexes into `owners` and `mime_types`).
+
+    refresh() re-reads only files whose updated_at changed since the last refresh,
+    plus the id column to drop deleted files, and merges them into new arrays.
+    The arrays are published together as one SnapshotColumns in a single assignment,
+    so computations running during a refresh keep using the version they started with.
+    """
+
+    def __init__(self):
+        _require_numpy()
+        self.columns = self._publish({
+            'ids': np.empty(0, dtype=np.int64),
+            'sizes': np.empty(0, dtype=np.int64),
+            'mtimes': np.empty(0, dtype=np.float64),
+            'atimes': np.empty(0, dtype=np.float64),
+            'owner_codes': np.empty(0, dtype=np.int32),
+            'mime_codes': np.empty(0, dtype=np.int32),
+        }, [], [], None)
+        # Labels only grow, so codes in published columns stay valid; used by refresh() only
+        self._owners: List[Optional[str]] = []
+        self._mime_types: List[Optional[str]] = []
+        self._owner_index: Dict[Optional[str], int] = {}
+        self._mime_index: Dict[Optional[str], int] = {}
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.columns.ids)
+
+    @property
+    def refreshed_at(self) -> Optional[datetime]:
+        return self.columns.refreshed_at
+
+    @staticmethod
+    def _publish(arrays: Dict[str, Any], owners: list, mime_types: list, refreshed_at: Optional[datetime]) -> SnapshotColumns:
+        for values in arrays.values():
+            values.setflags(write=False)
+        return SnapshotColumns(**arrays, owners=tuple(owners), mime_types=tuple(mime_types), refreshed_at=refreshed_at)
+
+    @staticmethod
+    def _encode(value, labels: list, index: Dict) -> int:
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(labels)
+            labels.append(value)
+        return code
+
+    def _load_columns(self, rows) -> Dict[str, Any]:
+        """Converts result rows into column arrays, dictionary-encoding owner and mime type."""
+        rows = list(rows)
+        return {
+            'ids': np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows)),
+            'sizes': np.fromiter(
+                (-1 if row.file_size is None else row.file_size for row in rows), dtype=np.int64, count=len(rows)),
+            'mtimes': np.fromiter(
+                (np.nan if row.mtime is None else row.mtime for row in rows), dtype=np.float64, count=len(rows)),
+            'atimes': np.fromiter(
+                (np.nan if row.atime is None else row.atime for row in rows), dtype=np.float64, count=len(rows)),
+            'owner_codes': np.fromiter(
+                (self._encode(row.owner, self._owners, self._owner_index) for row in rows), dtype=np.int32, count=len(rows)),
+            'mime_codes': np.fromiter(
+                (self._encode(row.mime_type, self._mime_types, self._mime_index) for row in rows), dtype=np.int32, count=len(rows)),
+        }
+
+    def refresh(self, db: Session) -> int:
+        """
+        Brings the snapshot up to date. The first call loads every file; later calls
+        only load files changed since the previous refresh. Returns the number of rows read.
+        """
+        with self._refresh_lock:
+            started_at = datetime.now()
+            current = self.columns
+            statement = _snapshot_statement()
+            if current.refreshed_at is not None:
+                statement = statement.where(File.updated_at >= current.refreshed_at - SAVED_SEARCH_REFRESH_OVERLAP)
+            changed = self._load_columns(db.execute(statement))
+
+            if current.refreshed_at is None:
+                arrays = changed
+            else:
+                current_ids = np.fromiter(db.execute(select(File.id)).scalars(), dtype=np.int64)
+                keep = np.isin(current.ids, current_ids) & ~np.isin(current.ids, changed['ids'])
+                merged = {name: np.concatenate((getattr(current, name)[keep], values)) for name, values in changed.items()}
+                order = np.argsort(merged['ids'], kind='stable')
+                arrays = {name: values[order] for name, values in merged.items()}
+
+            self.columns = self._publish(arrays, self._owners, self._mime_types, started_at)
+            return len(changed['ids'])
+
+    def info(self) -> Dict[str, Any]:
+        columns = self.columns
+        return {
+            'files': len(columns.ids),
+            'refreshed_at': columns.refreshed_at.isoformat() if columns.refreshed_at else None,
+        }
+
+    @staticmethod
+    def _groups(columns: SnapshotColumns, by: Optional[str]):
+        """Returns (codes, labels) for a group-by option; a single group when `by` is None."""
+        if by is None:
+            return np.zeros(len(columns.ids), dtype=np.int32), [None]
+        if by == 'mime':
+            return columns.mime_codes, columns.mime_types
+        if by == 'owner':
+            return columns.owner_codes, columns.owners
+        raise ValueError(f"Unknown grouping '{by}'. Expected one of: {', '.join(GROUP_BY_OPTIONS)}.")
+
+    def size_histogram(self, bins: int = 20, by: Optional[str] = None, scale: str = 'log') -> Dict[str, Any]:
+        """
+        Counts files and bytes per file-size bucket, optionally per mime type or owner.
+        'log' buckets are geometric (with a first [0, 1) bucket for empty files).
+        """
+        if bins <= 0:
+            raise ValueError("Number of bins must be a positive integer.")
+        if scale not in HISTOGRAM_SCALES:
+            raise ValueError(f"Unknown scale '{scale}'. Expected one of: {', '.join(HISTOGRAM_SCALES)}.")
+        columns = self.columns
+        codes, labels = self._groups(columns, by)
+
+        known = columns.sizes >= 0
+        sizes, codes = columns.sizes[known], codes[known]
+        max_size = float(sizes.max()) if len(sizes) else 0.0
+        if scale == 'log':
+            edges = np.concatenate(([0.0], np.geomspace(1.0, max_size + 1.0, bins)))
+        else:
+            edges = np.linspace(0.0, max_size + 1.0, bins + 1)
+        buckets = np.clip(np.searchsorted(edges, sizes, side='right') - 1, 0, len(edges) - 2)
+
+        counts = np.zeros((len(labels), len(edges) - 1), dtype=np.int64)
+        total_bytes = np.zeros_like(counts)
+        np.add.at(counts, (codes, buckets), 1)
+        np.add.at(total_bytes, (codes, buckets), sizes)
+
+        groups = []
+        for code in np.flatnonzero(counts.sum(axis=1)):
+            groups.append({
+                'group': labels[code],
+                'counts': counts[code].tolist(),
+                'bytes': total_bytes[code].tolist(),
+            })
+        return {'by': by, 'scale': scale, 'edges': edges.tolist(), 'groups': groups}
+
+    def size_percentiles(self, percentiles: Sequence[float] = (50, 90, 99), by: Optional[str] = None) -> Dict[str, Any]:
+        """Computes file-size percentiles, optionally per mime type or owner."""
+        percentiles = list(percentiles)
+        if not percentiles or any(p < 0 or p > 100 for p in percentiles):
+            raise ValueError("Percentiles must be between 0 and 100.")
+        columns = self.columns
+        codes, labels = self._groups(columns, by)
+
+        known = columns.sizes >= 0
+        sizes, codes = columns.sizes[known], codes[known]
+        order = np.lexsort((sizes, codes))
+        sizes, codes = sizes[order], codes[order]
+        boundaries = np.flatnonzero(np.diff(codes)) + 1
+
+        groups = []
+        for group_codes, group_sizes in zip(np.split(codes, boundaries), np.split(sizes, boundaries)):
+            if not len(group_sizes):
+                continue
+            groups.append({
+                'group': labels[group_codes[0]],
+                'files': int(len(group_sizes)),
+                'bytes': int(group_sizes.sum()),
+                'percentiles': dict(zip(
+                    (f"{p:g}" for p in percentiles),
+                    np.percentile(group_sizes, percentiles).tolist()
+                )),
+            })
+        return {'by': by, 'groups': groups}
+
+    def top_files(self, k: int = 100, by: Optional[str] = None, key: str = 'size') -> Dict[str, Any]:
+        """Returns the k files with the largest size (or latest mtime/atime), optionally per group."""
+        if k <= 0:
+            raise ValueError("k must be a positive integer.")
+        if key not in TOP_KEYS:
+            raise ValueError(f"Unknown key '{key}'. Expected one of: {', '.join(TOP_KEYS)}.")
+        columns = self.columns
+        codes, labels = self._groups(columns, by)
+        values = {'size': columns.sizes, 'mtime': columns.mtimes, 'atime': columns.atimes}[key]
+
+        known = (values >= 0) if key == 'size' else ~np.isnan(values)
+        positions = np.flatnonzero(known)
+        if by is None:
+            if len(positions) > k:
+                positions = positions[np.argpartition(-values[positions], k - 1)[:k]]
+            positions = positions[np.argsort(-values[positions], kind='stable')]
+        else:
+            # Sort by group, then value descending, and keep the first k of each group
+            positions = positions[np.lexsort((-values[positions], codes[positions]))]
+            sorted_codes = codes[positions]
+            group_starts = np.flatnonzero(np.r_[True, np.diff(sorted_codes) != 0])
+            group_lengths = np.diff(np.r_[group_starts, len(positions)])
+            rank = np.arange(len(positions)) - np.repeat(group_starts, group_lengths)
+            positions = positions[rank < k]
+
+        files = []
+        for position in positions:
+            value = values[position]
+            if key == 'size':
+                value = int(value)
+            else:
+                value = datetime.fromtimestamp(float(value), tz=timezone.utc).isoformat()
+            files.append({'id': int(columns.ids[position]), 'group': labels[codes[position]], key: value})
+        return {'by': by, 'key': key, 'files': files}
+
+_shared_snapshot: Optional[FileSnapshot] = None
+_shared_snapshot_checked_at = 0.0
+_shared_snapshot_lock = threading.Lock()
+
+def get_snapshot(db: Session, max_age: float = SNAPSHOT_MAX_AGE_SECONDS, refresh: bool = False) -> FileSnapshot:
+    """
+    Returns the process-wide snapshot, loading it on first use and incrementally
+    refreshing it when it is older than `max_age` seconds (or when `refresh` is True).
+    """
+    global _shared_snapshot, _shared_snapshot_checked_at
+    with _shared_snapshot_lock:
+        if _shared_snapshot is None:
+            _shared_snapshot = FileSnapshot()
+            refresh = True
+        if refresh or time.monotonic() - _shared_snapshot_checked_at > max_age:
+            _shared_snapshot.refresh(db)
+            _shared_snapshot_checked_at = time.monotonic()
+        return _shared_snapshot
+
+def attach_filepaths(db: Session, files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Adds each file's current filepath to top_files() results, in one query."""
+    ids = [entry['id'] for entry in files]
+    if not ids:
+        return files
+    filepaths = dict(db.execute(select(File.id, File.filepath).where(File.id.in_(ids))).all())
+    for entry in files:
+        entry['filepath'] = filepaths.get(entry['id'])
+    return files
@@ -0,0 +1,249 @@
+# filemeta/changes.py
+import asyncio
+import json
+import os
+import sys
+from datetime import timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from .database import ASYNC_DATABASE_URL, get_async_db
+from .models import FileChange
+
+# Change feed: every write in metadata_manager adds FileChange rows (the outbox) and a
+# NOTIFY in its own transaction. Each API process keeps one LISTEN connection; on a
+# notification it reads the new rows once and fans them out to its /changes subscribers.
+CHANGE_CHANNEL = "file_changes"
+CHANGE_OPS = ('create', 'update', 'rename', 'delete')
+# Events are deleted after this many days; consumers resuming from older sequence numbers
+# get a 'reset' event and must resynchronize from /files/
+CHANGE_FEED_RETENTION_DAYS = float(os.getenv("CHANGE_FEED_RETENTION_DAYS", "7"))
+# Sequence numbers are taken at insert time, so a transaction that commits late can leave
+# a temporary gap. Delivery waits this long for a gap to fill before assuming a rollback.
+CHANGE_FEED_GAP_TIMEOUT_SECONDS = float(os.getenv("CHANGE_FEED_GAP_TIMEOUT_SECONDS", "5"))
+# Events buffered per subscriber; a subscriber that falls further behind is disconnected
+# (with an 'overflow' event) and can resume from its last sequence number
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "1000"))
+# The outbox is also polled this often, in case a notification was missed while reconnecting
+CHANGE_FEED_POLL_SECONDS = 5.0
+CHANGE_FEED_HEARTBEAT_SECONDS = 15.0
+CHANGE_FEED_BATCH_SIZE = 500
+CHANGE_FEED_CLEANUP_INTERVAL_SECONDS = 3600.0
+
+NOTIFY_CHANGES = text(f"SELECT pg_notify('{CHANGE_CHANNEL}', '')")
+
+# --- Publishing (runs inside the writer's transaction) ---
+
+def record_file_changes(db: Session, changes: List[Dict[str, Any]]):
+    """
+    Adds change-feed events to the current transaction: dicts with 'op', 'file_id',
+    'filepath' and optionally 'changed_fields'. Subscribers are notified when it commits;
+    a rollback discards the events and the notification.
+    """
+    if not changes:
+        return
+    db.execute(FileChange.__table__.insert(), [
+        {'op': change['op'], 'file_id': change['file_id'], 'filepath': change.get('filepath'),
+         'changed_fields': change.get('changed_fields')}
+        for change in changes
+    ])
+    notify_file_changes(db)
+
+def record_file_change(db: Session, op: str, file_id: int, filepath: Optional[str], changed_fields: Optional[List[str]] = None):
+    """Adds one change-feed event to the current transaction."""
+    record_file_changes(db, [{'op': op, 'file_id': file_id, 'filepath': filepath, 'changed_fields': changed_fields}])
+
+def notify_file_changes(db: Session):
+    """Notifies listeners on commit; notifications within one transaction are merged."""
+    db.execute(NOTIFY_CHANGES)
+
+# --- Fan-out to subscribers (API process) ---
+
+def _listen_dsn() -> str:
+    """asyncpg DSN for the LISTEN connection, from ASYNC_DATABASE_URL."""
+    return make_url(ASYNC_DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+
+def _sse_event(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+class _Subscription:
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=CHANGE_FEED_QUEUE_SIZE)
+        self.overflowed = False
+
+class ChangeFeed:
+    """Per-process hub: one LISTEN connection and one outbox reader shared by all subscribers."""
+
+    def __init__(self):
+        self.subscribers: Set[_Subscription] = set()
+        self.cursor: Optional[int] = None # Highest sequence number delivered (or skipped as a gap)
+        self.gap_since: Optional[float] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.listener = None
+        self.task: Optional[asyncio.Task] = None
+        self.start_lock = asyncio.Lock()
+        self.last_cleanup = 0.0
+        self.delivered = 0
+        self.gaps_skipped = 0
+
+    async def _start(self):
+        """Starts the hub on the first subscription, from the current end of the outbox."""
+        async with self.start_lock:
+            if self.task is not None:
+                return
+            self.wakeup = asyncio.Event()
+            async with get_async_db() as db:
+                self.cursor = (await db.execute(select(func.coalesce(func.max(FileChange.seq), 0)))).scalar()
+            self.task = asyncio.create_task(self._run())
+
+    async def _connect_listener(self):
+        import asyncpg # Installed with the API's async driver
+        try:
+            self.listener = await asyncpg.connect(_listen_dsn())
+            await self.listener.add_listener(CHANGE_CHANNEL, lambda *args: self.wakeup.set())
+        except Exception as e:
+            self.listener = None
+            print(f"WARNING: Change feed could not LISTEN, polling every {CHANGE_FEED_POLL_SECONDS:g}s: {e}", file=sys.stderr)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        retry_soon = False
+        while True:
+            if self.listener is None or self.listener.is_closed():
+                await self._connect_listener()
+                retry_soon = True # Catch up on anything committed while not listening
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=0.2 if retry_soon else CHANGE_FEED_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                retry_soon = await self._deliver_new_events()
+                if loop.time() - self.last_cleanup > CHANGE_FEED_CLEANUP_INTERVAL_SECONDS:
+                    self.last_cleanup = loop.time()
+                    await self._delete_expired_events()
+            except Exception as e:
+                print(f"WARNING: Change feed could not read new events: {e}", file=sys.stderr)
+                retry_soon = False
+
+    async def _deliver_new_events(self) -> bool:
+        """Publishes events after the cursor in order. Returns True if a gap is being waited on."""
+        loop = asyncio.get_running_loop()
+        while True:
+            async with get_async_db() as db:
+                events = (await db.execute(
+                    select(FileChange).where(FileChange.seq > self.cursor)
+                    .order_by(FileChange.seq).limit(CHANGE_FEED_BATCH_SIZE)
+                )).scalars().all()
+            for event in events:
+                if event.seq != self.cursor + 1:
+                    if self.gap_since is None:
+                        self.gap_since = loop.time()
+                    if loop.time() - self.gap_since < CHANGE_FEED_GAP_TIMEOUT_SECONDS:
+                        return True
+                    self.gaps_skipped += 1
+                self.gap_since = None
+                self._publish(event.to_dict())
+                self.cursor = event.seq
+            if len(events) < CHANGE_FEED_BATCH_SIZE:
+                return False
+
+    def _publish(self, event: Dict[str, Any]):
+        self.delivered += 1
+        for subscription in list(self.subscribers):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+                self.subscribers.discard(subscription)
+
+    async def _delete_expired_events(self):
+        async with get_async_db() as db:
+            await db.execute(delete(FileChange).where(
+                FileChange.changed_at < func.now() - timedelta(days=CHANGE_FEED_RETENTION_DAYS)))
+            await db.commit()
+
+    async def _replay(self, after: int, up_to: int) -> AsyncIterator[Dict[str, Any]]:
+        """Events with after < seq <= up_to from the outbox, in batches."""
+        while after < up_to:
+            async with get_async_db() as db:
+                events = (await db.execute(
+                    select(FileChange).where(FileChange.seq > after, FileChange.seq <= up_to)
+                    .order_by(FileChange.seq).limit(CHANGE_FEED_BATCH_SIZE)
+                )).scalars().all()
+            if not events:
+                return
+            for event in events:
+                yield event.to_dict()
+            after = events[-1].seq
+
+    async def _oldest_seq(self) -> Optional[int]:
+        async with get_async_db() as db:
+            return (await db.execute(select(func.min(FileChange.seq)))).scalar()
+
+    async def stream(self, since: Optional[int], is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[str]:
+        """
+        Yields Server-Sent Events: 'change' events (id = sequence number) after `since`
+        (replayed from the outbox) and then live, until the client disconnects. Without
+        `since`, only changes from now on are sent.
+        """
+        await self._start()
+        subscription = _Subscription()
+        self.subscribers.add(subscription)
+        up_to = self.cursor # Later events arrive through the subscription queue
+        try:
+            last_sent = up_to if since is None else since
+            if since is not None and since < up_to:
+                oldest = await self._oldest_seq()
+                if oldest is not None and since < oldest - 1:
+                    yield _sse_event("reset", {"requested_since": since, "oldest_seq": oldest})
+                async for event in self._replay(since, up_to):
+                    yield _sse_event("change", event, event["seq"])
+                    last_sent = event["seq"]
+            yield _sse_event("ready", {"seq": max(last_sent, up_to)})
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=CHANGE_FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if event["seq"] > last_sent:
+                    yield _sse_event("change", event, event["seq"])
+                    last_sent = event["seq"]
+                if subscription.overflowed and subscription.queue.empty():
+                    yield _sse_event("overflow", {"resume_from": last_sent})
+                    return
+        finally:
+            self.subscribers.discard(subscription)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "running": self.task is not None,
+            "listening": self.listener is not None and not self.listener.is_closed(),
+            "subscribers": len(self.subscribers),
+            "cursor": self.cursor,
+            "delivered": self.delivered,
+            "gaps_skipped": self.gaps_skipped,
+        }
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.listener is not None and not self.listener.is_closed():
+            await self.listener.close()
+        self.listener = None
+
+change_feed = ChangeFeed()
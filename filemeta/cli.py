@@ -5,28 +5,71 @@
 import click
 import sys
 import json
+import shutil
 from datetime import datetime, timedelta
 import logging # Import the logging module
 
 # Configure logging to suppress SQLAlchemy INFO messages
 logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
 
-from filemeta.database import get_db
+from filemeta.database import get_db, find_duplicate_tags
 from filemeta.metadata_manager import (
     init_db,
     add_file_metadata,
-    list_files,
-    get_file_metadata,
-    search_files_by_criteria, # Use the new comprehensive search function
+    list_file_records,
+    get_file_record,
+    get_file_records,
+    search_file_records,
+    count_files_by_criteria,
+    files_exist_by_criteria,
+    find_files_by_name,
+    create_saved_search,
+    list_saved_searches,
+    refresh_saved_search,
+    list_saved_search_files,
+    delete_saved_search,
+    get_storage_usage,
+    rebuild_storage_rollups,
+    ROLLUP_DIMENSIONS,
     update_file_tags,
+    dedupe_tags,
     delete_file_metadata,
     rename_file_entry,
     list_and_search_tags,
     validate_file_metadata
 )
-from filemeta.utils import parse_tag_value, convert_human_readable_to_bytes, parse_date_string
+from filemeta.exports import (
+    EXPORT_FORMATS,
+    detect_export_format,
+    open_export_file,
+    count_export_records,
+    write_export,
+    import_export_file
+)
+from filemeta.analytics import GROUP_BY_OPTIONS, TOP_KEYS, HISTOGRAM_SCALES, get_snapshot, attach_filepaths
+from filemeta.jobs import JOB_KINDS, JOB_STATUSES, submit_job, get_job, list_jobs, cancel_job, run_worker
+from filemeta.server import (
+    serve, SERVE_WORKERS, SERVE_MAX_REQUESTS, SERVE_MAX_REQUESTS_JITTER, SERVE_GRACEFUL_TIMEOUT, SERVE_WORKER_TIMEOUT
+)
+from filemeta.utils import parse_tag_value, convert_human_readable_to_bytes, parse_date_string, parse_field_list
 from sqlalchemy.exc import OperationalError, NoResultFound, IntegrityError
 
+FIELDS_OPTION_HELP = ('Comma-separated list of fields to display (e.g., "id,filename,filepath"). '
+                      'Valid fields: id, filename, filepath, owner, created_by, created_at, updated_at, '
+                      'inferred_tags, custom_tags.')
+
+def _echo_file_fields(file_data):
+    """Prints each field of a (possibly projected) file dictionary on its own line."""
+    for key, value in file_data.items():
+        if isinstance(value, dict):
+            click.echo(f"   {key}:")
+            if value:
+                click.echo(json.dumps(value, indent=2, ensure_ascii=False))
+            else:
+                click.echo("     (None)")
+        else:
+            click.echo(f"   {key}: {value}")
+
 @click.group()
 def cli():
     """A CLI tool for managing server file metadata."""
@@ -41,6 +84,9 @@ def init():
     except OperationalError as e:
         click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
         sys.exit(1)
+    except ValueError as e: # Existing rows block a new unique index
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
     except Exception as e:
         click.echo(f"An unexpected error occurred during database initialization: {e}", err=True)
         sys.exit(1)
@@ -78,39 +124,65 @@ def add(filepath, tag):
             click.echo(f"An unexpected error occurred while adding metadata: {e}", err=True)
             sys.exit(1)
 
+def _echo_file_record(file_record, requested_fields=None):
+    """Prints one file record: the requested fields, or the full metadata layout."""
+    click.echo(f"--- Metadata for File ID: {file_record.id} ---")
+    if requested_fields:
+        _echo_file_fields(file_record.to_dict(requested_fields))
+        click.echo("-" * 40)
+        return
+
+    file_data = file_record.to_dict()
+
+    click.echo(f"   Filename: {file_data['Filename']}")
+    click.echo(f"   Filepath: {file_data['Filepath']}")
+    click.echo(f"   Owner: {file_data['Owner']}")
+    click.echo(f"   Created By: {file_data['Created By']}")
+    click.echo(f"   Created At: {file_data['Created At']}")
+    click.echo(f"   Updated At: {file_data['Updated At']}")
+
+    click.echo("   Inferred Tags:")
+    click.echo(json.dumps(file_data['Inferred Tags'], indent=2, ensure_ascii=False))
+
+    click.echo("   Custom Tags:")
+    if file_data['Custom Tags']:
+        click.echo(json.dumps(file_data['Custom Tags'], indent=2, ensure_ascii=False))
+    else:
+        click.echo("     (None)")
+    click.echo("-" * 40)
+
 @cli.command()
-@click.argument('file_id', type=int)
-def get(file_id):
+@click.argument('file_ids', type=int, nargs=-1, required=True)
+@click.option('--fields', help=FIELDS_OPTION_HELP)
+def get(file_ids, fields):
     """
-    Retrieves and displays the full metadata for a single file by its ID.
+    Retrieves and displays the full metadata for one or more files by ID.
+    Several IDs are fetched in a single query and shown in the order given.
+    Use --fields to display only a subset of the metadata.
     """
     with get_db() as db:
         try:
-            file_record = get_file_metadata(db, file_id)
-
-            click.echo(f"--- Metadata for File ID: {file_record.id} ---")
-            file_data = file_record.to_dict()
-
-            click.echo(f"   Filename: {file_data['Filename']}")
-            click.echo(f"   Filepath: {file_data['Filepath']}")
-            click.echo(f"   Owner: {file_data['Owner']}")
-            click.echo(f"   Created By: {file_data['Created By']}")
-            click.echo(f"   Created At: {file_data['Created At']}")
-            click.echo(f"   Updated At: {file_data['Updated At']}")
-
-            click.echo("   Inferred Tags:")
-            click.echo(json.dumps(file_data['Inferred Tags'], indent=2, ensure_ascii=False))
+            requested_fields = parse_field_list(fields)
+            if len(file_ids) == 1:
+                _echo_file_record(get_file_record(db, file_ids[0], fields=requested_fields), requested_fields)
+                return
 
-            click.echo("   Custom Tags:")
-            if file_data['Custom Tags']:
-                click.echo(json.dumps(file_data['Custom Tags'], indent=2, ensure_ascii=False))
-            else:
-                click.echo("     (None)")
-            click.echo("-" * 40)
+            missing = False
+            for file_id, file_record in zip(file_ids, get_file_records(db, file_ids, fields=requested_fields)):
+                if file_record is None:
+                    click.echo(f"Error: No metadata found for file ID: {file_id}", err=True)
+                    missing = True
+                    continue
+                _echo_file_record(file_record, requested_fields)
+            if missing:
+                sys.exit(1)
 
         except NoResultFound as e:
             click.echo(f"Error: {e}", err=True)
             sys.exit(1)
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
         except OperationalError as e:
             click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
             sys.exit(1)
@@ -118,33 +190,36 @@ def get(file_id):
             click.echo(f"An unexpected error occurred while retrieving metadata: {e}", err=True)
             sys.exit(1)
 
-@cli.command()
-@click.option('-k', '--keywords', multiple=True, help='Keywords to search for in file metadata (filename, path, owner, tags).')
-@click.option('--size-gt', type=str, help='Search for files larger than the specified size (e.g., "10MB", "1GB").')
-@click.option('--size-lt', type=str, help='Search for files smaller than the specified size (e.g., "100KB", "1GB").')
-@click.option('--size-between', nargs=2, type=str, help='Search for files within a size range (e.g., "100KB 1MB"). Requires two values.')
-# --- NEW: Date/Time Search Options ---
-@click.option('--created-after', type=str, help="Search for files created after this date/time (e.g., '2024-01-01' or '2024-06-11 10:00:00').")
-@click.option('--created-before', type=str, help="Search for files created before this date/time.")
-@click.option('--modified-after', type=str, help="Search for files modified after this date/time.")
-@click.option('--modified-before', type=str, help="Search for files modified before this date/time.")
-@click.option('--accessed-after', type=str, help="Search for files last accessed after this date/time.")
-@click.option('--accessed-before', type=str, help="Search for files last accessed before this date/time.")
-@click.option('--created-between', nargs=2, type=str, help="Search for files created within this date/time range (e.g., '2024-01-01' '2024-03-31').")
-@click.option('--modified-between', nargs=2, type=str, help="Search for files modified within this date/time range.")
-@click.option('--accessed-between', nargs=2, type=str, help="Search for files last accessed within this date/time range.")
-# --- END NEW DATE/TIME OPTIONS ---
-@click.option('--full', '-f', is_flag=True, help='Display full detailed metadata for each matching file.')
-def search(
+def search_criteria_options(command):
+    """Adds the shared search criteria options (keywords, size and date/time ranges) to a command."""
+    options = [
+        click.option('-k', '--keywords', multiple=True, help='Keywords to search for in file metadata (filename, path, owner, tags).'),
+        click.option('--size-gt', type=str, help='Search for files larger than the specified size (e.g., "10MB", "1GB").'),
+        click.option('--size-lt', type=str, help='Search for files smaller than the specified size (e.g., "100KB", "1GB").'),
+        click.option('--size-between', nargs=2, type=str, help='Search for files within a size range (e.g., "100KB 1MB"). Requires two values.'),
+        click.option('--created-after', type=str, help="Search for files created after this date/time (e.g., '2024-01-01' or '2024-06-11 10:00:00')."),
+        click.option('--created-before', type=str, help="Search for files created before this date/time."),
+        click.option('--modified-after', type=str, help="Search for files modified after this date/time."),
+        click.option('--modified-before', type=str, help="Search for files modified before this date/time."),
+        click.option('--accessed-after', type=str, help="Search for files last accessed after this date/time."),
+        click.option('--accessed-before', type=str, help="Search for files last accessed before this date/time."),
+        click.option('--created-between', nargs=2, type=str, help="Search for files created within this date/time range (e.g., '2024-01-01' '2024-03-31')."),
+        click.option('--modified-between', nargs=2, type=str, help="Search for files modified within this date/time range."),
+        click.option('--accessed-between', nargs=2, type=str, help="Search for files last accessed within this date/time range."),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+def _build_search_criteria(
     keywords, size_gt, size_lt, size_between,
     created_after, created_before, modified_after, modified_before,
     accessed_after, accessed_before,
-    created_between, modified_between, accessed_between,
-    full # Added full parameter to the function signature
+    created_between, modified_between, accessed_between
 ):
     """
-    Search for file metadata based on keywords, size, and date/time ranges.
-    Date formats: 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'.
+    Parses the shared search criteria options into keyword arguments for
+    search_files_by_criteria. Exits with an error message on invalid input.
     """
     # Check if any search criterion is provided
     if not any([
@@ -219,21 +294,60 @@ def search(
         click.echo(f"Error parsing date value: {e}", err=True)
         sys.exit(1)
 
+    return dict(
+        keywords=list(keywords) if keywords else None,
+        min_size_bytes=min_size_bytes,
+        max_size_bytes=max_size_bytes,
+        created_after=parsed_created_after,
+        created_before=parsed_created_before,
+        modified_after=parsed_modified_after,
+        modified_before=parsed_modified_before,
+        accessed_after=parsed_accessed_after,
+        accessed_before=parsed_accessed_before
+    )
+
+@cli.command()
+@search_criteria_options
+@click.option('--full', '-f', is_flag=True, help='Display full detailed metadata for each matching file.')
+@click.option('--count', 'count_only', is_flag=True, help='Only print the number of matching files.')
+@click.option('--exists', 'exists_only', is_flag=True, help='Only report whether any file matches (exit status 1 if none).')
+@click.option('--approximate', is_flag=True, help='With --count, use the database planner estimate for very large result sets.')
+@click.option('--fields', help=FIELDS_OPTION_HELP)
+def search(
+    full, # Added full parameter to the function signature
+    count_only, exists_only, approximate, fields,
+    **criteria_options
+):
+    """
+    Search for file metadata based on keywords, size, and date/time ranges.
+    Date formats: 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'.
+    """
+    if count_only and exists_only:
+        click.echo("Error: Cannot use --count and --exists together.", err=True)
+        sys.exit(1)
+    if approximate and not count_only:
+        click.echo("Error: --approximate can only be used with --count.", err=True)
+        sys.exit(1)
+
+    search_criteria = _build_search_criteria(**criteria_options)
+
     with get_db() as db:
         try:
+            if count_only:
+                count, is_estimate = count_files_by_criteria(db, approximate=approximate, **search_criteria)
+                click.echo(f"~{count}" if is_estimate else str(count))
+                return
+
+            if exists_only:
+                if files_exist_by_criteria(db, **search_criteria):
+                    click.echo("Matching files exist.")
+                    return
+                click.echo("No files found matching the criteria.")
+                sys.exit(1)
+
             # Call the comprehensive search function from metadata_manager
-            files = search_files_by_criteria(
-                db=db,
-                keywords=list(keywords) if keywords else None,
-                min_size_bytes=min_size_bytes,
-                max_size_bytes=max_size_bytes,
-                created_after=parsed_created_after,
-                created_before=parsed_created_before,
-                modified_after=parsed_modified_after,
-                modified_before=parsed_modified_before,
-                accessed_after=parsed_accessed_after,
-                accessed_before=parsed_accessed_before
-            )
+            requested_fields = parse_field_list(fields)
+            files = search_file_records(db, fields=requested_fields, **search_criteria)
 
             if not files:
                 click.echo("No files found matching the criteria.")
@@ -241,6 +355,11 @@ def search(
 
             click.echo("Found files:")
             for file_record in files:
+                if requested_fields:
+                    click.echo("-" * 40)
+                    _echo_file_fields(file_record.to_dict(requested_fields))
+                    continue
+
                 file_data = file_record.to_dict()
                 click.echo("-" * 40)
                 click.echo(f"   ID: {file_data.get('ID')}")
@@ -266,6 +385,9 @@ def search(
                         click.echo("     (None)")
             click.echo("-" * 40)
 
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
         except OperationalError as e:
             click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
             sys.exit(1)
@@ -273,6 +395,42 @@ def search(
             click.echo(f"An unexpected error occurred during search: {e}", err=True)
             sys.exit(1)
 
+@cli.command()
+@click.argument('name')
+@click.option('--limit', '-n', type=int, default=20, show_default=True, help='Maximum number of matches to return.')
+@click.option('--min-similarity', type=click.FloatRange(0, 1), default=0.3, show_default=True,
+              help='Minimum trigram similarity (0-1) for fuzzy matches.')
+@click.option('--fields', help=FIELDS_OPTION_HELP)
+def find(name, limit, min_similarity, fields):
+    """
+    Finds files by filename, tolerating typos.
+    Prefix matches are listed first, followed by the most similar filenames.
+    """
+    with get_db() as db:
+        try:
+            requested_fields = parse_field_list(fields) or ['id', 'filename', 'filepath']
+            matches = find_files_by_name(db, name, limit=limit, min_similarity=min_similarity, fields=requested_fields)
+            if not matches:
+                click.echo(f"No files found matching '{name}'.")
+                return
+
+            click.echo("Found files:")
+            for file_record, score in matches:
+                click.echo("-" * 40)
+                click.echo(f"   Score: {score:.2f}")
+                _echo_file_fields(file_record.to_dict(requested_fields))
+            click.echo("-" * 40)
+
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred during find: {e}", err=True)
+            sys.exit(1)
+
 @cli.command()
 @click.argument('file_id', type=int)
 @click.option('--tag', '-t', 'tags_to_add_modify', multiple=True,
@@ -360,20 +518,31 @@ def delete(file_id):
 
 @cli.command(name='list')
 @click.option('--summary', '-s', is_flag=True, help='Display only file ID, filename, and filepath.')
-def list_files_cli(summary):
+@click.option('--fields', help=FIELDS_OPTION_HELP)
+def list_files_cli(summary, fields):
     """
     Displays all file metadata records currently stored in the database.
-    Use --summary for a concise list of just filenames and paths.
+    Use --summary for a concise list of just filenames and paths,
+    or --fields to choose exactly which fields are loaded and displayed.
     """
+    if summary and not fields:
+        fields = 'id,filename,filepath'
+
     with get_db() as db:
         try:
-            files = list_files(db)
+            requested_fields = parse_field_list(fields)
+            files = list_file_records(db, fields=requested_fields)
             if not files:
                 click.echo("No file metadata records found.")
                 return
 
             click.echo("Found files:")
             for file_record in files:
+                if requested_fields:
+                    click.echo("-" * 40)
+                    _echo_file_fields(file_record.to_dict(requested_fields))
+                    continue
+
                 file_data = file_record.to_dict()
                 click.echo("-" * 40)
                 click.echo(f"   ID: {file_data['ID']}")
@@ -396,6 +565,9 @@ def list_files_cli(summary):
                         click.echo("     (None)")
             click.echo("-" * 40)
 
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
         except OperationalError as e:
             click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
             sys.exit(1)
@@ -405,23 +577,31 @@ def list_files_cli(summary):
 
 @cli.command()
 @click.argument('output_filepath', type=click.Path(dir_okay=False, writable=True))
-def export(output_filepath):
+@click.option('--format', 'export_format', type=click.Choice(EXPORT_FORMATS, case_sensitive=False),
+              help='Output format. Defaults to the file extension (.json, .ndjson, .csv), or json.')
+@click.option('--gzip', 'compress', is_flag=True,
+              help='Gzip-compress the output. Implied by a .gz file extension.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=1000, show_default=True,
+              help='Number of records read from the database and written per batch.')
+def export(output_filepath, export_format, compress, batch_size):
     """
-    Exports all file metadata records to a specified JSON file.
+    Exports all file metadata records to a JSON, NDJSON or CSV file.
+    Records are streamed in batches, so memory use stays constant for large exports.
     """
+    export_format = (export_format or detect_export_format(output_filepath)).lower()
     with get_db() as db:
         try:
-            files = list_files(db)
-            if not files:
+            total = count_export_records(db)
+            if not total:
                 click.echo("No file metadata records found to export.")
                 return
 
-            all_file_data = [file_record.to_dict() for file_record in files]
-
-            with open(output_filepath, 'w', encoding='utf-8') as f:
-                json.dump(all_file_data, f, indent=4, ensure_ascii=False)
+            # Without --gzip, compression follows the file extension
+            with open_export_file(output_filepath, 'w', compress=compress or None) as f, \
+                    click.progressbar(length=total, label='Exporting', file=sys.stderr) as bar:
+                exported = write_export(db, f, export_format=export_format, batch_size=batch_size, progress=bar.update)
 
-            click.echo(f"Successfully exported {len(files)} file metadata records to '{output_filepath}'.")
+            click.echo(f"Successfully exported {exported} file metadata records to '{output_filepath}'.")
 
         except OperationalError as e:
             click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
@@ -432,6 +612,55 @@ def export(output_filepath):
         except Exception as e:
             click.echo(f"An unexpected error occurred during export: {e}", err=True)
             sys.exit(1)
+@cli.command(name='import')
+@click.argument('input_filepath', type=click.Path(exists=True, dir_okay=False, readable=True))
+@click.option('--format', 'export_format', type=click.Choice(EXPORT_FORMATS, case_sensitive=False),
+              help='Input format. Defaults to the file extension (.json, .ndjson, .csv), or json. '
+                   'Gzipped files (.gz) are decompressed automatically.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=5000, show_default=True,
+              help='Number of records inserted per transaction.')
+@click.option('--checkpoint', 'checkpoint_path', type=click.Path(dir_okay=False, writable=True),
+              help='Checkpoint file. If it exists, the import resumes after the records it lists as done.')
+@click.option('--id-map', 'id_map_path', type=click.Path(dir_okay=False, writable=True),
+              help='Write an "old_id,new_id" CSV mapping exported IDs to their IDs in this database.')
+def import_command(input_filepath, export_format, batch_size, checkpoint_path, id_map_path):
+    """
+    Restores file metadata records from a file written by 'export'.
+    Records are streamed and bulk-inserted in batches; files whose path is
+    already in the database are skipped.
+    """
+    def report_progress(records_done):
+        click.echo(f"\rProcessed {records_done} records...", nl=False, err=True)
+
+    with get_db() as db:
+        try:
+            totals = import_export_file(
+                db,
+                input_filepath,
+                export_format=export_format.lower() if export_format else None,
+                batch_size=batch_size,
+                checkpoint_path=checkpoint_path,
+                id_map_path=id_map_path,
+                progress=report_progress
+            )
+            click.echo("", err=True)
+            if totals['resumed_from']:
+                click.echo(f"Resumed after {totals['resumed_from']} previously imported records.")
+            click.echo(f"Imported {totals['imported']} file metadata records with {totals['tags']} tags "
+                       f"({totals['skipped']} skipped as already present).")
+        except ValueError as e:
+            click.echo(f"\nError: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"\nDatabase connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except IOError as e:
+            click.echo(f"\nError reading '{input_filepath}': {e}", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"\nAn unexpected error occurred during import: {e}", err=True)
+            sys.exit(1)
+
 @cli.command()
 @click.argument('file_id', type=int)
 @click.argument('new_name')
@@ -502,6 +731,43 @@ def list_tags_command(unique, sort, order, limit, offset, search_keywords):
 
     except Exception as e:
         click.echo(f"Error listing tags: {e}", err=True)
+
+@tags.command(name='dedupe')
+@click.option('--dry-run', is_flag=True, help='Only list the duplicate tags; delete nothing.')
+@click.option('--yes', is_flag=True, help='Delete without asking for confirmation.')
+def dedupe_tags_command(dry_run, yes):
+    """
+    Removes duplicate tags (several values for one key on the same file), keeping the
+    most recently written value, and creates the unique (file, key) index that
+    'filemeta init' and the API cannot create while duplicates exist.
+    """
+    try:
+        total, sample = find_duplicate_tags()
+        if not total:
+            click.echo("No duplicate tags found.")
+        else:
+            click.echo(f"{total} file/key pair(s) have more than one tag row, e.g.:")
+            for file_id, key, rows in sample:
+                click.echo(f"  File ID: {file_id}, Key: {key} ({rows} rows)")
+        if dry_run:
+            return
+        if total and not yes:
+            click.confirm("Delete all but the most recently written tag of each pair? This cannot be undone.", abort=True)
+        with get_db() as db:
+            deleted = dedupe_tags(db)
+        click.echo(f"Deleted {deleted} duplicate tag row(s); the unique tag index is in place.")
+    except OperationalError as e:
+        click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+        sys.exit(1)
+    except ValueError as e: # Another unique index is blocked by duplicates
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    except click.Abort:
+        raise
+    except Exception as e:
+        click.echo(f"Error removing duplicate tags: {e}", err=True)
+        sys.exit(1)
+
 @cli.command()
 @click.option('--id', 'file_id', type=int, help='Validate a specific file by its database ID.')
 @click.option('--filename', help='Validate files with a specific filename.')
@@ -557,5 +823,482 @@ def validate(file_id, filename, filepath, tag_check, all):
     except Exception as e:
         click.echo(f"Error during validation: {e}", err=True)
 
+@cli.group()
+def saved():
+    """Manage saved searches (smart folders)."""
+    pass
+
+@saved.command(name='create')
+@click.argument('name')
+@search_criteria_options
+def create_saved_search_command(name, **criteria_options):
+    """
+    Saves the given search criteria under NAME and materializes its result set.
+    """
+    search_criteria = _build_search_criteria(**criteria_options)
+    with get_db() as db:
+        try:
+            saved_search = create_saved_search(db, name, search_criteria)
+            click.echo(f"Saved search '{saved_search.name}' (ID: {saved_search.id}) created.")
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred while saving the search: {e}", err=True)
+            sys.exit(1)
+
+@saved.command(name='list')
+def list_saved_searches_command():
+    """
+    Lists all saved searches and their criteria.
+    """
+    with get_db() as db:
+        try:
+            saved_searches = list_saved_searches(db)
+            if not saved_searches:
+                click.echo("No saved searches found.")
+                return
+            for saved_search in saved_searches:
+                data = saved_search.to_dict()
+                click.echo("-" * 40)
+                click.echo(f"   Name: {data['name']}")
+                click.echo(f"   Last Refreshed At: {data['last_refreshed_at']}")
+                click.echo("   Criteria:")
+                click.echo(json.dumps(data['criteria'], indent=2, ensure_ascii=False))
+            click.echo("-" * 40)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred: {e}", err=True)
+            sys.exit(1)
+
+@saved.command(name='show')
+@click.argument('name')
+@click.option('--refresh', is_flag=True, help='Incrementally refresh the saved search before showing it.')
+@click.option('--fields', help=FIELDS_OPTION_HELP)
+def show_saved_search_command(name, refresh, fields):
+    """
+    Lists the files currently in the saved search NAME.
+    """
+    with get_db() as db:
+        try:
+            requested_fields = parse_field_list(fields) or ['id', 'filename', 'filepath']
+            files = list_saved_search_files(db, name, refresh=refresh, fields=requested_fields)
+            if not files:
+                click.echo(f"Saved search '{name}' has no matching files.")
+                return
+            click.echo(f"Files in saved search '{name}':")
+            for file_record in files:
+                click.echo("-" * 40)
+                _echo_file_fields(file_record.to_dict(requested_fields))
+            click.echo("-" * 40)
+        except NoResultFound as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred: {e}", err=True)
+            sys.exit(1)
+
+@saved.command(name='refresh')
+@click.argument('names', nargs=-1)
+@click.option('--all', 'refresh_all', is_flag=True, help='Refresh every saved search.')
+def refresh_saved_search_command(names, refresh_all):
+    """
+    Incrementally refreshes saved searches from files changed since their last refresh.
+    """
+    if not names and not refresh_all:
+        click.echo("Please provide at least one saved search name, or --all.")
+        sys.exit(1)
+
+    with get_db() as db:
+        try:
+            if refresh_all:
+                names = [saved_search.name for saved_search in list_saved_searches(db)]
+            for name in names:
+                added = refresh_saved_search(db, name)
+                click.echo(f"Saved search '{name}' refreshed ({added} files added or re-added).")
+        except NoResultFound as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred during refresh: {e}", err=True)
+            sys.exit(1)
+
+@saved.command(name='delete')
+@click.argument('name')
+def delete_saved_search_command(name):
+    """
+    Deletes the saved search NAME. Files and their metadata are not affected.
+    """
+    with get_db() as db:
+        try:
+            delete_saved_search(db, name)
+            click.echo(f"Saved search '{name}' deleted successfully.")
+        except NoResultFound as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred during deletion: {e}", err=True)
+            sys.exit(1)
+
+@cli.command()
+@click.argument('path', required=False)
+@click.option('--by', type=click.Choice(ROLLUP_DIMENSIONS), default='directory', show_default=True,
+              help='Report usage under PATH per subdirectory, or per owner or mime type.')
+@click.option('--limit', '-n', type=click.IntRange(min=1), help='Maximum number of entries to show.')
+@click.option('--rebuild', is_flag=True, help='Recompute the usage rollups from all file records first.')
+def du(path, by, limit, rebuild):
+    """
+    Shows bytes and file counts under PATH (default: /) and each of its subdirectories,
+    or per owner or mime type with --by. Served from rollups, without scanning files.
+    """
+    with get_db() as db:
+        try:
+            if rebuild:
+                counted = rebuild_storage_rollups(db)
+                click.echo(f"Storage rollups rebuilt from {counted} file records.")
+
+            usage = get_storage_usage(db, dimension=by, path=path, limit=limit)
+            for entry in usage['entries']:
+                label = entry['key'] if entry['key'] else '(unknown)'
+                click.echo(f"{entry['total_bytes']:>15}  {entry['file_count']:>10}  {label}")
+            total_label = usage['path'] if by == 'directory' else 'total'
+            click.echo(f"{usage['total_bytes']:>15}  {usage['file_count']:>10}  {total_label}")
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred: {e}", err=True)
+            sys.exit(1)
+
+@cli.group()
+def analyze():
+    """Size histograms, percentiles and top-K files from an in-memory snapshot (requires NumPy)."""
+    pass
+
+def _group_label(group, by):
+    if by is None:
+        return "All files"
+    return f"{'Mime type' if by == 'mime' else 'Owner'}: {group if group is not None else '(unknown)'}"
+
+@analyze.command(name='histogram')
+@click.option('--by', type=click.Choice(GROUP_BY_OPTIONS), help='Build one histogram per mime type or owner.')
+@click.option('--bins', type=click.IntRange(min=1), default=20, show_default=True, help='Number of size buckets.')
+@click.option('--scale', type=click.Choice(HISTOGRAM_SCALES), default='log', show_default=True,
+              help='Geometric (log) or equal-width (linear) size buckets.')
+def analyze_histogram_command(by, bins, scale):
+    """
+    Shows how many files (and bytes) fall into each file-size bucket.
+    """
+    with get_db() as db:
+        try:
+            result = get_snapshot(db).size_histogram(bins=bins, by=by, scale=scale)
+            edges = result['edges']
+            for group in result['groups']:
+                click.echo("-" * 40)
+                click.echo(f"   {_group_label(group['group'], by)}")
+                for index, (count, total_bytes) in enumerate(zip(group['counts'], group['bytes'])):
+                    if count:
+                        click.echo(f"     {int(edges[index]):>15} - {int(edges[index + 1]):<15} B  "
+                                   f"{count:>8} files  {total_bytes:>15} bytes")
+            click.echo("-" * 40)
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred: {e}", err=True)
+            sys.exit(1)
+
+@analyze.command(name='percentiles')
+@click.option('--by', type=click.Choice(GROUP_BY_OPTIONS), help='Compute percentiles per mime type or owner.')
+@click.option('--percentile', '-p', 'percentiles', type=click.FloatRange(0, 100), multiple=True,
+              help='Percentile to compute (repeatable). Defaults to 50, 90 and 99.')
+def analyze_percentiles_command(by, percentiles):
+    """
+    Shows file-size percentiles, overall or per group.
+    """
+    with get_db() as db:
+        try:
+            result = get_snapshot(db).size_percentiles(percentiles=percentiles or (50, 90, 99), by=by)
+            for group in result['groups']:
+                click.echo("-" * 40)
+                click.echo(f"   {_group_label(group['group'], by)}")
+                click.echo(f"     Files: {group['files']}  Bytes: {group['bytes']}")
+                for percentile, value in group['percentiles'].items():
+                    click.echo(f"     p{percentile}: {value:.0f} bytes")
+            click.echo("-" * 40)
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred: {e}", err=True)
+            sys.exit(1)
+
+@analyze.command(name='top')
+@click.option('--by', type=click.Choice(GROUP_BY_OPTIONS), help='List the top files per mime type or owner.')
+@click.option('--key', type=click.Choice(TOP_KEYS), default='size', show_default=True,
+              help='Rank by size, or by most recent modification/access time.')
+@click.option('-k', 'k', type=click.IntRange(min=1), default=100, show_default=True,
+              help='Number of files to list (per group with --by).')
+def analyze_top_command(by, key, k):
+    """
+    Lists the largest (or most recently modified/accessed) files.
+    """
+    with get_db() as db:
+        try:
+            result = get_snapshot(db).top_files(k=k, by=by, key=key)
+            files = attach_filepaths(db, result['files'])
+            if not files:
+                click.echo("No files found.")
+                return
+            current_group = object()
+            for entry in files:
+                if entry['group'] != current_group:
+                    current_group = entry['group']
+                    click.echo("-" * 40)
+                    click.echo(f"   {_group_label(current_group, by)}")
+                click.echo(f"     {entry[key]!s:>25}  ID {entry['id']}: {entry['filepath']}")
+            click.echo("-" * 40)
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred: {e}", err=True)
+            sys.exit(1)
+
+@cli.group()
+def jobs():
+    """Background jobs: queue long-running operations, follow them and run the worker."""
+    pass
+
+def _echo_job(job, details=False):
+    progress = f"{job.progress_done}/{job.progress_total}" if job.progress_total is not None else str(job.progress_done)
+    click.echo(f"Job {job.id} [{job.kind}] {job.status}"
+               f"{' (cancel requested)' if job.cancel_requested and job.status == 'running' else ''}"
+               f" - progress {progress}{f' - {job.message}' if job.message else ''}")
+    if details:
+        click.echo(f"  Parameters: {json.dumps(job.params)}")
+        click.echo(f"  Submitted:  {job.created_at} by {job.created_by or '-'}")
+        click.echo(f"  Started:    {job.started_at or '-'} (attempt {job.attempts})")
+        click.echo(f"  Finished:   {job.finished_at or '-'}")
+        if job.result is not None:
+            click.echo(f"  Result:     {json.dumps(job.result)}")
+        if job.result_path:
+            click.echo(f"  Output:     {job.result_path}")
+        if job.error:
+            click.echo(f"  Error:      {job.error}")
+
+@jobs.command(name='submit')
+@click.argument('kind', type=click.Choice(JOB_KINDS))
+@click.option('--param', '-p', 'params', multiple=True,
+              help='Job parameter as KEY=VALUE. VALUE is read as JSON when possible '
+                   '(e.g., -p check_all=true, -p ids=[1,2]). Can be repeated.')
+def submit_job_command(kind, params):
+    """
+    Queues a job for 'filemeta jobs worker'.
+    Kinds: validate (check_all, criteria, tag_key, tag_value), export (format, compress, batch_size),
+    import (input_path, format, batch_size), ingest (directory, recursive, tags) and
+    tag (ids or criteria, tags_to_add_modify, tags_to_remove).
+    """
+    job_params = {}
+    for param in params:
+        if '=' not in param:
+            click.echo(f"Error: Invalid parameter format '{param}'. Must be KEY=VALUE.", err=True)
+            sys.exit(1)
+        key, value = param.split('=', 1)
+        try:
+            job_params[key] = json.loads(value)
+        except ValueError:
+            job_params[key] = value
+
+    with get_db() as db:
+        try:
+            job = submit_job(db, kind, job_params, created_by="system")
+            click.echo(f"Job {job.id} ({kind}) queued. Follow it with 'filemeta jobs status {job.id}'.")
+        except ValueError as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred: {e}", err=True)
+            sys.exit(1)
+
+@jobs.command(name='list')
+@click.option('--status', type=click.Choice(JOB_STATUSES), help='Only show jobs with this status.')
+@click.option('--limit', '-n', type=click.IntRange(min=1), default=50, show_default=True,
+              help='Maximum number of jobs to show (newest first).')
+def list_jobs_command(status, limit):
+    """
+    Lists background jobs, newest first.
+    """
+    with get_db() as db:
+        try:
+            found = list_jobs(db, status=status, limit=limit)
+            if not found:
+                click.echo("No jobs found.")
+                return
+            for job in found:
+                _echo_job(job)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred: {e}", err=True)
+            sys.exit(1)
+
+@jobs.command(name='status')
+@click.argument('job_id', type=int)
+def job_status_command(job_id):
+    """
+    Shows a job's status, progress and result.
+    """
+    with get_db() as db:
+        try:
+            _echo_job(get_job(db, job_id), details=True)
+        except NoResultFound as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred: {e}", err=True)
+            sys.exit(1)
+
+@jobs.command(name='cancel')
+@click.argument('job_id', type=int)
+def cancel_job_command(job_id):
+    """
+    Cancels a queued job, or asks a running job to stop.
+    """
+    with get_db() as db:
+        try:
+            job = cancel_job(db, job_id)
+            if job.status == 'cancelled':
+                click.echo(f"Job {job_id} cancelled.")
+            else:
+                click.echo(f"Cancellation of job {job_id} requested; it stops at its next progress update.")
+        except (NoResultFound, ValueError) as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except Exception as e:
+            click.echo(f"An unexpected error occurred: {e}", err=True)
+            sys.exit(1)
+
+@jobs.command(name='result')
+@click.argument('job_id', type=int)
+@click.option('--output', '-o', 'output_filepath', type=click.Path(dir_okay=False, writable=True),
+              help="Copy the job's output file here.")
+def job_result_command(job_id, output_filepath):
+    """
+    Prints a finished job's result summary, and copies its output file with --output.
+    """
+    with get_db() as db:
+        try:
+            job = get_job(db, job_id)
+            if job.status != 'succeeded':
+                click.echo(f"Error: Job {job_id} has no result (status: {job.status}).", err=True)
+                sys.exit(1)
+            click.echo(json.dumps(job.result, indent=4))
+            if output_filepath:
+                if not job.result_path:
+                    click.echo(f"Error: Job {job_id} did not produce an output file.", err=True)
+                    sys.exit(1)
+                shutil.copyfile(job.result_path, output_filepath)
+                click.echo(f"Output written to '{output_filepath}'.")
+        except NoResultFound as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+        except OperationalError as e:
+            click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+            sys.exit(1)
+        except IOError as e:
+            click.echo(f"Error copying the output file: {e}", err=True)
+            sys.exit(1)
+
+@jobs.command(name='worker')
+@click.option('--concurrency', '-c', type=click.IntRange(min=1), default=2, show_default=True,
+              help='Maximum number of jobs run at the same time.')
+@click.option('--once', is_flag=True, help='Exit when the queue is empty instead of waiting for new jobs.')
+def jobs_worker_command(concurrency, once):
+    """
+    Runs queued jobs until interrupted. Start several workers to share the queue;
+    jobs of a worker that dies are re-queued by the others.
+    """
+    def report(job_id, kind, status):
+        click.echo(f"Job {job_id} ({kind}) {status}.")
+
+    click.echo(f"Job worker started (concurrency {concurrency}).")
+    try:
+        run_worker(concurrency=concurrency, once=once, on_job=report)
+    except KeyboardInterrupt:
+        click.echo("Worker stopped.", err=True)
+    except OperationalError as e:
+        click.echo(f"Database connection error: {e}\nPlease ensure the database server is running and accessible (check credentials, host, port, and firewall).", err=True)
+        sys.exit(1)
+
+@cli.command(name='serve')
+@click.option('--host', default='0.0.0.0', show_default=True, help='Address to bind.')
+@click.option('--port', type=int, default=8000, show_default=True, help='Port to bind.')
+@click.option('--workers', '-w', type=click.IntRange(min=1), default=SERVE_WORKERS, show_default=True,
+              help='Number of worker processes (default: WEB_CONCURRENCY or the CPU count).')
+@click.option('--max-requests', type=click.IntRange(min=0), default=SERVE_MAX_REQUESTS, show_default=True,
+              help='Requests after which a worker is replaced; 0 disables recycling.')
+@click.option('--max-requests-jitter', type=click.IntRange(min=0), default=SERVE_MAX_REQUESTS_JITTER, show_default=True,
+              help='Random extra requests per worker, so workers are not recycled together.')
+@click.option('--graceful-timeout', type=click.IntRange(min=0), default=SERVE_GRACEFUL_TIMEOUT, show_default=True,
+              help='Seconds a stopping worker has to finish the requests in flight.')
+@click.option('--worker-timeout', type=click.IntRange(min=1), default=SERVE_WORKER_TIMEOUT, show_default=True,
+              help='Seconds after which an unresponsive worker is killed and replaced.')
+@click.option('--app', 'app_path', default='main:app', show_default=True, help='API application as module:attribute.')
+@click.option('--app-dir', default='.', show_default=True, help='Directory the application module is imported from.')
+def serve_command(host, port, workers, max_requests, max_requests_jitter, graceful_timeout, worker_timeout, app_path, app_dir):
+    """
+    Runs the REST API with several worker processes (production entry point).
+    SIGTERM drains in-flight requests before exiting; SIGHUP replaces the workers.
+    """
+    try:
+        serve(
+            app_path=app_path, app_dir=app_dir, host=host, port=port, workers=workers,
+            max_requests=max_requests, max_requests_jitter=max_requests_jitter,
+            graceful_timeout=graceful_timeout, worker_timeout=worker_timeout
+        )
+    except (ValueError, ImportError, AttributeError) as e:
+        click.echo(f"Error loading the API application: {e}", err=True)
+        sys.exit(1)
+
 if __name__ == '__main__':
     cli()
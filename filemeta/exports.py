@@ -0,0 +1,386 @@
+# filemeta/exports.py
+import csv
+import gzip
+import json
+import os
+import textwrap
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .models import File, Tag, FILE_FIELDS
+from .metadata_manager import iter_file_record_batches, collect_rollup_deltas, apply_rollup_deltas
+from .changes import record_file_changes
+
+EXPORT_FORMATS = ('json', 'ndjson', 'csv')
+
+def detect_export_format(filepath: str) -> str:
+    """
+    Guesses the export format from a file name (e.g., "backup.ndjson.gz" -> "ndjson").
+    Defaults to 'json', the format of earlier exports.
+    """
+    name = filepath.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    for export_format in EXPORT_FORMATS:
+        if name.endswith('.' + export_format):
+            return export_format
+    if name.endswith('.jsonl'):
+        return 'ndjson'
+    return 'json'
+
+def open_export_file(filepath: str, mode: str = 'w', compress: Optional[bool] = None) -> TextIO:
+    """
+    Opens an export file as text, gzip-compressed if `compress` is True
+    (or, when `compress` is None, if the file name ends with '.gz').
+    """
+    if compress is None:
+        compress = filepath.lower().endswith('.gz')
+    if compress:
+        return gzip.open(filepath, mode + 't', encoding='utf-8', newline='')
+    return open(filepath, mode, encoding='utf-8', newline='')
+
+def count_export_records(db: Session) -> int:
+    """Returns the number of file records an export will write."""
+    return db.query(func.count(File.id)).scalar() or 0
+
+def write_export(
+    db: Session,
+    output: TextIO,
+    export_format: str = 'json',
+    batch_size: int = 1000,
+    progress: Optional[Callable[[int], None]] = None
+) -> int:
+    """
+    Streams all file records to `output` in the given format.
+
+    Records are read in batches from a server-side cursor and written as they
+    arrive, so memory use does not grow with the number of records.
+
+    Args:
+        db (Session): SQLAlchemy database session.
+        output (TextIO): Text file object to write to.
+        export_format (str): 'json' (a JSON array, as in earlier exports),
+                             'ndjson' (one JSON object per line) or 'csv'.
+        batch_size (int): Number of records fetched and written per batch.
+        progress (Callable[[int], None], optional): Called with the size of each written batch.
+
+    Returns:
+        int: The number of records written.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}'. Expected one of: {', '.join(EXPORT_FORMATS)}.")
+
+    csv_writer = None
+    if export_format == 'json':
+        output.write("[")
+    elif export_format == 'csv':
+        csv_writer = csv.DictWriter(output, fieldnames=list(FILE_FIELDS.values()))
+        csv_writer.writeheader()
+
+    written = 0
+    for batch in iter_file_record_batches(db, batch_size=batch_size):
+        batch = [record.to_dict() for record in batch]
+        if export_format == 'json':
+            # Matches the layout of json.dump(records, indent=4)
+            chunks = []
+            for index, record in enumerate(batch):
+                chunks.append("\n" if written == 0 and index == 0 else ",\n")
+                chunks.append(textwrap.indent(json.dumps(record, indent=4, ensure_ascii=False), "    "))
+            output.write("".join(chunks))
+        elif export_format == 'ndjson':
+            output.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch))
+        else:
+            csv_writer.writerows(
+                {key: json.dumps(value, ensure_ascii=False) if isinstance(value, dict) else value
+                 for key, value in record.items()}
+                for record in batch
+            )
+        written += len(batch)
+        if progress:
+            progress(len(batch))
+
+    if export_format == 'json':
+        output.write("\n]" if written else "]")
+    return written
+
+# --- Import ---
+
+def _iter_json_array(input_file: TextIO, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the elements of a top-level JSON array one at a time,
+    reading the file in chunks instead of parsing it as a whole.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if buffer:
+            if not started:
+                if buffer[0] != '[':
+                    raise ValueError("Expected a JSON array of file records.")
+                buffer = buffer[1:]
+                started = True
+                continue
+            if buffer[0] == ',':
+                buffer = buffer[1:]
+                continue
+            if buffer[0] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError("Invalid or truncated JSON array.")
+            else:
+                buffer = buffer[end:]
+                yield record
+                continue
+        elif eof:
+            raise ValueError("Invalid or truncated JSON array.")
+
+        chunk = input_file.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+def iter_export_records(input_file: TextIO, export_format: str = 'json') -> Iterator[Dict[str, Any]]:
+    """
+    Yields the file records (File.to_dict()-style dicts) of an export file,
+    without loading the whole file into memory.
+    """
+    if export_format == 'json':
+        yield from _iter_json_array(input_file)
+    elif export_format == 'ndjson':
+        for line in input_file:
+            if line.strip():
+                yield json.loads(line)
+    elif export_format == 'csv':
+        for record in csv.DictReader(input_file):
+            # CSV has no types: empty cells are None, IDs are ints, tag columns hold JSON
+            record = {key: value if value != '' else None for key, value in record.items()}
+            record['ID'] = int(record['ID']) if record.get('ID') else None
+            for key in ('Inferred Tags', 'Custom Tags'):
+                record[key] = json.loads(record[key]) if record.get(key) else {}
+            yield record
+    else:
+        raise ValueError(f"Unknown export format '{export_format}'. Expected one of: {', '.join(EXPORT_FORMATS)}.")
+
+def _parse_record_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+def _tag_value_and_type(value: Any) -> Tuple[str, str]:
+    """
+    Returns the stored (string value, value_type) of a tag value decoded from an export.
+    Exports write typed JSON, so the type comes from the decoded value itself: re-parsing
+    its string form would turn the string "007" into 7 or "true" into a bool.
+    """
+    if value is None:
+        return 'None', 'NoneType'
+    if isinstance(value, bool): # Before int: bool is a subclass of int
+        return str(value), 'bool'
+    if isinstance(value, int):
+        return str(value), 'int'
+    if isinstance(value, float):
+        return str(value), 'float'
+    if isinstance(value, str):
+        return value, 'str'
+    return json.dumps(value), 'str' # Lists and objects have no tag type of their own
+
+def _import_batch(db: Session, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Inserts one batch of export records and their tags in a single transaction.
+
+    Files whose filepath already exists are skipped (together with their tags),
+    so re-importing a batch after an interrupted run is harmless.
+    Storage rollups are updated for the inserted files in the same transaction.
+    Created At is kept from the export; updated_at is set to the time of the import.
+
+    Returns:
+        Dict[str, Any]: 'imported', 'skipped' and 'tags' counts, and 'id_map'
+                        as (old ID, new or existing ID) pairs.
+    """
+    records_by_path = {}
+    for record in records:
+        records_by_path.setdefault(record['Filepath'], record)
+
+    now = datetime.now()
+    file_rows = [
+        {
+            'filename': record['Filename'],
+            'filepath': record['Filepath'],
+            'owner': record.get('Owner'),
+            'created_by': record.get('Created By'),
+            'created_at': _parse_record_datetime(record.get('Created At')) or now,
+            # The import is a change: incremental saved-search and snapshot refreshes pick
+            # up rows by updated_at, so the exported value would hide restored files from them
+            'updated_at': now,
+            # Stored as a JSON string, like add_file_metadata does
+            'inferred_tags': json.dumps(record.get('Inferred Tags') or {}),
+        }
+        for record in records_by_path.values()
+    ]
+
+    # A single multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING per batch
+    inserted = db.execute(
+        pg_insert(File.__table__)
+        .values(file_rows)
+        .on_conflict_do_nothing(index_elements=['filepath'])
+        .returning(File.__table__.c.id, File.__table__.c.filepath)
+    ).all()
+    new_ids = {filepath: file_id for file_id, filepath in inserted}
+
+    rollup_deltas = {}
+    for file_row in file_rows:
+        if file_row['filepath'] in new_ids:
+            collect_rollup_deltas(file_row['filepath'], file_row['owner'], file_row['inferred_tags'], 1, rollup_deltas)
+    apply_rollup_deltas(db, rollup_deltas)
+    record_file_changes(db, [{'op': 'create', 'file_id': file_id, 'filepath': filepath} for filepath, file_id in new_ids.items()])
+
+    skipped_paths = [path for path in records_by_path if path not in new_ids]
+    existing_ids = {}
+    if skipped_paths:
+        existing_ids = dict(
+            db.execute(select(File.filepath, File.id).where(File.filepath.in_(skipped_paths))).all()
+        )
+
+    tag_rows = []
+    for filepath, file_id in new_ids.items():
+        for key, value in (records_by_path[filepath].get('Custom Tags') or {}).items():
+            stored_value, value_type = _tag_value_and_type(value)
+            tag_rows.append({'file_id': file_id, 'key': key, 'value': stored_value, 'value_type': value_type})
+    if tag_rows:
+        # executemany, batched into multi-row INSERTs by the driver dialect
+        db.execute(Tag.__table__.insert(), tag_rows)
+
+    id_map = []
+    for record in records:
+        new_id = new_ids.get(record['Filepath'], existing_ids.get(record['Filepath']))
+        if record.get('ID') is not None and new_id is not None:
+            id_map.append((record['ID'], new_id))
+
+    return {
+        'imported': len(new_ids),
+        'skipped': len(records) - len(new_ids),
+        'tags': len(tag_rows),
+        'id_map': id_map,
+    }
+
+def _read_checkpoint(checkpoint_path: str, input_path: str) -> Tuple[int, Optional[int]]:
+    """
+    Returns the number of records already imported according to a checkpoint file, and
+    the size in bytes of the id map once their rows were written (None if not recorded).
+    """
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return 0, None
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('input') != os.path.abspath(input_path):
+        raise ValueError(f"Checkpoint '{checkpoint_path}' belongs to a different input file: {checkpoint.get('input')}")
+    return int(checkpoint.get('records_done', 0)), checkpoint.get('id_map_bytes')
+
+def _write_checkpoint(checkpoint_path: str, input_path: str, records_done: int, id_map_bytes: Optional[int] = None):
+    """Atomically records how many input records have been committed, and the id map's size."""
+    temp_path = checkpoint_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'input': os.path.abspath(input_path), 'records_done': records_done, 'id_map_bytes': id_map_bytes}, f)
+    os.replace(temp_path, checkpoint_path)
+
+def import_export_file(
+    db: Session,
+    input_path: str,
+    export_format: Optional[str] = None,
+    batch_size: int = 5000,
+    checkpoint_path: Optional[str] = None,
+    id_map_path: Optional[str] = None,
+    progress: Optional[Callable[[int], None]] = None
+) -> Dict[str, int]:
+    """
+    Bulk-loads an export file (JSON array, NDJSON or CSV, optionally gzipped)
+    into the files and tags tables.
+
+    Records are streamed from the input and inserted in batches, one transaction
+    per batch. After each batch the number of committed records is written to
+    `checkpoint_path`, and a later run with the same checkpoint resumes after them.
+    Files whose filepath already exists are skipped. The checkpoint also records how far
+    the id map had been written, so a resumed run first drops the rows of a batch that was
+    committed after the last checkpoint; that batch is imported (skipped) and mapped again.
+
+    Args:
+        db (Session): SQLAlchemy database session.
+        input_path (str): Path of the export file.
+        export_format (str, optional): 'json', 'ndjson' or 'csv'. Detected from the file name if omitted.
+        batch_size (int): Number of records inserted per transaction.
+        checkpoint_path (str, optional): File used to resume an interrupted import.
+        id_map_path (str, optional): CSV file receiving "old_id,new_id" rows for every imported
+                                     or already present record.
+        progress (Callable[[int], None], optional): Called with the number of records processed so far.
+
+    Returns:
+        Dict[str, int]: 'imported', 'skipped', 'tags' and 'resumed_from' counts.
+    """
+    export_format = export_format or detect_export_format(input_path)
+    records_done, id_map_bytes = _read_checkpoint(checkpoint_path, input_path)
+    totals = {'imported': 0, 'skipped': 0, 'tags': 0, 'resumed_from': records_done}
+
+    id_map_file = None
+    if id_map_path:
+        id_map_file = open(id_map_path, 'a' if records_done else 'w', encoding='utf-8', newline='')
+    try:
+        if id_map_file and records_done and id_map_bytes is not None and id_map_file.tell() > id_map_bytes:
+            id_map_file.truncate(id_map_bytes)
+        if id_map_file and not records_done:
+            csv.writer(id_map_file).writerow(['old_id', 'new_id'])
+
+        with open_export_file(input_path, 'r') as input_file:
+            batch = []
+            position = 0
+            for record in iter_export_records(input_file, export_format):
+                position += 1
+                if position <= records_done:
+                    continue
+                batch.append(record)
+                if len(batch) < batch_size:
+                    continue
+                records_done = _commit_import_batch(db, batch, records_done, totals, id_map_file,
+                                                    input_path, checkpoint_path)
+                batch = []
+                if progress:
+                    progress(records_done)
+            if batch:
+                records_done = _commit_import_batch(db, batch, records_done, totals, id_map_file,
+                                                    input_path, checkpoint_path)
+                if progress:
+                    progress(records_done)
+    finally:
+        if id_map_file:
+            id_map_file.close()
+    return totals
+
+def _commit_import_batch(db, batch, records_done, totals, id_map_file, input_path, checkpoint_path) -> int:
+    """
+    Imports and commits one batch, then updates the totals, id map and checkpoint.
+    The id map rows are flushed before the checkpoint that records the id map's new size.
+    """
+    try:
+        result = _import_batch(db, batch)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    for key in ('imported', 'skipped', 'tags'):
+        totals[key] += result[key]
+    id_map_bytes = None
+    if id_map_file:
+        csv.writer(id_map_file).writerows(result['id_map'])
+        id_map_file.flush()
+        id_map_bytes = id_map_file.tell()
+    records_done += len(batch)
+    if checkpoint_path:
+        _write_checkpoint(checkpoint_path, input_path, records_done, id_map_bytes)
+    return records_done
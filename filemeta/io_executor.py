@@ -0,0 +1,162 @@
+# filemeta/io_executor.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Filesystem calls made while serving a request (os.stat, os.path.exists, os.rename, ...)
+# run on this dedicated pool instead of the event loop. On a hung NFS mount they can block
+# for a long time; the pool, the pending-call bound and the timeout keep that from
+# stalling every other request.
+FS_IO_WORKERS = int(os.getenv("FS_IO_WORKERS", "8"))
+# Calls submitted but not finished, including calls still stuck after their caller timed out.
+# Past this, new calls are rejected immediately rather than queued behind a hung mount.
+FS_IO_MAX_PENDING = int(os.getenv("FS_IO_MAX_PENDING", "64"))
+FS_IO_TIMEOUT_SECONDS = float(os.getenv("FS_IO_TIMEOUT_SECONDS", "10"))
+# Paths checked per executor call by run_fs_batched()
+FS_IO_BATCH_SIZE = 256
+
+class FilesystemIOError(Exception):
+    """A filesystem call could not be completed on the I/O executor."""
+
+class FilesystemTimeoutError(FilesystemIOError):
+    """The call did not finish within the timeout; it may still complete in the background."""
+
+class FilesystemBusyError(FilesystemIOError):
+    """Too many filesystem calls are pending (usually because a mount is hung)."""
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_pending = 0
+_rejected = 0
+_operations: Dict[str, Dict[str, float]] = {}
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=FS_IO_WORKERS, thread_name_prefix="filemeta-fs")
+        return _executor
+
+def _operation_stats(operation: str) -> Dict[str, float]:
+    # Caller holds _lock
+    stats = _operations.get(operation)
+    if stats is None:
+        stats = _operations[operation] = {'calls': 0, 'errors': 0, 'timeouts': 0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+    return stats
+
+def _call_finished(operation: str, started: float, future: Future):
+    """Runs when the call returns, raises or is cancelled before starting."""
+    global _pending
+    elapsed = time.monotonic() - started
+    with _lock:
+        _pending -= 1
+        if future.cancelled():
+            return
+        stats = _operation_stats(operation)
+        stats['calls'] += 1
+        stats['total_seconds'] += elapsed
+        stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+        if future.exception() is not None:
+            stats['errors'] += 1
+
+async def run_fs(
+    operation: str,
+    function: Callable[..., Any],
+    *args,
+    timeout: Optional[float] = None,
+    wait_for_completion: bool = False
+) -> Any:
+    """
+    Runs function(*args) on the filesystem I/O executor and awaits its result.
+    `operation` names the call in fs_io_metrics(). Exceptions raised by the function
+    propagate unchanged. Calls with side effects the caller must record (e.g. a rename)
+    pass wait_for_completion=True: no timeout applies, since giving up on a call that
+    may still succeed would leave its effect unrecorded.
+
+    Raises:
+        FilesystemBusyError: If FS_IO_MAX_PENDING calls are already pending.
+        FilesystemTimeoutError: If the call does not finish within `timeout` seconds
+                                (FS_IO_TIMEOUT_SECONDS by default).
+    """
+    global _pending, _rejected
+    timeout = FS_IO_TIMEOUT_SECONDS if timeout is None else timeout
+    executor = _get_executor()
+    with _lock:
+        if _pending >= FS_IO_MAX_PENDING:
+            _rejected += 1
+            raise FilesystemBusyError(
+                f"Filesystem is busy: {_pending} operations pending. Try again later.")
+        _pending += 1
+
+    started = time.monotonic()
+    try:
+        future = executor.submit(function, *args)
+    except BaseException:
+        with _lock:
+            _pending -= 1
+        raise
+    future.add_done_callback(lambda done: _call_finished(operation, started, done))
+
+    if wait_for_completion:
+        return await asyncio.wrap_future(future)
+    try:
+        # On timeout wait_for cancels the future: a queued call never starts, a running
+        # one keeps its worker until the filesystem returns.
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        with _lock:
+            _operation_stats(operation)['timeouts'] += 1
+        raise FilesystemTimeoutError(
+            f"Filesystem operation '{operation}' did not complete within {timeout:g} seconds.")
+
+async def run_fs_batched(
+    operation: str,
+    function: Callable[[Sequence[Any]], List[Any]],
+    items: Sequence[Any],
+    batch_size: int = FS_IO_BATCH_SIZE
+) -> List[Any]:
+    """
+    Applies a list-in, list-out function to `items` in batches on the executor,
+    running up to half the workers' worth of batches at a time. Results keep the order of `items`.
+    """
+    semaphore = asyncio.Semaphore(max(1, FS_IO_WORKERS // 2))
+
+    async def run_batch(batch):
+        async with semaphore:
+            return await run_fs(operation, function, batch)
+
+    batches = [items[start:start + batch_size] for start in range(0, len(items), batch_size)]
+    results = await asyncio.gather(*(run_batch(batch) for batch in batches))
+    return [result for batch_results in results for result in batch_results]
+
+def fs_io_metrics() -> Dict[str, Any]:
+    """Returns executor settings, the current pending count and per-operation call statistics."""
+    with _lock:
+        operations = {}
+        for operation, stats in sorted(_operations.items()):
+            operations[operation] = {
+                'calls': int(stats['calls']),
+                'errors': int(stats['errors']),
+                'timeouts': int(stats['timeouts']),
+                'avg_ms': round(1000 * stats['total_seconds'] / stats['calls'], 3) if stats['calls'] else None,
+                'max_ms': round(1000 * stats['max_seconds'], 3),
+            }
+        return {
+            'workers': FS_IO_WORKERS,
+            'max_pending': FS_IO_MAX_PENDING,
+            'timeout_seconds': FS_IO_TIMEOUT_SECONDS,
+            'pending': _pending,
+            'rejected': _rejected,
+            'operations': operations,
+        }
+
+def shutdown_fs_executor():
+    """Stops the executor without waiting for calls stuck on the filesystem."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
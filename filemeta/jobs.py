@@ -0,0 +1,501 @@
+# filemeta/jobs.py
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.orm import Session
+
+from .database import get_db
+from .models import File, Job
+from .metadata_manager import (
+    add_file_metadata, bulk_update_tags, validate_file_metadata, files_exist_on_disk,
+    search_file_records, _serialize_search_criteria, _deserialize_search_criteria, _async_variant
+)
+from .exports import EXPORT_FORMATS, count_export_records, open_export_file, write_export, import_export_file
+
+JOB_KINDS = ('validate', 'export', 'import', 'ingest', 'tag')
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+# Parameters accepted by each job kind
+JOB_PARAMS = {
+    'validate': ('check_all', 'criteria', 'tag_key', 'tag_value'),
+    'export': ('format', 'compress', 'batch_size'),
+    'import': ('input_path', 'format', 'batch_size'),
+    'ingest': ('directory', 'recursive', 'tags'),
+    'tag': ('ids', 'criteria', 'tags_to_add_modify', 'tags_to_remove'),
+}
+
+# Jobs write their output files here. The API serves result downloads from the same
+# directory, so API processes and workers must share it.
+JOB_RESULTS_DIR = os.getenv("JOB_RESULTS_DIR", os.path.join(os.path.expanduser("~"), ".filemeta", "job-results"))
+JOB_POLL_SECONDS = 2.0
+JOB_HEARTBEAT_SECONDS = 15
+# A running job whose heartbeat is older than this is assumed lost with its worker and re-queued
+JOB_STALE_SECONDS = 120
+JOB_MAX_ATTEMPTS = 3
+# Progress is written to the jobs table at most this often
+JOB_PROGRESS_INTERVAL_SECONDS = 1.0
+VALIDATE_BATCH_SIZE = 500
+# Files per bulk_update_tags() transaction in tag jobs
+TAG_BATCH_SIZE = 1000
+
+class JobCancelled(Exception):
+    """Raised from JobContext.progress() when the job's cancellation was requested."""
+
+class JobClaimLost(Exception):
+    """
+    Raised from JobContext.progress() when the job is no longer running under this
+    worker's claim, e.g. it was re-queued after missed heartbeats and claimed again.
+    """
+
+def _claimed_job(job_id: int, worker: str, attempt: int) -> tuple:
+    """Conditions matching a job only while it is still running under one claim."""
+    return (Job.id == job_id, Job.status == 'running', Job.worker == worker, Job.attempts == attempt)
+
+def _validate_job_params(kind: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Checks a job's parameters at submit time, so bad jobs fail fast instead of in the worker."""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind '{kind}'. Expected one of: {', '.join(JOB_KINDS)}.")
+    params = dict(params or {})
+    unknown_keys = [key for key in params if key not in JOB_PARAMS[kind]]
+    if unknown_keys:
+        raise ValueError(f"Unknown parameters for job kind '{kind}': {', '.join(unknown_keys)}. "
+                         f"Expected: {', '.join(JOB_PARAMS[kind])}.")
+
+    if kind == 'validate':
+        if not params.get('check_all') and not params.get('criteria'):
+            raise ValueError("A validate job needs 'check_all': true or 'criteria'.")
+    elif kind in ('export', 'import'):
+        if params.get('format') is not None and params['format'] not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{params['format']}'. Expected one of: {', '.join(EXPORT_FORMATS)}.")
+        if kind == 'import' and not params.get('input_path'):
+            raise ValueError("An import job needs 'input_path'.")
+    elif kind == 'ingest':
+        if not params.get('directory'):
+            raise ValueError("An ingest job needs 'directory'.")
+    elif kind == 'tag':
+        if not params.get('ids') and not params.get('criteria'):
+            raise ValueError("A tag job needs 'ids' or 'criteria'.")
+        if not params.get('tags_to_add_modify') and not params.get('tags_to_remove'):
+            raise ValueError("A tag job needs 'tags_to_add_modify' or 'tags_to_remove'.")
+        if params.get('criteria'):
+            params['criteria'] = _serialize_search_criteria(params['criteria'])
+    return params
+
+# --- Queue ---
+
+def submit_job(db: Session, kind: str, params: Optional[Dict[str, Any]] = None, created_by: Optional[str] = None) -> Job:
+    """
+    Queues a job for the worker.
+
+    Raises:
+        ValueError: If the kind is unknown or the parameters are invalid.
+    """
+    job = Job(kind=kind, params=_validate_job_params(kind, params), status='queued', created_by=created_by)
+    try:
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"An unexpected error occurred while submitting the {kind} job: {e}")
+
+def get_job(db: Session, job_id: int, created_by: Optional[str] = None) -> Job:
+    """Returns a job, optionally only if `created_by` submitted it. Raises NoResultFound otherwise."""
+    query = db.query(Job).filter(Job.id == job_id)
+    if created_by is not None:
+        query = query.filter(Job.created_by == created_by)
+    job = query.first()
+    if not job:
+        raise NoResultFound(f"No job found with ID: {job_id}")
+    return job
+
+def list_jobs(
+    db: Session,
+    status: Optional[str] = None,
+    created_by: Optional[str] = None,
+    limit: int = 50
+) -> List[Job]:
+    """Lists jobs, newest first."""
+    if status is not None and status not in JOB_STATUSES:
+        raise ValueError(f"Unknown job status '{status}'. Expected one of: {', '.join(JOB_STATUSES)}.")
+    query = db.query(Job)
+    if status is not None:
+        query = query.filter(Job.status == status)
+    if created_by is not None:
+        query = query.filter(Job.created_by == created_by)
+    return query.order_by(Job.id.desc()).limit(limit).all()
+
+def cancel_job(db: Session, job_id: int, created_by: Optional[str] = None) -> Job:
+    """
+    Cancels a queued job immediately; a running job stops at its next progress report.
+
+    Raises:
+        NoResultFound: If the job does not exist.
+        ValueError: If the job has already finished.
+    """
+    query = db.query(Job).filter(Job.id == job_id)
+    if created_by is not None:
+        query = query.filter(Job.created_by == created_by)
+    # Locked so a worker cannot claim the job while it is being cancelled
+    job = query.with_for_update().first()
+    if not job:
+        db.rollback()
+        raise NoResultFound(f"No job found with ID: {job_id}")
+    if job.status in FINISHED_STATUSES:
+        db.rollback()
+        raise ValueError(f"Job {job_id} has already finished ({job.status}).")
+    try:
+        if job.status == 'queued':
+            job.status = 'cancelled'
+            job.finished_at = datetime.now()
+        else:
+            job.cancel_requested = True
+        db.commit()
+        db.refresh(job)
+        return job
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"An unexpected error occurred while cancelling job {job_id}: {e}")
+
+def claim_next_job(db: Session, worker: str) -> Optional[Job]:
+    """
+    Marks the oldest queued job as running on `worker` and returns it, or None if the queue is empty.
+    SKIP LOCKED lets several workers claim jobs concurrently without blocking each other.
+    """
+    job = db.execute(
+        select(Job).where(Job.status == 'queued')
+        .order_by(Job.created_at, Job.id).limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar_one_or_none()
+    if job is None:
+        db.rollback()
+        return None
+    now = datetime.now()
+    job.status = 'running'
+    job.worker = worker
+    job.attempts += 1
+    job.started_at = now
+    job.heartbeat_at = now
+    db.commit()
+    return job
+
+def requeue_stale_jobs(db: Session) -> int:
+    """
+    Re-queues running jobs whose worker stopped sending heartbeats (crashed or was killed),
+    failing them after JOB_MAX_ATTEMPTS. Returns the number of jobs handled.
+    """
+    cutoff = datetime.now() - timedelta(seconds=JOB_STALE_SECONDS)
+    stale_jobs = db.query(Job).filter(Job.status == 'running', Job.heartbeat_at < cutoff) \
+        .with_for_update(skip_locked=True).all()
+    for job in stale_jobs:
+        if job.cancel_requested:
+            job.status = 'cancelled'
+            job.finished_at = datetime.now()
+        elif job.attempts >= JOB_MAX_ATTEMPTS:
+            job.status = 'failed'
+            job.error = f"The worker running this job stopped responding ({job.attempts} attempts)."
+            job.finished_at = datetime.now()
+        else:
+            job.status = 'queued'
+            job.message = f"Re-queued after worker '{job.worker}' stopped responding."
+            job.worker = None
+    db.commit()
+    return len(stale_jobs)
+
+# --- Running jobs ---
+
+class JobContext:
+    """
+    Passed to job handlers to report progress. Progress is written through its own
+    short-lived sessions (handlers may be in the middle of a transaction or a
+    server-side cursor) and at most every JOB_PROGRESS_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, job_id: int, worker: str, attempt: int):
+        self.job_id = job_id
+        self.claim = _claimed_job(job_id, worker, attempt)
+        self.done = 0
+        self.total: Optional[int] = None
+        self.message: Optional[str] = None
+        self._written_at = 0.0
+
+    def progress(self, done: Optional[int] = None, total: Optional[int] = None, message: Optional[str] = None):
+        """
+        Records progress; raises JobCancelled if cancellation was requested and
+        JobClaimLost if another claim has taken over the job.
+        """
+        if done is not None:
+            self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        if message is not None or time.monotonic() - self._written_at >= JOB_PROGRESS_INTERVAL_SECONDS:
+            self.write()
+
+    def advance(self, count: int):
+        """Adds `count` units of completed work."""
+        self.progress(self.done + count)
+
+    def write(self):
+        self._written_at = time.monotonic()
+        with get_db() as db:
+            claimed = db.execute(
+                update(Job).where(*self.claim)
+                .values(progress_done=self.done, progress_total=self.total, message=self.message,
+                        heartbeat_at=datetime.now())
+                .returning(Job.cancel_requested)
+            ).first()
+            db.commit()
+        if claimed is None:
+            raise JobClaimLost(f"Job {self.job_id} is no longer running under this worker's claim.")
+        if claimed.cancel_requested:
+            raise JobCancelled(f"Job {self.job_id} was cancelled.")
+
+def _result_path(job_id: int, kind: str, suffix: str) -> str:
+    os.makedirs(JOB_RESULTS_DIR, exist_ok=True)
+    return os.path.join(JOB_RESULTS_DIR, f"job-{job_id}-{kind}{suffix}")
+
+# Each handler returns (result summary, path of an output file or None)
+JobOutcome = Tuple[Dict[str, Any], Optional[str]]
+
+def _run_validate(db: Session, job_id: int, params: Dict[str, Any], ctx: JobContext) -> JobOutcome:
+    results = validate_file_metadata(
+        db,
+        check_all=params.get('check_all', False),
+        criteria=params.get('criteria'),
+        tag_key=params.get('tag_key'),
+        tag_value=params.get('tag_value'),
+        check_disk=False
+    )
+    db.rollback() # Nothing else is read; don't hold the transaction open during the disk checks
+    ctx.progress(0, total=len(results), message="Checking files on disk")
+    for start in range(0, len(results), VALIDATE_BATCH_SIZE):
+        batch = results[start:start + VALIDATE_BATCH_SIZE]
+        for result, exists in zip(batch, files_exist_on_disk([result['filepath'] for result in batch])):
+            result['disk_exists'] = exists
+        ctx.advance(len(batch))
+
+    path = _result_path(job_id, 'validate', '.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=4)
+    return {
+        'checked': len(results),
+        'missing_on_disk': sum(1 for result in results if not result['disk_exists']),
+        'tag_not_found': sum(1 for result in results if result['tag_status'] and result['tag_status'].endswith("NOT found.")),
+    }, path
+
+def _run_export(db: Session, job_id: int, params: Dict[str, Any], ctx: JobContext) -> JobOutcome:
+    export_format = params.get('format') or 'json'
+    compress = bool(params.get('compress'))
+    path = _result_path(job_id, 'export', f".{export_format}{'.gz' if compress else ''}")
+    ctx.progress(0, total=count_export_records(db), message="Exporting")
+    with open_export_file(path, 'w', compress=compress) as output:
+        exported = write_export(db, output, export_format=export_format,
+                                batch_size=params.get('batch_size', 1000), progress=ctx.advance)
+    return {'exported': exported}, path
+
+def _run_import(db: Session, job_id: int, params: Dict[str, Any], ctx: JobContext) -> JobOutcome:
+    ctx.progress(0, message="Importing")
+    # A job re-queued after a worker crash resumes from this checkpoint
+    totals = import_export_file(
+        db,
+        params['input_path'],
+        export_format=params.get('format'),
+        batch_size=params.get('batch_size', 5000),
+        checkpoint_path=_result_path(job_id, 'import', '.checkpoint'),
+        progress=ctx.progress
+    )
+    return totals, None
+
+def _run_ingest(db: Session, job_id: int, params: Dict[str, Any], ctx: JobContext) -> JobOutcome:
+    directory = os.path.abspath(params['directory'])
+    if not os.path.isdir(directory):
+        raise ValueError(f"Directory not found: {directory}")
+    ctx.progress(0, message=f"Scanning {directory}")
+    if params.get('recursive', True):
+        filepaths = [os.path.join(dirpath, filename)
+                     for dirpath, _, filenames in os.walk(directory) for filename in filenames]
+    else:
+        filepaths = [os.path.join(directory, filename) for filename in os.listdir(directory)]
+    filepaths = sorted(filepath for filepath in filepaths if os.path.isfile(filepath))
+
+    existing = set()
+    for start in range(0, len(filepaths), VALIDATE_BATCH_SIZE):
+        batch = filepaths[start:start + VALIDATE_BATCH_SIZE]
+        existing.update(db.execute(select(File.filepath).where(File.filepath.in_(batch))).scalars())
+
+    ctx.progress(0, total=len(filepaths), message="Adding files")
+    added, errors = 0, []
+    for filepath in filepaths:
+        if filepath not in existing:
+            try:
+                add_file_metadata(db, filepath, params.get('tags') or {})
+                added += 1
+            except Exception as e: # e.g. removed or added by someone else since the scan
+                errors.append(f"{filepath}: {e}")
+        ctx.advance(1)
+    return {'added': added, 'skipped': len(existing), 'errors': len(errors), 'first_errors': errors[:20]}, None
+
+def _run_tag(db: Session, job_id: int, params: Dict[str, Any], ctx: JobContext) -> JobOutcome:
+    if params.get('ids'):
+        file_ids = list(params['ids'])
+    else:
+        criteria = _deserialize_search_criteria(params['criteria'])
+        file_ids = [record.id for record in search_file_records(db, fields=['id'], **criteria)]
+    ctx.progress(0, total=len(file_ids), message="Tagging files")
+    totals = {'updated': 0, 'missing': 0, 'tags_added': 0, 'tags_updated': 0, 'tags_removed': 0}
+    errors = []
+    for start in range(0, len(file_ids), TAG_BATCH_SIZE):
+        batch = file_ids[start:start + TAG_BATCH_SIZE]
+        try:
+            counts = bulk_update_tags(db, file_ids=batch, tags_to_add_modify=params.get('tags_to_add_modify'),
+                                      tags_to_remove=params.get('tags_to_remove'))
+            totals['updated'] += counts['files_matched']
+            totals['missing'] += counts['files_missing']
+            for key in ('tags_added', 'tags_updated', 'tags_removed'):
+                totals[key] += counts[key]
+        except Exception as e:
+            errors.append(f"IDs {batch[0]}-{batch[-1]}: {e}")
+        ctx.advance(len(batch))
+    return {**totals, 'errors': len(errors), 'first_errors': errors[:20]}, None
+
+JOB_HANDLERS: Dict[str, Callable[[Session, int, Dict[str, Any], JobContext], JobOutcome]] = {
+    'validate': _run_validate,
+    'export': _run_export,
+    'import': _run_import,
+    'ingest': _run_ingest,
+    'tag': _run_tag,
+}
+
+def run_job(job_id: int, worker: str, attempt: int) -> str:
+    """
+    Runs a job claimed by `worker` (its `attempt`-th claim) to completion and records
+    its outcome. Returns the final status, or 'lost' if the claim was taken over in the
+    meantime: the outcome is then not recorded, so it cannot overwrite the other run's.
+    """
+    ctx = JobContext(job_id, worker, attempt)
+    result, result_path, error = None, None, None
+    with get_db() as db:
+        job = db.get(Job, job_id)
+        kind, params = job.kind, job.params
+        db.rollback()
+        try:
+            result, result_path = JOB_HANDLERS[kind](db, job_id, params, ctx)
+            status = 'succeeded'
+        except JobCancelled:
+            status = 'cancelled'
+        except JobClaimLost:
+            return 'lost'
+        except Exception as e:
+            status = 'failed'
+            error = str(e)
+        db.rollback()
+        recorded = db.execute(
+            update(Job).where(*ctx.claim).values(
+                status=status, result=result, result_path=result_path, error=error,
+                progress_done=ctx.done, progress_total=ctx.total, finished_at=datetime.now()
+            )
+        ).rowcount
+        db.commit()
+    return status if recorded else 'lost'
+
+def _worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def send_heartbeats(
+    worker: str,
+    running_job_ids: Callable[[], List[int]],
+    stop_event: threading.Event,
+    interval: float = JOB_HEARTBEAT_SECONDS
+):
+    """
+    Refreshes heartbeat_at of the jobs `worker` is running, every `interval` seconds
+    until `stop_event` is set. Only jobs still running under this worker are touched.
+    """
+    while not stop_event.wait(interval):
+        job_ids = running_job_ids()
+        if not job_ids:
+            continue
+        # A failed beat is retried on the next interval; if this thread died instead, the
+        # jobs would be re-queued while still running here and run twice
+        try:
+            with get_db() as db:
+                db.execute(update(Job).where(Job.id.in_(job_ids), Job.status == 'running', Job.worker == worker)
+                           .values(heartbeat_at=datetime.now()))
+                db.commit()
+        except Exception as e:
+            print(f"WARNING: Could not send heartbeats for job(s) {job_ids}: {e}", file=sys.stderr)
+
+def run_worker(
+    concurrency: int = 2,
+    poll_interval: float = JOB_POLL_SECONDS,
+    once: bool = False,
+    stop_event: Optional[threading.Event] = None,
+    on_job: Optional[Callable[[int, str, str], None]] = None
+):
+    """
+    Runs queued jobs, up to `concurrency` at a time, until `stop_event` is set or,
+    with once=True, until the queue is empty. Several workers (on one or more hosts)
+    can share the queue. `on_job` is called with (job_id, kind, status) after each job.
+    """
+    stop_event = stop_event or threading.Event()
+    worker = _worker_name()
+    running = set()
+    running_lock = threading.Lock()
+
+    def running_job_ids() -> List[int]:
+        with running_lock:
+            return list(running)
+
+    def process_jobs():
+        while not stop_event.is_set():
+            with get_db() as db:
+                requeue_stale_jobs(db)
+                job = claim_next_job(db, worker)
+                job_id, kind, attempt = (job.id, job.kind, job.attempts) if job else (None, None, None)
+            if job_id is None:
+                if once:
+                    return
+                stop_event.wait(poll_interval)
+                continue
+            with running_lock:
+                running.add(job_id)
+            try:
+                status = run_job(job_id, worker, attempt)
+            finally:
+                with running_lock:
+                    running.discard(job_id)
+            if on_job:
+                on_job(job_id, kind, status)
+
+    heartbeat_thread = threading.Thread(
+        target=send_heartbeats, args=(worker, running_job_ids, stop_event), name="filemeta-job-heartbeat", daemon=True)
+    heartbeat_thread.start()
+    threads = [threading.Thread(target=process_jobs, name=f"filemeta-job-worker-{slot}") for slot in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+
+# --- Async variants (API) ---
+submit_job_async = _async_variant(submit_job)
+get_job_async = _async_variant(get_job)
+list_jobs_async = _async_variant(list_jobs)
+cancel_job_async = _async_variant(cancel_job)
@@ -565,36 +565,77 @@
 #         raise Exception(f"An unexpected error occurred while deleting metadata for file ID {file_id}: {e}")
 # filemeta/metadata_manager.py
 # filemeta/metadata_manager.py
-from typing import Dict, Any, List,Optional
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Iterator
 import os
+import functools
 import json
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError, NoResultFound
-from sqlalchemy import func, or_, String, cast, Integer, text,TIMESTAMP,distinct  # Import 'text' for potential raw SQL if needed for specific DBs
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import func, or_, String, cast, Integer, text,TIMESTAMP,distinct, select, literal, literal_column, union_all, delete, tuple_, bindparam, update, any_, true, values, column, Text, Boolean  # Import 'text' for potential raw SQL if needed for specific DBs
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY, insert as pg_insert
 from datetime import datetime, timezone, timedelta
-from .models import File, Tag
+from .models import File, FileRecord, Tag, FILE_FIELDS, SavedSearch, SavedSearchMember, StorageRollup, FileChange, FileListVersion, parse_inferred_tags
 from .utils import infer_metadata, parse_tag_value,parse_date_string
-from .database import Base, get_db, get_engine 
+from .database import get_db, INIT_DB_LOCK_KEY, init_db as create_schema, create_missing_indexes, delete_duplicate_rows, tags_unique_index
+from .changes import record_file_change, record_file_changes, notify_file_changes
+
+# Search statements are built once per search shape (which criteria are given and how many
+# keywords) with bind parameters in place of the values, then reused: a repeated search
+# only fills in a parameter dict, and the engine's compiled cache sees the same statement.
+SEARCH_SHAPE_CACHE_SIZE = 256
+# Range criteria in shape order; each is bound as a parameter of the same name.
+# The *_before dates are extended to the end of that day.
+SEARCH_RANGE_CRITERIA = (
+    'min_size_bytes', 'max_size_bytes',
+    'created_after', 'created_before', 'modified_after', 'modified_before',
+    'accessed_after', 'accessed_before'
+)
+END_OF_DAY = timedelta(days=1, microseconds=-1)
 
 # --- init_db function ---
 def init_db():
-    """Initializes the database schema by creating all necessary tables."""
-    current_engine = get_engine() 
-    Base.metadata.create_all(current_engine)
-    print("Database schema created or updated.")
+    """
+    Initializes the database: creates the tables and missing indexes (database.init_db)
+    and backfills the storage rollups of files recorded before the table existed.
+    Used by 'filemeta init' and API startup; safe to run from several processes at once.
+    """
+    create_schema()
+    with get_db() as db:
+        # Under the init lock, so that concurrent initializations backfill only once
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": INIT_DB_LOCK_KEY})
+        if db.query(StorageRollup).first() is None and db.query(File.id).first() is not None:
+            rebuild_storage_rollups(db)
+        else:
+            db.commit()
 
 # --- add_file_metadata (no changes needed) ---
-def add_file_metadata(db: Session, filepath: str, custom_tags: Dict[str, Any]) -> File:
+def prepare_file_metadata(filepath: str) -> Dict[str, Any]:
+    """
+    Filesystem half of add_file_metadata: checks that the file exists and infers its metadata.
+    Kept separate so the API can run it on the filesystem I/O executor.
+    """
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"File not found at: {filepath}")
+    return infer_metadata(filepath)
+
+def add_file_metadata(
+    db: Session,
+    filepath: str,
+    custom_tags: Dict[str, Any],
+    inferred_data: Optional[Dict[str, Any]] = None
+) -> File:
+    """
+    Adds a metadata record for a file. `inferred_data` is the result of
+    prepare_file_metadata(); when omitted it is computed here.
+    """
+    if inferred_data is None:
+        inferred_data = prepare_file_metadata(filepath)
 
     existing_file = db.query(File).filter(File.filepath == filepath).first()
     if existing_file:
         raise ValueError(f"Metadata for file '{filepath}' already exists (ID: {existing_file.id}). Use 'update' to modify.")
 
-    inferred_data = infer_metadata(filepath)
-
     file_record = File(
         filename=os.path.basename(filepath),
         filepath=filepath,
@@ -618,6 +659,8 @@ def add_file_metadata(db: Session, filepath: str, custom_tags: Dict[str, Any]) -
         db.add(tag_record)
 
     try:
+        apply_rollup_deltas(db, collect_rollup_deltas(file_record.filepath, file_record.owner, file_record.inferred_tags, 1))
+        record_file_change(db, 'create', file_record.id, file_record.filepath)
         db.commit()
         db.refresh(file_record)
         return file_record
@@ -632,16 +675,184 @@ def add_file_metadata(db: Session, filepath: str, custom_tags: Dict[str, Any]) -
     except Exception as e:
         db.rollback()
         raise Exception(f"An unexpected error occurred while adding file metadata: {e}")
+def validate_file_fields(fields: List[str]):
+    """Raises ValueError if any of the field names is not in FILE_FIELDS."""
+    unknown_fields = [field for field in fields if field not in FILE_FIELDS]
+    if unknown_fields:
+        raise ValueError(
+            f"Unknown field(s): {', '.join(unknown_fields)}. "
+            f"Valid fields are: {', '.join(FILE_FIELDS)}."
+        )
+
+def _apply_field_projection(query, fields: Optional[List[str]]):
+    """
+    Sets the loading strategy of a File query for the requested FILE_FIELDS.
+    Without fields, all columns are loaded and tags are eager-loaded with one
+    extra SELECT ... WHERE file_id IN (...) instead of one query per file.
+    With fields, unrequested columns are deferred, and tags are only loaded
+    if 'custom_tags' is requested.
+    Raises ValueError for unknown field names.
+    """
+    if not fields:
+        return query.options(selectinload(File.tags))
+
+    validate_file_fields(fields)
+    columns = [getattr(File, field) for field in fields if field != 'custom_tags']
+    options = [load_only(*columns) if columns else load_only(File.id)]
+    if 'custom_tags' in fields:
+        options.append(selectinload(File.tags))
+    return query.options(*options)
+
 # --- get_file_metadata (no changes needed) ---
-def get_file_metadata(db: Session, file_id: int) -> File:
-    file_record = db.query(File).filter(File.id == file_id).first()
+def get_file_metadata(db: Session, file_id: int, fields: Optional[List[str]] = None) -> File:
+    query = _apply_field_projection(db.query(File), fields)
+    file_record = query.filter(File.id == file_id).first()
     if not file_record:
         raise NoResultFound(f"No metadata found for file ID: {file_id}")
     return file_record
 
 # --- list_files (no changes needed) ---
-def list_files(db: Session) -> List[File]:
-    return db.query(File).all()
+def list_files(db: Session, fields: Optional[List[str]] = None) -> List[File]:
+    return _apply_field_projection(db.query(File), fields).all()
+
+# --- Read-only record path ---
+# These return FileRecord objects built straight from Core rows: nothing is added to
+# the session identity map and tags are aggregated in SQL rather than loaded as Tag
+# instances, so large reads avoid ORM bookkeeping and per-instance dicts.
+
+def _custom_tags_column():
+    """
+    Correlated subquery aggregating a file's tags into one JSONB object in SQL:
+    {key: [value, value_type], ...}, or NULL if the file has no tags.
+    """
+    return (
+        select(func.jsonb_object_agg(Tag.key, func.jsonb_build_array(Tag.value, Tag.value_type), type_=JSONB))
+        .where(Tag.file_id == File.id)
+        .correlate(File)
+        .scalar_subquery()
+        .label('custom_tags')
+    )
+
+def _file_record_columns(fields: Optional[List[str]] = None) -> list:
+    """Returns the column expressions to select for the requested FILE_FIELDS (all by default)."""
+    if fields:
+        validate_file_fields(fields)
+    columns = []
+    for field in FILE_FIELDS:
+        if fields and field not in fields:
+            continue
+        columns.append(_custom_tags_column() if field == 'custom_tags' else getattr(File, field))
+    return columns
+
+@functools.lru_cache(maxsize=SEARCH_SHAPE_CACHE_SIZE)
+def _cached_file_records_statement(fields: Optional[Tuple[str, ...]], shape: Optional[Tuple[Any, ...]]):
+    statement = select(*_file_record_columns(list(fields) if fields else None)).select_from(File)
+    if shape is not None:
+        statement = statement.where(*_search_conditions(shape))
+    return statement.order_by(File.id)
+
+def _file_records_statement(
+    db: Session,
+    fields: Optional[List[str]] = None,
+    criteria: Optional[Dict[str, Any]] = None
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Returns the record SELECT for all files, or for files matching search criteria,
+    and the parameters to execute it with. The statement is cached per fields and search shape.
+    """
+    if fields:
+        validate_file_fields(fields)
+    shape, params = _search_shape_and_params(**criteria) if criteria else (None, {})
+    return _cached_file_records_statement(tuple(fields) if fields else None, shape), params
+
+def get_file_record(db: Session, file_id: int, fields: Optional[List[str]] = None) -> FileRecord:
+    """
+    Read-only variant of get_file_metadata.
+
+    Raises:
+        NoResultFound: If no file with the given ID exists.
+    """
+    row = db.execute(select(*_file_record_columns(fields)).where(File.id == file_id)).first()
+    if row is None:
+        raise NoResultFound(f"No metadata found for file ID: {file_id}")
+    return FileRecord.from_row(row)
+
+def get_file_version(db: Session, file_id: int) -> Tuple[datetime, str]:
+    """
+    Returns (updated_at, row version) for a file, reading only the files row.
+    The row version is the PostgreSQL xmin of the row, which changes on every UPDATE,
+    so it catches changes even when updated_at is unchanged.
+
+    Raises:
+        NoResultFound: If no file with the given ID exists.
+    """
+    row = db.execute(
+        select(File.updated_at, cast(literal_column('files.xmin'), String)).where(File.id == file_id)
+    ).first()
+    if row is None:
+        raise NoResultFound(f"No metadata found for file ID: {file_id}")
+    return row[0], row[1]
+
+def get_file_list_version(db: Session) -> int:
+    """
+    Returns the version of the files table (see FileListVersion): it changes with every
+    committed insert, update or delete, including one that commits after a later
+    write. A single-row lookup.
+    """
+    return db.execute(select(FileListVersion.version).where(FileListVersion.id == 1)).scalar() or 0
+
+# Upper bound on IDs per batch get, keeping the IN list and the response bounded
+MAX_BATCH_GET_IDS = 1000
+
+def get_file_records(
+    db: Session,
+    file_ids: List[int],
+    fields: Optional[List[str]] = None
+) -> List[Optional[FileRecord]]:
+    """
+    Fetches several files in one query, with tags aggregated in SQL.
+
+    Returns:
+        List[Optional[FileRecord]]: One entry per requested ID, in request order
+                                    (duplicates included), None for IDs not found.
+    """
+    if not file_ids:
+        raise ValueError("At least one file ID must be provided.")
+    unique_ids = list(dict.fromkeys(file_ids))
+    if len(unique_ids) > MAX_BATCH_GET_IDS:
+        raise ValueError(f"At most {MAX_BATCH_GET_IDS} file IDs can be fetched at once.")
+
+    columns = _file_record_columns(fields)
+    if fields and 'id' not in fields:
+        columns.insert(0, File.id) # Needed to put results in request order
+    records = {}
+    for row in db.execute(select(*columns).where(File.id.in_(unique_ids))):
+        records[row.id] = FileRecord.from_row(row)
+    return [records.get(file_id) for file_id in file_ids]
+
+def list_file_records(db: Session, fields: Optional[List[str]] = None) -> List[FileRecord]:
+    """
+    Lists all files as read-only records in a single query, with tags aggregated in SQL.
+    """
+    statement, params = _file_records_statement(db, fields)
+    rows = db.execute(statement, params)
+    return [FileRecord.from_row(row) for row in rows]
+
+def iter_file_record_batches(
+    db: Session,
+    fields: Optional[List[str]] = None,
+    criteria: Optional[Dict[str, Any]] = None,
+    batch_size: int = 1000
+) -> Iterator[List[FileRecord]]:
+    """
+    Streams all files (or those matching search criteria) as batches of read-only records.
+
+    Rows are read through a server-side cursor (yield_per), so memory use depends
+    on batch_size rather than on the size of the result set.
+    """
+    statement, params = _file_records_statement(db, fields, criteria)
+    for partition in db.execute(statement, params, execution_options={'yield_per': batch_size}).partitions():
+        yield [FileRecord.from_row(row) for row in partition]
 
 # --- search_files (no changes needed) ---
 def search_files(db: Session, keywords: List[str]) -> List[File]:
@@ -672,22 +883,35 @@ def search_files(db: Session, keywords: List[str]) -> List[File]:
     return db.query(File).filter(or_(*search_conditions)).distinct().all()
 
 # --- CORRECTED: update_file_tags function (no changes needed) ---
+def check_new_filepath(new_filepath: str):
+    """Raises ValueError if a path given to update_file_tags does not exist on disk."""
+    if not os.path.exists(new_filepath):
+        raise ValueError(f"New file path '{new_filepath}' does not exist on the filesystem. Cannot update path.")
+
 def update_file_tags(
     db: Session,
     file_id: int,
     tags_to_add_modify: Dict[str, Any] = None,
     tags_to_remove: List[str] = None,
     new_filepath: str = None,
-    overwrite_existing: bool = False
+    overwrite_existing: bool = False,
+    verify_new_filepath: bool = True
 ) -> File:
+    """
+    Updates a file's tags and/or path. Pass verify_new_filepath=False when the caller
+    has already run check_new_filepath() (the API does so on the filesystem I/O executor).
+    """
     file_record = db.query(File).filter(File.id == file_id).first()
     if not file_record:
         raise NoResultFound(f"No metadata found for file ID: {file_id}")
 
     try:
         if new_filepath:
-            if not os.path.exists(new_filepath):
-                raise ValueError(f"New file path '{new_filepath}' does not exist on the filesystem. Cannot update path.")
+            if verify_new_filepath:
+                check_new_filepath(new_filepath)
+            deltas = collect_rollup_deltas(file_record.filepath, file_record.owner, file_record.inferred_tags, -1)
+            collect_rollup_deltas(new_filepath, file_record.owner, file_record.inferred_tags, 1, deltas)
+            apply_rollup_deltas(db, deltas)
             file_record.filepath = new_filepath
             file_record.filename = os.path.basename(new_filepath)
 
@@ -719,7 +943,13 @@ def update_file_tags(
                     )
                     db.add(tag_record)
 
-        file_record.last_modified_at = datetime.now()
+        # Bump updated_at even for tag-only changes so incremental refreshes see them
+        file_record.updated_at = datetime.now()
+
+        changed_fields = ['filename', 'filepath'] if new_filepath else []
+        if tags_to_add_modify or tags_to_remove or overwrite_existing:
+            changed_fields.append('custom_tags')
+        record_file_change(db, 'update', file_record.id, file_record.filepath, changed_fields)
 
         db.commit()
         db.refresh(file_record)
@@ -731,6 +961,148 @@ def update_file_tags(
         db.rollback()
         raise Exception(f"An unexpected error occurred while updating file metadata for ID {file_id}: {e}")
 
+def bulk_update_tags(
+    db: Session,
+    file_ids: Optional[List[int]] = None,
+    criteria: Optional[Dict[str, Any]] = None,
+    tags_to_add_modify: Optional[Dict[str, Any]] = None,
+    tags_to_remove: Optional[List[str]] = None
+) -> Dict[str, int]:
+    """
+    Adds, modifies and removes tags on many files in one transaction, using a fixed
+    number of set-based statements instead of update_file_tags() per file:
+    an UPDATE that locks the target files and bumps their updated_at, a DELETE for the
+    removed keys and an INSERT ... ON CONFLICT DO UPDATE for the added or modified ones.
+
+    Args:
+        db (Session): SQLAlchemy database session.
+        file_ids (List[int], optional): IDs of the files to change.
+        criteria (Dict[str, Any], optional): Search criteria selecting the files instead,
+                                             as accepted by search_files_by_criteria.
+        tags_to_add_modify (Dict[str, Any], optional): Tags to set on every file.
+        tags_to_remove (List[str], optional): Tag keys to remove from every file.
+
+    Returns:
+        Dict[str, int]: 'files_matched', 'files_missing' (requested IDs not found),
+                        'tags_added', 'tags_updated' (value changed) and 'tags_removed'.
+
+    Raises:
+        ValueError: If not exactly one of file_ids and criteria is given, or no tag changes are.
+    """
+    if bool(file_ids) == bool(criteria):
+        raise ValueError("Provide either a list of file IDs or search criteria to select the files.")
+    if not tags_to_add_modify and not tags_to_remove:
+        raise ValueError("Provide tags to add or modify and/or tag keys to remove.")
+
+    files = File.__table__
+    tags = Tag.__table__
+    if file_ids:
+        unique_ids = list(dict.fromkeys(file_ids))
+        conditions, params = (files.c.id == any_(bindparam('file_ids', type_=ARRAY(Integer))),), {'file_ids': unique_ids}
+    else:
+        shape, params = _search_shape_and_params(**criteria)
+        conditions = _search_conditions(shape)
+
+    try:
+        # Locking in ID order keeps concurrent bulk updates of overlapping files from deadlocking
+        targets = select(files.c.id).where(*conditions).order_by(files.c.id).with_for_update().correlate(None)
+        matched_ids = db.execute(
+            update(files).where(files.c.id.in_(targets.scalar_subquery()))
+            .values(updated_at=datetime.now()) # Seen by ETags, snapshots and incremental refreshes
+            .returning(files.c.id),
+            params
+        ).scalars().all()
+        result = {
+            'files_matched': len(matched_ids),
+            'files_missing': len(unique_ids) - len(matched_ids) if file_ids else 0,
+            'tags_added': 0,
+            'tags_updated': 0,
+            'tags_removed': 0,
+        }
+        matched = bindparam('matched_ids', matched_ids, type_=ARRAY(Integer))
+
+        if matched_ids and tags_to_remove:
+            result['tags_removed'] = db.execute(
+                delete(tags).where(tags.c.file_id == any_(matched), tags.c.key.in_(tags_to_remove))
+            ).rowcount
+
+        if matched_ids and tags_to_add_modify:
+            new_tags = values(
+                column('key', String), column('value', Text), column('value_type', String), name='new_tags'
+            ).data([
+                (key, str(typed_value), value_type)
+                for key, (typed_value, value_type) in ((key, parse_tag_value(str(value))) for key, value in tags_to_add_modify.items())
+            ])
+            upsert = pg_insert(tags).from_select(
+                ['file_id', 'key', 'value', 'value_type'],
+                select(files.c.id, new_tags.c.key, new_tags.c.value, new_tags.c.value_type)
+                .select_from(files.join(new_tags, true()))
+                .where(files.c.id == any_(matched))
+            )
+            upsert = upsert.on_conflict_do_update(
+                index_elements=['file_id', 'key'],
+                set_={'value': upsert.excluded.value, 'value_type': upsert.excluded.value_type},
+                where=tuple_(tags.c.value, tags.c.value_type).is_distinct_from(
+                    tuple_(upsert.excluded.value, upsert.excluded.value_type))
+            )
+            # xmax is 0 on freshly inserted rows; unchanged tags are not returned at all
+            upserted = upsert.returning(literal_column('xmax = 0', Boolean).label('inserted')).cte('upserted')
+            result['tags_added'], result['tags_updated'] = db.execute(
+                select(func.count().filter(upserted.c.inserted), func.count().filter(~upserted.c.inserted))
+            ).one()
+
+        if matched_ids:
+            # One change-feed event per file, written by a single INSERT ... SELECT
+            changes = FileChange.__table__
+            db.execute(pg_insert(changes).from_select(
+                ['op', 'file_id', 'filepath', 'changed_fields'],
+                select(literal('update'), files.c.id, files.c.filepath, literal(['custom_tags'], JSONB))
+                .where(files.c.id == any_(matched)).order_by(files.c.id)
+            ))
+            notify_file_changes(db)
+
+        db.commit()
+        return result
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"An unexpected error occurred while updating tags in bulk: {e}")
+
+def dedupe_tags(db: Session) -> int:
+    """
+    Deletes tag rows that repeat a file's key, keeping the most recently written one,
+    and creates the unique (file_id, key) index. As with any other tag change, the
+    affected files get a new updated_at and an 'update' change-feed event in the same
+    transaction. Returns the number of tag rows deleted.
+
+    Raises:
+        ValueError: If duplicates in another table still block one of its unique indexes.
+    """
+    try:
+        # Serialized with init_db(), which creates the same indexes
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": INIT_DB_LOCK_KEY})
+        deleted = delete_duplicate_rows(db.connection(), tags_unique_index())
+        file_ids = sorted({file_id for file_id, _ in deleted})
+        if file_ids:
+            files = File.__table__
+            changed = db.execute(
+                update(files).where(files.c.id.in_(file_ids))
+                .values(updated_at=datetime.now()) # Seen by ETags, snapshots and incremental refreshes
+                .returning(files.c.id, files.c.filepath)
+            ).all()
+            record_file_changes(db, [
+                {'op': 'update', 'file_id': file_id, 'filepath': filepath, 'changed_fields': ['custom_tags']}
+                for file_id, filepath in sorted(changed)
+            ])
+        create_missing_indexes(db.connection())
+        db.commit()
+        return len(deleted)
+    except ValueError:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"An unexpected error occurred while removing duplicate tags: {e}")
+
 # def search_files_numeric_range(db: Session, min_size_bytes: int = None, max_size_bytes: int = None) -> List[File]:
 #     """
 #     Search for files based on numeric range conditions, particularly file size.
@@ -763,11 +1135,10 @@ def update_file_tags(
     #     query = query.filter(*conditions)
 
     # return query.all()
-def _get_json_date_column(field_name: str):
+def inferred_tag_column(field_name: str):
     """
-    Helper to get a SQLAlchemy column expression for date fields
-    within inferred_tags, handling the double-quoted string storage.
-    Casts to TIMESTAMP for comparison.
+    Returns a SQL expression for one inferred_tags value as text, handling the
+    double-quoted string storage (inferred_tags holds a json.dumps() string).
     """
     # Cast to String to ensure string functions work correctly
     raw_string_col = cast(File.inferred_tags, String)
@@ -784,12 +1155,17 @@ def _get_json_date_column(field_name: str):
         text("'{}'") # Then coalesce NULL to '{}'
     )
     
-    # Now cast the (hopefully valid) JSON string to JSONB, extract, and cast to TIMESTAMP
-    return cast(json_text_expr, JSONB).op('->>')(field_name).cast(TIMESTAMP)
+    # Now cast the (hopefully valid) JSON string to JSONB and extract the value
+    return cast(json_text_expr, JSONB).op('->>')(field_name)
 
-# --- Comprehensive Search Function ---
-def search_files_by_criteria(
-    db: Session,
+def _get_json_date_column(field_name: str):
+    """
+    Helper to get a SQLAlchemy column expression for date fields
+    within inferred_tags. Casts to TIMESTAMP for comparison.
+    """
+    return inferred_tag_column(field_name).cast(TIMESTAMP)
+
+def _search_shape_and_params(
     keywords: Optional[List[str]] = None,
     min_size_bytes: Optional[int] = None,
     max_size_bytes: Optional[int] = None,
@@ -799,24 +1175,46 @@ def search_files_by_criteria(
     modified_before: Optional[datetime] = None,
     accessed_after: Optional[datetime] = None,
     accessed_before: Optional[datetime] = None
-) -> List[File]:
+) -> Tuple[Tuple[Any, ...], Dict[str, Any]]:
     """
-    Searches for files based on a combination of criteria:
-    keywords, file size range, and creation/modification/access date ranges.
+    Splits search criteria into their shape (keyword count and the range criteria
+    given) and the bind parameter values for _search_conditions(shape).
     """
-    query = db.query(File)
-
-    # 1. Apply Keyword Filters
-    if keywords:
+    values = {
+        'min_size_bytes': min_size_bytes,
+        'max_size_bytes': max_size_bytes,
+        'created_after': created_after,
+        'created_before': created_before + END_OF_DAY if created_before else None,
+        'modified_after': modified_after,
+        'modified_before': modified_before + END_OF_DAY if modified_before else None,
+        'accessed_after': accessed_after,
+        'accessed_before': accessed_before + END_OF_DAY if accessed_before else None,
+    }
+    # Dates are only applied when truthy, sizes whenever given (matching the original filters)
+    params = {name: value for name, value in values.items()
+              if (value is not None if name.endswith('_bytes') else bool(value))}
+    for position, keyword in enumerate(keywords or ()):
+        params[f'keyword_{position}'] = f"%{keyword.lower()}%"
+    shape = (len(keywords or ()),) + tuple(name in params for name in SEARCH_RANGE_CRITERIA)
+    return shape, params
+
+@functools.lru_cache(maxsize=SEARCH_SHAPE_CACHE_SIZE)
+def _search_conditions(shape: Tuple[Any, ...]) -> tuple:
+    """Builds the WHERE conditions for a search shape, with bind parameters for all values."""
+    keyword_count, *given = shape
+    given = {name for name, present in zip(SEARCH_RANGE_CRITERIA, given) if present}
+    conditions = []
+
+    # 1. Keyword filters: any of six columns (or a tag key/value) contains any keyword
+    if keyword_count:
         keyword_conditions = []
-        for keyword in keywords:
-            search_pattern = f"%{keyword.lower()}%"
+        for position in range(keyword_count):
+            search_pattern = bindparam(f'keyword_{position}', type_=String)
             keyword_conditions.append(func.lower(File.filename).like(search_pattern))
             keyword_conditions.append(func.lower(File.filepath).like(search_pattern))
             keyword_conditions.append(func.lower(File.owner).like(search_pattern))
             keyword_conditions.append(func.lower(File.created_by).like(search_pattern))
             # Search within the raw JSON string for inferred_tags
-           # Explicitly cast to String before applying lower() for keyword search
             keyword_conditions.append(func.lower(cast(File.inferred_tags, String)).like(search_pattern))
             keyword_conditions.append(
                 File.tags.any(
@@ -826,61 +1224,206 @@ def search_files_by_criteria(
                     )
                 )
             )
-        query = query.filter(or_(*keyword_conditions))
-    
-    # 2. Apply Numeric (Size) Filters
-    if min_size_bytes is not None or max_size_bytes is not None:
-        size_conditions = []
-        # Cast to String first for string functions
-        raw_string_col = cast(File.inferred_tags, String)
-        # Replace escaped double quotes (\") with actual double quotes (")
-        cleaned_and_trimmed_string = func.trim(func.replace(raw_string_col, '\"', '"'), '"')
-
-        # Coalesce to an empty JSON object string if trimmed content is empty or NULL
-        json_text_expr = func.coalesce(
-            func.nullif(cleaned_and_trimmed_string, ''), 
-            text("'{}'")
-        )
-        file_size_col = cast(json_text_expr, JSONB).op('->>')('file_size').cast(Integer)
-        
-        if min_size_bytes is not None:
-            size_conditions.append(file_size_col >= min_size_bytes)
-        if max_size_bytes is not None:
-            size_conditions.append(file_size_col <= max_size_bytes)
-        
-        if size_conditions:
-            query = query.filter(*size_conditions)
-
-    # 3. Apply Date Filters
-    date_conditions = []
-
-    # File.created_at and File.updated_at are already DateTime columns
-    if created_after:
-        date_conditions.append(File.created_at >= created_after)
-    if created_before:
-        # Add one day to search before to include the full day
-        date_conditions.append(File.created_at <= created_before + timedelta(days=1, microseconds=-1)) 
-    
-    if modified_after:
-        date_conditions.append(File.updated_at >= modified_after)
-    if modified_before:
-        # Add one day to search before to include the full day
-        date_conditions.append(File.updated_at <= modified_before + timedelta(days=1, microseconds=-1))
-
-    # Dates from inferred_tags (which are strings) need special handling
-    # last_accessed_at, created_at_fs, last_modified_at (within inferred_tags JSON)
-    
-    # For `last_accessed_at` from inferred_tags
-    inferred_accessed_at_col = _get_json_date_column('last_accessed_at')
-    if accessed_after:
-        date_conditions.append(inferred_accessed_at_col >= accessed_after)
-    if accessed_before:
-        date_conditions.append(inferred_accessed_at_col <= accessed_before + timedelta(days=1, microseconds=-1))
+        conditions.append(or_(*keyword_conditions))
+
+    # 2. Size filters on inferred_tags.file_size
+    file_size_col = inferred_tag_column('file_size').cast(Integer)
+    if 'min_size_bytes' in given:
+        conditions.append(file_size_col >= bindparam('min_size_bytes'))
+    if 'max_size_bytes' in given:
+        conditions.append(file_size_col <= bindparam('max_size_bytes'))
+
+    # 3. Date filters: created_at/updated_at columns, last_accessed_at from inferred_tags
+    for column, after, before in (
+        (File.created_at, 'created_after', 'created_before'),
+        (File.updated_at, 'modified_after', 'modified_before'),
+        (_get_json_date_column('last_accessed_at'), 'accessed_after', 'accessed_before'),
+    ):
+        if after in given:
+            conditions.append(column >= bindparam(after))
+        if before in given:
+            conditions.append(column <= bindparam(before))
+
+    return tuple(conditions)
+
+def _build_search_query(db: Session, **criteria):
+    """
+    Builds the filtered File query shared by search, count and exists lookups.
+    Accepts the criteria of search_files_by_criteria; the values travel as query params.
+    """
+    shape, params = _search_shape_and_params(**criteria)
+    return db.query(File).filter(*_search_conditions(shape)).params(**params)
+
+# --- Comprehensive Search Function ---
+def search_files_by_criteria(
+    db: Session,
+    keywords: Optional[List[str]] = None,
+    min_size_bytes: Optional[int] = None,
+    max_size_bytes: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    modified_after: Optional[datetime] = None,
+    modified_before: Optional[datetime] = None,
+    accessed_after: Optional[datetime] = None,
+    accessed_before: Optional[datetime] = None,
+    fields: Optional[List[str]] = None
+) -> List[File]:
+    """
+    Searches for files based on a combination of criteria:
+    keywords, file size range, and creation/modification/access date ranges.
+    If `fields` is given, only those FILE_FIELDS are loaded.
+    """
+    query = _build_search_query(
+        db,
+        keywords=keywords,
+        min_size_bytes=min_size_bytes,
+        max_size_bytes=max_size_bytes,
+        created_after=created_after,
+        created_before=created_before,
+        modified_after=modified_after,
+        modified_before=modified_before,
+        accessed_after=accessed_after,
+        accessed_before=accessed_before
+    )
+    return _apply_field_projection(query, fields).distinct().all()
+
+def search_file_records(db: Session, fields: Optional[List[str]] = None, **criteria) -> List[FileRecord]:
+    """
+    Read-only variant of search_files_by_criteria: returns matching files as
+    FileRecords in a single query, with tags aggregated in SQL.
+    """
+    statement, params = _file_records_statement(db, fields, criteria)
+    rows = db.execute(statement, params)
+    return [FileRecord.from_row(row) for row in rows]
+
+# Planner estimates below this many rows are replaced by an exact count,
+# since counting a small result set is cheap and estimates are least reliable there.
+APPROXIMATE_COUNT_THRESHOLD = 100000
+
+def _estimate_query_rows(db: Session, query) -> int:
+    """
+    Returns the PostgreSQL planner's row estimate for a query without executing it.
+    """
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    params = compiled.params
+    if compiled.positional: # e.g. asyncpg's $1, $2 placeholders
+        params = tuple(params[name] for name in compiled.positiontup)
+    result = db.connection().exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + str(compiled), params
+    ).scalar()
+    plan = json.loads(result) if isinstance(result, str) else result
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+def count_files_by_criteria(db: Session, approximate: bool = False, **criteria) -> Tuple[int, bool]:
+    """
+    Counts files matching the same criteria as search_files_by_criteria,
+    using SELECT count(*) on the server instead of loading File objects.
+
+    Args:
+        db (Session): SQLAlchemy database session.
+        approximate (bool): If True, use the planner's row estimate when it is at
+                            least APPROXIMATE_COUNT_THRESHOLD rows.
+        **criteria: Keyword arguments accepted by search_files_by_criteria.
+
+    Returns:
+        Tuple[int, bool]: The count, and whether it is a planner estimate.
+    """
+    query = _build_search_query(db, **criteria)
+
+    if approximate:
+        estimate = _estimate_query_rows(db, query)
+        if estimate >= APPROXIMATE_COUNT_THRESHOLD:
+            return estimate, True
+
+    count = query.with_entities(func.count(File.id)).scalar()
+    return count or 0, False
 
-    if date_conditions:
-        query = query.filter(*date_conditions)
+@functools.lru_cache(maxsize=SEARCH_SHAPE_CACHE_SIZE)
+def _cached_exists_statement(shape: Tuple[Any, ...]):
+    return select(select(File.id).where(*_search_conditions(shape)).exists())
 
-    return query.distinct().all()
+def files_exist_by_criteria(db: Session, **criteria) -> bool:
+    """
+    Returns True if at least one file matches the same criteria as
+    search_files_by_criteria, using a server-side EXISTS check.
+    """
+    shape, params = _search_shape_and_params(**criteria)
+    return bool(db.execute(_cached_exists_statement(shape), params).scalar())
+
+def _escape_like(value: str) -> str:
+    """Escapes LIKE wildcards so user input is matched literally."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def find_files_by_name(
+    db: Session,
+    name: str,
+    limit: int = 20,
+    min_similarity: float = 0.3,
+    fields: Optional[List[str]] = None
+) -> List[Tuple[FileRecord, float]]:
+    """
+    Finds files whose filename starts with or is similar to `name`, ranked with
+    prefix matches first and then by trigram similarity (pg_trgm).
+
+    Both candidate lookups are served by the ix_files_filename_trgm GiST index
+    (ILIKE for prefixes, the % operator and <-> KNN ordering for similarity)
+    and are limited to `limit` rows each, so only the top matches are ranked.
+
+    Args:
+        db (Session): SQLAlchemy database session.
+        name (str): The (possibly misspelled or partial) filename to look for.
+        limit (int): Maximum number of matches to return.
+        min_similarity (float): Similarity threshold (0-1) for fuzzy matches.
+        fields (List[str], optional): FILE_FIELDS to load for each match.
+
+    Returns:
+        List[Tuple[FileRecord, float]]: Matching files with their similarity score, best first.
+    """
+    name = name.strip()
+    if not name:
+        raise ValueError("A filename to search for must be provided.")
+    if limit <= 0:
+        raise ValueError("Limit must be a positive integer.")
+
+    # Threshold used by the % operator, scoped to the current transaction
+    db.execute(
+        select(func.set_config('pg_trgm.similarity_threshold', str(min_similarity), True))
+    )
+
+    similarity = func.similarity(File.filename, name)
+    prefix_match = File.filename.ilike(_escape_like(name) + '%', escape='\\')
+
+    prefix_candidates = (
+        select(File.id, literal(True).label('is_prefix'), similarity.label('score'))
+        .where(prefix_match)
+        .order_by(func.length(File.filename))
+        .limit(limit)
+    )
+    fuzzy_candidates = (
+        select(File.id, prefix_match.label('is_prefix'), similarity.label('score'))
+        .where(File.filename.op('%')(name))
+        .order_by(File.filename.op('<->')(name))
+        .limit(limit)
+    )
+    candidates = union_all(prefix_candidates, fuzzy_candidates).subquery()
+    ranked = (
+        select(
+            candidates.c.id,
+            func.bool_or(candidates.c.is_prefix).label('is_prefix'),
+            func.max(candidates.c.score).label('score')
+        )
+        .group_by(candidates.c.id)
+        .subquery()
+    )
+
+    statement = (
+        select(*_file_record_columns(fields), ranked.c.score)
+        .select_from(File)
+        .join(ranked, File.id == ranked.c.id)
+        .order_by(ranked.c.is_prefix.desc(), ranked.c.score.desc(), File.id)
+        .limit(limit)
+    )
+    return [(FileRecord.from_row(row), float(row.score)) for row in db.execute(statement)]
 
 # --- delete_file_metadata (no changes needed) ---
 def delete_file_metadata(db: Session, file_id: int):
@@ -889,6 +1432,8 @@ def delete_file_metadata(db: Session, file_id: int):
         raise NoResultFound(f"No metadata found for file ID: {file_id}")
 
     try:
+        apply_rollup_deltas(db, collect_rollup_deltas(file_record.filepath, file_record.owner, file_record.inferred_tags, -1))
+        record_file_change(db, 'delete', file_record.id, file_record.filepath)
         db.delete(file_record)
         db.commit()
     except NoResultFound:
@@ -916,7 +1461,20 @@ def rename_file_entry(db: Session, file_id: int, new_name: str) -> File:
     file_record = db.query(File).filter(File.id == file_id).first()
     if not file_record:
         raise NoResultFound(f"No metadata found for file ID: {file_id}")
-    old_filepath = file_record.filepath
+    # Step 1: Rename the file on the disk. If this fails the DB is left untouched.
+    new_filepath = rename_file_on_disk(file_record.filepath, new_name)
+    # Step 2: Update the database record
+    return record_file_rename(db, file_id, new_filepath)
+
+def rename_file_on_disk(old_filepath: str, new_name: str) -> str:
+    """
+    Filesystem half of rename_file_entry: renames the file within its directory
+    and returns the new path.
+    Raises:
+        FileNotFoundError: If the original file does not exist on disk.
+        FileExistsError: If a file with the new name already exists.
+        PermissionError, OSError: If the rename itself fails.
+    """
     # Construct new full path
     directory = os.path.dirname(old_filepath)
     new_filepath = os.path.join(directory, new_name)
@@ -926,27 +1484,28 @@ def rename_file_entry(db: Session, file_id: int, new_name: str) -> File:
         # Decide on behavior here: overwrite, raise error, or prompt user?
         # For simplicity, raising an error if new_filepath exists.
         raise FileExistsError(f"A file with the new name '{new_filepath}' already exists at the destination.")
+    os.rename(old_filepath, new_filepath)
+    return new_filepath
+
+def record_file_rename(db: Session, file_id: int, new_filepath: str) -> File:
+    """
+    Database half of rename_file_entry: points the record at a file that
+    rename_file_on_disk() has already moved to `new_filepath`.
+    """
+    file_record = db.query(File).filter(File.id == file_id).first()
+    if not file_record:
+        raise NoResultFound(f"No metadata found for file ID: {file_id}")
     try:
-        # Step 1: Rename the file on the disk
-        os.rename(old_filepath, new_filepath)
-        # Step 2: Update the database record
+        deltas = collect_rollup_deltas(file_record.filepath, file_record.owner, file_record.inferred_tags, -1)
+        collect_rollup_deltas(new_filepath, file_record.owner, file_record.inferred_tags, 1, deltas)
+        apply_rollup_deltas(db, deltas)
         file_record.filepath = new_filepath
-        file_record.filename = new_name # Update filename to the new name
-        file_record.last_modified_at = datetime.now() # Record this change
+        file_record.filename = os.path.basename(new_filepath) # Update filename to the new name
+        file_record.updated_at = datetime.now() # Record this change
+        record_file_change(db, 'rename', file_record.id, new_filepath, ['filename', 'filepath'])
         db.commit()
         db.refresh(file_record)
         return file_record
-    except NoResultFound: # Should be caught by the initial check, but defensive
-        db.rollback()
-        raise
-    except FileExistsError:
-        db.rollback()
-        raise # Re-raise if we explicitly caught it above
-    except (PermissionError, OSError) as e:
-        db.rollback()
-        # If disk rename failed, ensure DB isn't updated.
-        # It's important that DB change only commits if disk change succeeds.
-        raise e # Re-raise to be caught by CLI
     except Exception as e:
         db.rollback()
         raise Exception(f"An unexpected error occurred while renaming file ID {file_id}: {e}")
@@ -1019,7 +1578,8 @@ def validate_file_metadata(
     check_all: bool = False,
     criteria: Optional[Dict[str, Any]] = None,
     tag_key: Optional[str] = None,
-    tag_value: Optional[str] = None
+    tag_value: Optional[str] = None,
+    check_disk: bool = True
 ) -> List[Dict[str, Any]]:
     """
     Validates file metadata records against file system existence and tag presence.
@@ -1031,43 +1591,45 @@ def validate_file_metadata(
                                             (e.g., {'id': 1, 'filename': 'report.pdf'}).
         tag_key (str, optional): Key of a tag to check for existence.
         tag_value (str, optional): Specific value for the tag_key to check.
+        check_disk (bool): If False, 'disk_exists' is left as None for the caller to fill
+                           in with files_exist_on_disk() (the API runs it on the I/O executor).
 
     Returns:
         List[Dict[str, Any]]: A list of dictionaries, each describing a validation result
                               (e.g., {'id': ..., 'filepath': ..., 'disk_exists': ..., 'tag_status': ...}).
     """
-    query = db.query(File)
+    columns = [File.id, File.filename, File.filepath]
+    if tag_key:
+        # Check tag presence in SQL rather than loading every Tag row
+        tag_filter = (Tag.file_id == File.id) & (Tag.key == tag_key)
+        if tag_value is not None:
+            tag_filter = tag_filter & (Tag.value == tag_value)
+        columns.append(select(Tag.id).where(tag_filter).correlate(File).exists().label('tag_found'))
+    statement = select(*columns).order_by(File.id)
 
     # Apply initial filtering based on criteria if not checking all records
     if not check_all and criteria:
         if 'id' in criteria:
-            query = query.filter(File.id == criteria['id'])
+            statement = statement.where(File.id == criteria['id'])
         if 'filename' in criteria:
-            query = query.filter(File.filename == criteria['filename'])
+            statement = statement.where(File.filename == criteria['filename'])
         if 'filepath' in criteria:
-            query = query.filter(File.filepath == criteria['filepath'])
+            statement = statement.where(File.filepath == criteria['filepath'])
 
-    files_to_validate = query.all()
     validation_results = []
 
-    for file_record in files_to_validate:
+    for row in db.execute(statement):
         result = {
-            'id': file_record.id,
-            'filename': file_record.filename,
-            'filepath': file_record.filepath,
-            'disk_exists': os.path.exists(file_record.filepath),
+            'id': row.id,
+            'filename': row.filename,
+            'filepath': row.filepath,
+            'disk_exists': os.path.exists(row.filepath) if check_disk else None,
             'tag_status': None # Initialize tag status
         }
 
         # Perform tag existence check if tag_key is provided
         if tag_key:
-            tag_found = False
-            for tag in file_record.tags:
-                if tag.key == tag_key:
-                    # Check for specific value if provided, otherwise just key existence
-                    if tag_value is None or tag.value == tag_value:
-                        tag_found = True
-                        break
+            tag_found = row.tag_found
             
             # Formulate the tag status message
             if tag_found:
@@ -1085,3 +1647,394 @@ def validate_file_metadata(
         validation_results.append(result)
 
     return validation_results
+
+def files_exist_on_disk(filepaths: Sequence[str]) -> List[bool]:
+    """Checks each path with os.path.exists, in order."""
+    return [os.path.exists(filepath) for filepath in filepaths]
+
+# --- Saved Searches (Smart Folders) ---
+
+# Criteria accepted by search_files_by_criteria that can be stored in a saved search
+SEARCH_CRITERIA_KEYS = (
+    'keywords', 'min_size_bytes', 'max_size_bytes',
+    'created_after', 'created_before', 'modified_after', 'modified_before',
+    'accessed_after', 'accessed_before'
+)
+_DATE_CRITERIA_KEYS = (
+    'created_after', 'created_before', 'modified_after', 'modified_before',
+    'accessed_after', 'accessed_before'
+)
+
+# Files updated this long before the previous refresh are re-evaluated again, to cover
+# clock skew between writers and transactions that committed after the refresh started.
+SAVED_SEARCH_REFRESH_OVERLAP = timedelta(minutes=1)
+
+def _serialize_search_criteria(criteria: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts search criteria to a JSON-compatible dict, dropping empty values."""
+    unknown_keys = [key for key in criteria if key not in SEARCH_CRITERIA_KEYS]
+    if unknown_keys:
+        raise ValueError(f"Unknown search criteria: {', '.join(unknown_keys)}.")
+
+    serialized = {}
+    for key, value in criteria.items():
+        if value is None or value == []:
+            continue
+        serialized[key] = value.isoformat() if isinstance(value, datetime) else value
+    if not serialized:
+        raise ValueError("A saved search needs at least one search criterion.")
+    return serialized
+
+def _deserialize_search_criteria(criteria: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts stored saved search criteria back into search_files_by_criteria arguments."""
+    return {
+        key: datetime.fromisoformat(value) if key in _DATE_CRITERIA_KEYS else value
+        for key, value in criteria.items()
+    }
+
+def get_saved_search(db: Session, name: str) -> SavedSearch:
+    saved_search = db.query(SavedSearch).filter(SavedSearch.name == name).first()
+    if not saved_search:
+        raise NoResultFound(f"No saved search found with name: {name}")
+    return saved_search
+
+def list_saved_searches(db: Session) -> List[SavedSearch]:
+    return db.query(SavedSearch).order_by(SavedSearch.name).all()
+
+def create_saved_search(
+    db: Session,
+    name: str,
+    criteria: Dict[str, Any],
+    created_by: Optional[str] = None
+) -> SavedSearch:
+    """
+    Saves a named search and materializes its current result set.
+
+    Args:
+        db (Session): SQLAlchemy database session.
+        name (str): Unique name of the saved search.
+        criteria (Dict[str, Any]): Keyword arguments for search_files_by_criteria.
+        created_by (str, optional): User that created the saved search.
+
+    Returns:
+        SavedSearch: The new, fully refreshed saved search.
+
+    Raises:
+        ValueError: If the name is taken or the criteria are empty or invalid.
+    """
+    if db.query(SavedSearch.id).filter(SavedSearch.name == name).first():
+        raise ValueError(f"A saved search named '{name}' already exists.")
+
+    saved_search = SavedSearch(
+        name=name,
+        criteria=_serialize_search_criteria(criteria),
+        created_by=created_by
+    )
+    try:
+        db.add(saved_search)
+        db.flush()
+        _refresh_saved_search_members(db, saved_search)
+        db.commit()
+        db.refresh(saved_search)
+        return saved_search
+    except IntegrityError:
+        db.rollback()
+        raise ValueError(f"A saved search named '{name}' already exists.")
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"An unexpected error occurred while creating saved search '{name}': {e}")
+
+def _refresh_saved_search_members(db: Session, saved_search: SavedSearch) -> int:
+    """
+    Brings the membership rows of a saved search up to date within the current transaction.
+
+    The first refresh evaluates the full search. Later refreshes only re-evaluate files
+    whose updated_at is newer than the previous refresh (minus SAVED_SEARCH_REFRESH_OVERLAP);
+    deleted files leave the membership table through the ON DELETE CASCADE foreign key.
+
+    Returns:
+        int: The number of membership rows inserted.
+    """
+    refresh_started_at = datetime.now() # Same clock and convention as File.updated_at
+    search_query = _build_search_query(db, **_deserialize_search_criteria(saved_search.criteria))
+    members = SavedSearchMember.__table__
+
+    if saved_search.last_refreshed_at is None:
+        db.execute(members.delete().where(members.c.saved_search_id == saved_search.id))
+    else:
+        changed_since = saved_search.last_refreshed_at - SAVED_SEARCH_REFRESH_OVERLAP
+        changed_file_ids = select(File.id).where(File.updated_at >= changed_since)
+        db.execute(
+            members.delete().where(
+                members.c.saved_search_id == saved_search.id,
+                members.c.file_id.in_(changed_file_ids)
+            )
+        )
+        search_query = search_query.filter(File.updated_at >= changed_since)
+
+    matching_rows = search_query.with_entities(literal(saved_search.id), File.id).statement
+    result = db.execute(
+        pg_insert(members)
+        .from_select(['saved_search_id', 'file_id'], matching_rows)
+        .on_conflict_do_nothing()
+    )
+    saved_search.last_refreshed_at = refresh_started_at
+    return result.rowcount
+
+def refresh_saved_search(db: Session, name: str) -> int:
+    """
+    Incrementally refreshes the materialized result set of a saved search.
+
+    Returns:
+        int: The number of files (re-)added to the saved search by this refresh.
+    """
+    saved_search = get_saved_search(db, name)
+    try:
+        added = _refresh_saved_search_members(db, saved_search)
+        db.commit()
+        return added
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"An unexpected error occurred while refreshing saved search '{name}': {e}")
+
+def list_saved_search_files(
+    db: Session,
+    name: str,
+    refresh: bool = False,
+    fields: Optional[List[str]] = None
+) -> List[FileRecord]:
+    """
+    Returns the files in a saved search's materialized result set, by file ID.
+    If `refresh` is True, the result set is incrementally refreshed first.
+    """
+    saved_search = get_saved_search(db, name)
+    if refresh:
+        refresh_saved_search(db, name)
+
+    statement = (
+        select(*_file_record_columns(fields))
+        .select_from(File)
+        .join(SavedSearchMember, SavedSearchMember.file_id == File.id)
+        .where(SavedSearchMember.saved_search_id == saved_search.id)
+        .order_by(File.id)
+    )
+    return [FileRecord.from_row(row) for row in db.execute(statement)]
+
+def delete_saved_search(db: Session, name: str, created_by: Optional[str] = None):
+    """
+    Deletes a saved search, optionally only if `created_by` created it.
+
+    Raises:
+        NoResultFound: If no saved search has this name.
+        PermissionError: If `created_by` is given and another user created the saved search.
+    """
+    saved_search = get_saved_search(db, name)
+    if created_by is not None and saved_search.created_by != created_by:
+        raise PermissionError(f"Saved search '{name}' can only be deleted by the user who created it or an admin.")
+    try:
+        db.delete(saved_search)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"An unexpected error occurred while deleting saved search '{name}': {e}")
+
+# --- Storage rollups ---
+# File counts and byte totals per directory, owner and mime type are kept in
+# storage_rollups and adjusted in the same transaction as every change to a file row.
+
+ROLLUP_DIMENSIONS = ('directory', 'owner', 'mime')
+
+# Rows per INSERT when applying a large set of rollup deltas (e.g., a rebuild)
+ROLLUP_UPSERT_BATCH_SIZE = 1000
+
+def _directory_ancestors(filepath: str) -> List[Tuple[str, Optional[str]]]:
+    """Returns (directory, parent directory) for every directory containing `filepath`."""
+    ancestors = []
+    directory = os.path.dirname(filepath)
+    while directory:
+        parent = os.path.dirname(directory)
+        if parent == directory: # Reached the root
+            ancestors.append((directory, None))
+            break
+        ancestors.append((directory, parent or None))
+        directory = parent
+    return ancestors
+
+def collect_rollup_deltas(
+    filepath: str,
+    owner: Optional[str],
+    inferred_tags: Any,
+    sign: int,
+    deltas: Optional[Dict[Tuple[str, str], List]] = None
+) -> Dict[Tuple[str, str], List]:
+    """
+    Adds one file's contribution (sign=1) or its removal (sign=-1) to `deltas`,
+    a {(dimension, key): [parent, file_count, total_bytes]} dict, and returns it.
+    """
+    if deltas is None:
+        deltas = {}
+    inferred_data = parse_inferred_tags(inferred_tags)
+    if not isinstance(inferred_data, dict):
+        inferred_data = {}
+    try:
+        file_size = int(inferred_data.get('file_size') or 0)
+    except (TypeError, ValueError):
+        file_size = 0
+
+    entries = [('directory', directory, parent) for directory, parent in _directory_ancestors(filepath)]
+    entries.append(('owner', owner or '', None))
+    entries.append(('mime', inferred_data.get('mime_type') or 'application/octet-stream', None))
+    for dimension, key, parent in entries:
+        delta = deltas.setdefault((dimension, key), [parent, 0, 0])
+        delta[1] += sign
+        delta[2] += sign * file_size
+    return deltas
+
+def apply_rollup_deltas(db: Session, deltas: Dict[Tuple[str, str], List]):
+    """
+    Applies rollup deltas with INSERT ... ON CONFLICT DO UPDATE and removes rows
+    that no longer count any file. Rows are written in key order so concurrent
+    writers lock them in the same order. Does not commit.
+    """
+    rows = [
+        {'dimension': dimension, 'key': key, 'parent': parent, 'file_count': file_count, 'total_bytes': total_bytes}
+        for (dimension, key), (parent, file_count, total_bytes) in sorted(deltas.items())
+        if file_count or total_bytes
+    ]
+    table = StorageRollup.__table__
+    for start in range(0, len(rows), ROLLUP_UPSERT_BATCH_SIZE):
+        batch = rows[start:start + ROLLUP_UPSERT_BATCH_SIZE]
+        statement = pg_insert(table).values(batch)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=['dimension', 'key'],
+            set_={
+                'file_count': table.c.file_count + statement.excluded.file_count,
+                'total_bytes': table.c.total_bytes + statement.excluded.total_bytes,
+            }
+        ))
+        db.execute(
+            delete(table)
+            .where(tuple_(table.c.dimension, table.c.key).in_([(row['dimension'], row['key']) for row in batch]))
+            .where(table.c.file_count <= 0)
+        )
+
+def rebuild_storage_rollups(db: Session) -> int:
+    """
+    Recomputes all storage rollups from the files table (for existing data or after
+    out-of-band changes). File writes are blocked until it commits, and so are other
+    rebuilds: two running at once would each add every file to the rollups.
+    Returns the number of files counted.
+    """
+    try:
+        # Same order as file writes (files, then storage_rollups); EXCLUSIVE conflicts with itself
+        db.execute(text("LOCK TABLE files IN SHARE MODE"))
+        db.execute(text("LOCK TABLE storage_rollups IN EXCLUSIVE MODE"))
+        db.query(StorageRollup).delete(synchronize_session=False)
+        deltas = {}
+        file_count = 0
+        rows = db.execute(
+            select(File.filepath, File.owner, File.inferred_tags).execution_options(yield_per=5000)
+        )
+        for row in rows:
+            collect_rollup_deltas(row.filepath, row.owner, row.inferred_tags, 1, deltas)
+            file_count += 1
+        apply_rollup_deltas(db, deltas)
+        db.commit()
+        return file_count
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"An unexpected error occurred while rebuilding storage rollups: {e}")
+
+def get_storage_usage(
+    db: Session,
+    dimension: str = 'directory',
+    path: Optional[str] = None,
+    limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Returns du-style usage from the rollups.
+
+    For 'directory', the totals are those of `path` (default: the filesystem root)
+    and the entries are its immediate subdirectories. For 'owner' and 'mime', the
+    entries are all owners or mime types and the totals cover every file.
+    Entries are ordered by total bytes, largest first.
+    """
+    if dimension not in ROLLUP_DIMENSIONS:
+        raise ValueError(f"Unknown usage dimension '{dimension}'. Expected one of: {', '.join(ROLLUP_DIMENSIONS)}.")
+    if limit is not None and limit <= 0:
+        raise ValueError("Limit must be a positive integer.")
+
+    query = db.query(StorageRollup).filter(StorageRollup.dimension == dimension)
+    if dimension == 'directory':
+        path = os.path.normpath(path or os.sep)
+        query = query.filter(StorageRollup.parent == path)
+        total = db.get(StorageRollup, ('directory', path))
+        file_count = total.file_count if total else 0
+        total_bytes = total.total_bytes if total else 0
+    else:
+        path = None
+        file_count, total_bytes = db.query(
+            func.coalesce(func.sum(StorageRollup.file_count), 0),
+            func.coalesce(func.sum(StorageRollup.total_bytes), 0)
+        ).filter(StorageRollup.dimension == dimension).one()
+
+    query = query.order_by(StorageRollup.total_bytes.desc(), StorageRollup.key)
+    if limit is not None:
+        query = query.limit(limit)
+
+    return {
+        'dimension': dimension,
+        'path': path,
+        'file_count': int(file_count),
+        'total_bytes': int(total_bytes),
+        'entries': [rollup.to_dict() for rollup in query.all()],
+    }
+
+# --- Async variants ---
+# Used by the FastAPI endpoints. Each one runs the synchronous function above on an
+# AsyncSession through run_sync(): the same code issues its queries through asyncpg
+# and awaits them, so concurrent requests overlap their database I/O instead of
+# blocking the event loop. Functions that also touch the filesystem are not wrapped;
+# their filesystem halves run on the I/O executor (filemeta/io_executor.py) instead.
+
+def _async_variant(function):
+    @functools.wraps(function)
+    async def run(db: AsyncSession, *args, **kwargs):
+        return await db.run_sync(function, *args, **kwargs)
+    run.__name__ = run.__qualname__ = f"{function.__name__}_async"
+    run.__doc__ = f"Async variant of {function.__name__}() for an AsyncSession."
+    return run
+
+def _with_tags_loaded(function):
+    """
+    Loads File.tags on the File a function returns, so File.to_dict() works
+    outside run_sync() where lazy loading is not possible.
+    """
+    @functools.wraps(function)
+    def run(db: Session, *args, **kwargs):
+        file_record = function(db, *args, **kwargs)
+        file_record.tags  # triggers the lazy load
+        return file_record
+    return run
+
+get_file_record_async = _async_variant(get_file_record)
+get_file_records_async = _async_variant(get_file_records)
+get_file_version_async = _async_variant(get_file_version)
+get_file_list_version_async = _async_variant(get_file_list_version)
+list_file_records_async = _async_variant(list_file_records)
+search_file_records_async = _async_variant(search_file_records)
+count_files_by_criteria_async = _async_variant(count_files_by_criteria)
+files_exist_by_criteria_async = _async_variant(files_exist_by_criteria)
+find_files_by_name_async = _async_variant(find_files_by_name)
+delete_file_metadata_async = _async_variant(delete_file_metadata)
+list_and_search_tags_async = _async_variant(list_and_search_tags)
+create_saved_search_async = _async_variant(create_saved_search)
+list_saved_searches_async = _async_variant(list_saved_searches)
+refresh_saved_search_async = _async_variant(refresh_saved_search)
+list_saved_search_files_async = _async_variant(list_saved_search_files)
+delete_saved_search_async = _async_variant(delete_saved_search)
+get_storage_usage_async = _async_variant(get_storage_usage)
+add_file_metadata_async = _async_variant(_with_tags_loaded(add_file_metadata))
+update_file_tags_async = _async_variant(_with_tags_loaded(update_file_tags))
+bulk_update_tags_async = _async_variant(bulk_update_tags)
+record_file_rename_async = _async_variant(_with_tags_loaded(record_file_rename))
+validate_file_metadata_async = _async_variant(validate_file_metadata)
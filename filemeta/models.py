@@ -76,7 +76,7 @@ class Tag(Base):
         # Add more types as needed (e.g., list, dict if you allow complex tag values)
         return self.value # Default to string
 # filemeta/models.py
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, Boolean, Index, DDL, event, func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -85,6 +85,51 @@ import json
 
 Base = declarative_base()
 
+def parse_inferred_tags(value):
+    """Returns a stored inferred_tags value (dict or JSON string) as a dict."""
+    inferred = value if value else {}
+    # Ensure inferred_tags is a dict, not a string if it was loaded directly from JSONB
+    # This check is mostly for older SQLAlchemy versions or if data was inserted manually as string
+    if isinstance(inferred, str):
+        try:
+            inferred = json.loads(inferred)
+        except json.JSONDecodeError:
+            inferred = {} # Fallback
+    return inferred
+
+def convert_tag_value(value, value_type):
+    """Converts a stored tag string value back to its original Python type."""
+    if value_type == 'int':
+        try:
+            return int(value)
+        except ValueError:
+            return value # Fallback if conversion fails
+    elif value_type == 'float':
+        try:
+            return float(value)
+        except ValueError:
+            return value # Fallback
+    elif value_type == 'bool':
+        # Handle 'True' or 'true' and 'False' or 'false'
+        return value.lower() == 'true' 
+    elif value_type == 'NoneType':
+        return None
+    # Add more types as needed (e.g., list, dict if you allow complex tag values)
+    return value # Default to string if type not recognized or conversion fails
+
+# Projectable File fields, in display order, mapped to their to_dict() keys
+FILE_FIELDS = {
+    'id': 'ID',
+    'filename': 'Filename',
+    'filepath': 'Filepath',
+    'owner': 'Owner',
+    'created_by': 'Created By',
+    'created_at': 'Created At',
+    'updated_at': 'Updated At',
+    'inferred_tags': 'Inferred Tags',
+    'custom_tags': 'Custom Tags',
+}
+
 class File(Base):
     __tablename__ = 'files'
 
@@ -94,71 +139,116 @@ class File(Base):
     owner = Column(String(255))
     created_by = Column(String(255))
     created_at = Column(DateTime(timezone=True), default=datetime.now)
-    updated_at = Column(DateTime(timezone=True), default=datetime.now, onupdate=datetime.now)
+    updated_at = Column(DateTime(timezone=True), default=datetime.now, onupdate=datetime.now, index=True) # Indexed for incremental refreshes
     inferred_tags = Column(JSONB, default=lambda: json.dumps({}), nullable=False) # Store as JSONB
 
     tags = relationship("Tag", back_populates="file", cascade="all, delete-orphan") 
 
+    __table_args__ = (
+        # Trigram index for fuzzy (similarity / KNN) and prefix (ILIKE 'name%') filename lookups
+        Index('ix_files_filename_trgm', 'filename', postgresql_using='gist',
+              postgresql_ops={'filename': 'gist_trgm_ops'}),
+    )
+
     def __repr__(self):
         return f"<File(id={self.id}, filename='{self.filename}', filepath='{self.filepath}')>"
 
-    def to_dict(self):
-        """Converts File object to a dictionary for display."""
-        inferred = self.inferred_tags if self.inferred_tags else {}
-        # Ensure inferred_tags is a dict, not a string if it was loaded directly from JSONB
-        # This check is mostly for older SQLAlchemy versions or if data was inserted manually as string
-        if isinstance(inferred, str):
-            try:
-                inferred = json.loads(inferred)
-            except json.JSONDecodeError:
-                inferred = {} # Fallback
+    def get_inferred_tags(self):
+        """Returns inferred_tags as a dict."""
+        return parse_inferred_tags(self.inferred_tags)
 
-        custom_tags = {tag.key: tag.get_typed_value() for tag in self.tags}
-        return {
-            "ID": self.id,
-            "Filename": self.filename,
-            "Filepath": self.filepath,
-            "Owner": self.owner,
-            "Created By": self.created_by,
-            "Created At": self.created_at.isoformat() if self.created_at else None,
-            "Updated At": self.updated_at.isoformat() if self.updated_at else None,
-            "Inferred Tags": inferred,
-            "Custom Tags": custom_tags
-        }
+    def to_dict(self, fields=None):
+        """
+        Converts File object to a dictionary for display.
+        If `fields` is given, only those FILE_FIELDS keys are included, and
+        inferred_tags and tags are only loaded when requested.
+        """
+        data = {}
+        for field, key in FILE_FIELDS.items():
+            if fields is not None and field not in fields:
+                continue
+            if field == 'inferred_tags':
+                data[key] = self.get_inferred_tags()
+            elif field == 'custom_tags':
+                data[key] = {tag.key: tag.get_typed_value() for tag in self.tags}
+            elif field in ('created_at', 'updated_at'):
+                value = getattr(self, field)
+                data[key] = value.isoformat() if value else None
+            else:
+                data[key] = getattr(self, field)
+        return data
+
+class FileRecord:
+    """
+    Read-only file metadata built directly from a Core row, for list, search,
+    export and validation paths. Unlike File it is not tracked by a session and,
+    with __slots__, carries no per-instance dict. Only the selected FILE_FIELDS
+    are set; to_dict() matches File.to_dict() for those fields.
+    """
+    __slots__ = ('_loaded_fields',) + tuple(FILE_FIELDS)
+
+    def __init__(self, **values):
+        self._loaded_fields = tuple(field for field in FILE_FIELDS if field in values)
+        for field in FILE_FIELDS:
+            setattr(self, field, values.get(field))
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Builds a record from a row whose columns are named after FILE_FIELDS.
+        custom_tags is expected as {key: [value, value_type]}, as aggregated in SQL.
+        """
+        values = {}
+        for field, value in row._mapping.items():
+            if field not in FILE_FIELDS:
+                continue
+            if field == 'inferred_tags':
+                value = parse_inferred_tags(value)
+            elif field == 'custom_tags':
+                value = {key: convert_tag_value(*stored) for key, stored in (value or {}).items()}
+            values[field] = value
+        return cls(**values)
+
+    def __repr__(self):
+        return f"<FileRecord(id={self.id}, filename='{self.filename}', filepath='{self.filepath}')>"
+
+    def to_dict(self, fields=None):
+        """Converts the record to the same dictionary format as File.to_dict()."""
+        data = {}
+        for field in self._loaded_fields:
+            if fields is not None and field not in fields:
+                continue
+            value = getattr(self, field)
+            if field in ('created_at', 'updated_at'):
+                value = value.isoformat() if value else None
+            data[FILE_FIELDS[field]] = value
+        return data
+
+# The trigram index above requires the pg_trgm extension
+event.listen(Base.metadata, 'before_create', DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
 
 class Tag(Base):
     __tablename__ = 'tags'
 
     id = Column(Integer, primary_key=True)
-    file_id = Column(Integer, ForeignKey('files.id', ondelete='CASCADE'), nullable=False)
+    file_id = Column(Integer, ForeignKey('files.id', ondelete='CASCADE'), nullable=False, index=True)
     key = Column(String(255), nullable=False)
     value = Column(Text, nullable=False)
     value_type = Column(String(50), nullable=False) # Store original Python type
 
     file = relationship("File", back_populates="tags")
 
+    __table_args__ = (
+        # One value per key and file; also the conflict target of bulk tag upserts
+        Index('uq_tags_file_id_key', 'file_id', 'key', unique=True),
+    )
+
     def __repr__(self):
         return f"<Tag(id={self.id}, file_id={self.file_id}, key='{self.key}', value='{self.value}', type='{self.value_type}')>"
 
     def get_typed_value(self):
         """Converts the stored string value back to its original Python type."""
-        if self.value_type == 'int':
-            try:
-                return int(self.value)
-            except ValueError:
-                return self.value # Fallback if conversion fails
-        elif self.value_type == 'float':
-            try:
-                return float(self.value)
-            except ValueError:
-                return self.value # Fallback
-        elif self.value_type == 'bool':
-            # Handle 'True' or 'true' and 'False' or 'false'
-            return self.value.lower() == 'true' 
-        elif self.value_type == 'NoneType':
-            return None
-        # Add more types as needed (e.g., list, dict if you allow complex tag values)
-        return self.value # Default to string if type not recognized or conversion fails
+        return convert_tag_value(self.value, self.value_type)
 
 class User(Base):
     __tablename__ = "users"
@@ -182,3 +272,199 @@ class User(Base):
             user_data["hashed_password"] = self.hashed_password
         return user_data
 
+class SavedSearch(Base):
+    """A named search whose matching file IDs are kept in saved_search_members."""
+    __tablename__ = 'saved_searches'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), unique=True, nullable=False)
+    criteria = Column(JSONB, nullable=False) # search_files_by_criteria arguments, dates as ISO strings
+    created_by = Column(String(255))
+    created_at = Column(DateTime(timezone=True), default=datetime.now)
+    last_refreshed_at = Column(DateTime(timezone=True)) # NULL until the first (full) refresh
+
+    members = relationship("SavedSearchMember", cascade="all, delete-orphan", passive_deletes=True)
+
+    def __repr__(self):
+        return f"<SavedSearch(id={self.id}, name='{self.name}')>"
+
+    def to_dict(self):
+        """Converts SavedSearch object to a dictionary for display."""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "criteria": self.criteria,
+            "created_by": self.created_by,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "last_refreshed_at": self.last_refreshed_at.isoformat() if self.last_refreshed_at else None
+        }
+
+class SavedSearchMember(Base):
+    """Materialized membership of a file in a saved search's result set."""
+    __tablename__ = 'saved_search_members'
+
+    saved_search_id = Column(Integer, ForeignKey('saved_searches.id', ondelete='CASCADE'), primary_key=True)
+    file_id = Column(Integer, ForeignKey('files.id', ondelete='CASCADE'), primary_key=True, index=True)
+
+    def __repr__(self):
+        return f"<SavedSearchMember(saved_search_id={self.saved_search_id}, file_id={self.file_id})>"
+
+class StorageRollup(Base):
+    """
+    Running file count and byte total per directory (every ancestor directory of
+    a file), owner or mime type. Kept up to date by the metadata_manager functions
+    that add, move or delete files, so usage queries never scan the files table.
+    """
+    __tablename__ = 'storage_rollups'
+
+    dimension = Column(String(16), primary_key=True) # 'directory', 'owner' or 'mime'
+    key = Column(Text, primary_key=True)
+    parent = Column(Text, index=True) # Parent directory of a 'directory' row, NULL otherwise
+    file_count = Column(BigInteger, nullable=False, default=0)
+    total_bytes = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<StorageRollup(dimension='{self.dimension}', key='{self.key}', file_count={self.file_count})>"
+
+    def to_dict(self):
+        """Converts StorageRollup object to a dictionary for display."""
+        return {
+            "key": self.key,
+            "file_count": self.file_count,
+            "total_bytes": self.total_bytes
+        }
+
+class FileListVersion(Base):
+    """
+    A single row whose version a trigger on files bumps in every statement that writes
+    files. Writers take turns on the row (as they already do on the root directory's
+    storage rollup), so every commit moves the committed version, in commit order;
+    max(updated_at) does not, since it is stamped before commit.
+    """
+    __tablename__ = 'file_list_version'
+
+    id = Column(Integer, primary_key=True) # Always 1
+    version = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<FileListVersion(version={self.version})>"
+
+# Run by every create_all(), so existing databases get the row and the trigger too
+for statement in (
+    "INSERT INTO file_list_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING",
+    "CREATE OR REPLACE FUNCTION bump_file_list_version() RETURNS trigger LANGUAGE plpgsql AS $$ "
+    "BEGIN UPDATE file_list_version SET version = version + 1 WHERE id = 1; RETURN NULL; END $$",
+    "DO $$ BEGIN IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'files_bump_list_version' "
+    "AND tgrelid = 'files'::regclass) THEN CREATE TRIGGER files_bump_list_version "
+    "AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON files "
+    "FOR EACH STATEMENT EXECUTE FUNCTION bump_file_list_version(); END IF; END $$",
+):
+    event.listen(Base.metadata, 'after_create', DDL(statement))
+
+class Job(Base):
+    """
+    A long-running operation (validate, export, import, ingest, bulk tagging) queued
+    for 'filemeta jobs worker' instead of running inside a CLI call or HTTP request.
+    """
+    __tablename__ = 'jobs'
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(32), nullable=False)
+    params = Column(JSONB, nullable=False)
+    status = Column(String(16), nullable=False, default='queued') # queued, running, succeeded, failed or cancelled
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    progress_done = Column(BigInteger, nullable=False, default=0)
+    progress_total = Column(BigInteger) # NULL while unknown
+    message = Column(Text)
+    result = Column(JSONB) # Summary of a finished job, e.g. counts
+    result_path = Column(Text) # File with the job's full output, if it produces one
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker = Column(String(255))
+    created_by = Column(String(255))
+    created_at = Column(DateTime(timezone=True), default=datetime.now)
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True)) # Refreshed by the worker while the job runs
+
+    __table_args__ = (
+        Index('ix_jobs_status_created_at', 'status', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind='{self.kind}', status='{self.status}')>"
+
+    def to_dict(self):
+        """Converts Job object to a dictionary for display."""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "cancel_requested": self.cancel_requested,
+            "progress_done": self.progress_done,
+            "progress_total": self.progress_total,
+            "message": self.message,
+            "result": self.result,
+            "has_result_file": self.result_path is not None,
+            "error": self.error,
+            "attempts": self.attempts,
+            "created_by": self.created_by,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class FileChange(Base):
+    """
+    One change-feed event: a file record was created, updated, renamed or deleted.
+    Written in the same transaction as the change itself (transactional outbox), so
+    events exist exactly for committed changes; `seq` orders them and lets consumers resume.
+    """
+    __tablename__ = 'file_changes'
+
+    seq = Column(BigInteger, primary_key=True)
+    op = Column(String(16), nullable=False) # create, update, rename or delete
+    file_id = Column(Integer, nullable=False) # No foreign key: events outlive deleted files
+    filepath = Column(Text)
+    changed_fields = Column(JSONB) # FILE_FIELDS changed by an update or rename; NULL for create/delete
+    changed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_file_changes_changed_at', 'changed_at'),
+    )
+
+    def __repr__(self):
+        return f"<FileChange(seq={self.seq}, op='{self.op}', file_id={self.file_id})>"
+
+    def to_dict(self):
+        """Converts the event to the dictionary sent to change-feed subscribers."""
+        return {
+            "seq": self.seq,
+            "op": self.op,
+            "id": self.file_id,
+            "filepath": self.filepath,
+            "changed_fields": self.changed_fields,
+            "changed_at": self.changed_at.isoformat() if self.changed_at else None
+        }
+
+class RevokedToken(Base):
+    """
+    An access token revoked before it expired, by its 'jti' claim. Every API worker process
+    reloads the unexpired rows periodically and rejects those tokens, including any it has
+    cached as verified. Rows are useless once the token has expired and are deleted then.
+    """
+    __tablename__ = 'revoked_tokens'
+
+    jti = Column(String(64), primary_key=True)
+    username = Column(String(255), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_revoked_tokens_expires_at', 'expires_at'),
+    )
+
+    def __repr__(self):
+        return f"<RevokedToken(jti='{self.jti}', username='{self.username}', expires_at={self.expires_at})>"
+
@@ -0,0 +1,99 @@
+# filemeta/server.py
+import importlib
+import os
+import sys
+from typing import Any, Dict
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # Optional: without gunicorn, 'filemeta serve' falls back to uvicorn's process manager
+    BaseApplication = None
+
+from .database import DB_POOL_SIZE, DB_MAX_OVERFLOW
+
+# Production server for the API: several worker processes behind one socket. All shared
+# state (users, jobs, token revocations) lives in the database and read-your-writes routing
+# travels with the client, so any worker can serve any request. Per-process state is
+# limited to caches and the admission limits.
+SERVE_WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+# A worker is replaced after this many requests (plus up to the jitter, so workers do
+# not all restart together), which bounds memory growth from fragmentation or leaks
+SERVE_MAX_REQUESTS = int(os.getenv("SERVE_MAX_REQUESTS", "10000"))
+SERVE_MAX_REQUESTS_JITTER = int(os.getenv("SERVE_MAX_REQUESTS_JITTER", "1000"))
+# On SIGTERM (or a recycle) a worker stops accepting connections and has this long to
+# finish the requests in flight
+SERVE_GRACEFUL_TIMEOUT = int(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30"))
+# A worker that does not check in with the master for this long is killed and replaced
+SERVE_WORKER_TIMEOUT = int(os.getenv("SERVE_WORKER_TIMEOUT", "60"))
+
+def load_app(app_path: str, app_dir: str):
+    """Imports 'module:attribute' with `app_dir` on sys.path and returns the attribute."""
+    module_name, _, attribute = app_path.partition(":")
+    if not module_name or not attribute:
+        raise ValueError(f"Invalid application '{app_path}'. Expected 'module:attribute', e.g. 'main:app'.")
+    sys.path.insert(0, os.path.abspath(app_dir))
+    return getattr(importlib.import_module(module_name), attribute)
+
+if BaseApplication is not None:
+    class _GunicornServer(BaseApplication):
+        """Runs an already imported ASGI app on gunicorn with uvicorn workers."""
+
+        def __init__(self, application, options: Dict[str, Any]):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+def serve(
+    app_path: str = "main:app",
+    app_dir: str = ".",
+    host: str = "0.0.0.0",
+    port: int = 8000,
+    workers: int = SERVE_WORKERS,
+    max_requests: int = SERVE_MAX_REQUESTS,
+    max_requests_jitter: int = SERVE_MAX_REQUESTS_JITTER,
+    graceful_timeout: int = SERVE_GRACEFUL_TIMEOUT,
+    worker_timeout: int = SERVE_WORKER_TIMEOUT
+):
+    """
+    Serves the API with `workers` processes until the master receives SIGINT or SIGTERM.
+
+    With gunicorn installed, the app is imported once in the master and forked into the
+    workers (preload), workers are recycled after max_requests (+ jitter), hung workers are
+    replaced after worker_timeout, and shutdown drains in-flight requests for up to
+    graceful_timeout seconds. Without gunicorn, uvicorn's process manager is used: each
+    worker imports the app itself and max_requests is applied without jitter.
+    Startup work (tables, the initial admin user) runs in each worker and is safe to run concurrently.
+    """
+    if workers < 1:
+        raise ValueError("The number of workers must be at least 1.")
+    print(f"Starting {workers} worker(s) on {host}:{port}; each may open up to "
+          f"{DB_POOL_SIZE + DB_MAX_OVERFLOW} database connections per pool (DB_POOL_SIZE + DB_MAX_OVERFLOW).")
+
+    if BaseApplication is None:
+        import uvicorn
+        print("gunicorn is not installed: using uvicorn workers without preloading.", file=sys.stderr)
+        uvicorn.run(
+            app_path, app_dir=app_dir, host=host, port=port, workers=workers,
+            limit_max_requests=max_requests or None,
+            timeout_graceful_shutdown=graceful_timeout
+        )
+        return
+
+    application = load_app(app_path, app_dir)
+    _GunicornServer(application, {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests_jitter,
+        "graceful_timeout": graceful_timeout,
+        "timeout": worker_timeout,
+    }).run()
@@ -0,0 +1,39 @@
+# filemeta/tokens.py
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .models import RevokedToken
+from .metadata_manager import _async_variant
+
+# Revoked access tokens are shared through the revoked_tokens table so that a logout on one
+# API worker process takes effect on all of them. Token verification itself lives in auth.py.
+
+def revoke_token(db: Session, jti: str, username: str, expires_at: datetime):
+    """
+    Records that the token with this 'jti' claim is revoked until it expires. Revoking a
+    token twice is a no-op. Rows of tokens that have expired since are deleted.
+    """
+    try:
+        db.execute(
+            pg_insert(RevokedToken)
+            .values(jti=jti, username=username, expires_at=expires_at)
+            .on_conflict_do_nothing(index_elements=['jti'])
+        )
+        db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= func.now()))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"An unexpected error occurred while revoking a token of user '{username}': {e}")
+
+def unexpired_revocations(db: Session) -> Dict[str, datetime]:
+    """Returns jti -> expiry of every revoked token that has not expired yet."""
+    rows = db.execute(
+        select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > func.now())
+    ).all()
+    return {jti: expires_at for jti, expires_at in rows}
+
+unexpired_revocations_async = _async_variant(unexpired_revocations)
@@ -0,0 +1,41 @@
+# filemeta/users.py
+from typing import List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import User
+from .metadata_manager import _async_variant
+
+# API users live in the users table so that every API worker process sees the same accounts.
+# Passwords are hashed by the caller (auth.get_password_hash).
+
+def get_user_by_username(db: Session, username: str) -> Optional[User]:
+    """Returns the user with this username, or None."""
+    return db.query(User).filter(User.username == username).first()
+
+def list_users(db: Session) -> List[User]:
+    """Lists all users in order of creation."""
+    return db.query(User).order_by(User.id).all()
+
+def create_user(db: Session, username: str, hashed_password: str, is_admin: bool = False) -> User:
+    """
+    Creates a user.
+
+    Raises:
+        ValueError: If the username is already registered.
+    """
+    user = User(username=username, hashed_password=hashed_password, is_admin=is_admin)
+    try:
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        return user
+    except IntegrityError:
+        db.rollback()
+        raise ValueError(f"Username '{username}' is already registered.")
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"An unexpected error occurred while creating user '{username}': {e}")
+
+get_user_by_username_async = _async_variant(get_user_by_username)
@@ -125,6 +125,16 @@ def parse_tag_value(value: str):
         pass
     return value, 'str'
 
+def parse_field_list(fields_str: str) -> list:
+    """
+    Parses a comma-separated field list (e.g., "id,filename, filepath")
+    into a list of lowercase field names. Returns None for an empty input.
+    """
+    if not fields_str:
+        return None
+    fields = [field.strip().lower() for field in fields_str.split(',') if field.strip()]
+    return fields or None
+
 def convert_human_readable_to_bytes(size_str: str) -> int:
     """
     Converts a human-readable file size string (e.g., "10KB", "1.5GB", "500B")
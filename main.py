@@ -374,26 +374,70 @@
 # main.py
 import uvicorn
 import os
-from typing import List, Dict, Union, Optional, Tuple
-from fastapi import FastAPI, Depends, HTTPException, status, Query
+import json
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Dict, Union, Optional, Tuple, Any
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Request, Header
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from fastapi.responses import FileResponse as FileDownloadResponse # schemas.FileResponse is the metadata model
+try:
+    # Optional: orjson encodes large file lists several times faster than the stdlib json module
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import NoResultFound, OperationalError, IntegrityError
-from datetime import datetime
+from datetime import datetime, timezone
 
 # Import your core metadata management functions
-from filemeta.database import get_db, init_db as filemeta_init_db, close_db_engine
+from filemeta.database import get_db, close_db_engine, close_async_db_engine, count_statements, get_pool_metrics, get_replica_status, DB_READ_YOUR_WRITES_SECONDS
 from filemeta.metadata_manager import (
-    add_file_metadata,
+    add_file_metadata_async,
+    prepare_file_metadata,
     list_files,
     get_file_metadata,
-    update_file_tags,
-    delete_file_metadata,
+    update_file_tags_async,
+    bulk_update_tags_async,
+    check_new_filepath,
+    delete_file_metadata_async,
     search_files_by_criteria, # Existing comprehensive search function
-    rename_file_entry,         # NEW: Renaming function
-    list_and_search_tags,      # NEW: Tag listing/searching function
-    validate_file_metadata     # NEW: Validation function
+    search_file_records_async,
+    list_file_records_async,
+    get_file_record_async,
+    get_file_records_async,
+    get_file_version_async,
+    get_file_list_version_async,
+    iter_file_record_batches,
+    validate_file_fields,
+    count_files_by_criteria_async,
+    files_exist_by_criteria_async,
+    find_files_by_name_async,
+    create_saved_search_async,
+    list_saved_searches_async,
+    refresh_saved_search_async,
+    list_saved_search_files_async,
+    delete_saved_search_async,
+    get_storage_usage_async,
+    ROLLUP_DIMENSIONS,
+    rename_file_on_disk,       # NEW: Renaming function
+    record_file_rename_async,
+    list_and_search_tags_async, # NEW: Tag listing/searching function
+    validate_file_metadata_async, # NEW: Validation function
+    files_exist_on_disk,
+    init_db as filemeta_init_db
 )
+from filemeta.io_executor import (
+    run_fs, run_fs_batched, fs_io_metrics, shutdown_fs_executor,
+    FilesystemTimeoutError, FilesystemBusyError
+)
+from filemeta.analytics import get_snapshot, attach_filepaths, GROUP_BY_OPTIONS, TOP_KEYS, HISTOGRAM_SCALES
+from filemeta.jobs import JOB_STATUSES, submit_job_async, get_job_async, list_jobs_async, cancel_job_async
+from filemeta.users import create_user, list_users
+from filemeta.changes import change_feed
 from filemeta.models import File # Keep this import, even if not directly used for ORM conversion
 
 # Import Pydantic schemas and authentication/authorization logic
@@ -402,15 +446,23 @@ from schemas import (
     FileAddRequest, FileUpdateRequest, FileResponse,
     UserBase, SearchQueryParams,
     FileRenameRequest,           # NEW: For renaming files
+    FileTagsBulkUpdateRequest, FileTagsBulkUpdateResponse,
     TagResponse, UniqueTagKeyValuePair, TagListSearchQueryParams, # NEW: For tags endpoint
-    FileValidationRequest, FileValidationResult # NEW: For validation endpoint
+    FileValidationRequest, FileValidationResult, # NEW: For validation endpoint
+    FileCountResponse, FileExistsResponse, FileMatchResponse,
+    FileBatchGetRequest, FileBatchItem,
+    SavedSearchCreateRequest, SavedSearchResponse, SavedSearchRefreshResponse,
+    StorageUsageResponse,
+    JobSubmitRequest, JobResponse
 )
 from auth import (
     authenticate_user, create_access_token, get_password_hash,
-    get_current_user, get_admin_user, FAKE_USERS_DB
+    get_current_user, get_admin_user, user_from_record,
+    oauth2_scheme, revoke_access_token, token_cache
 )
-from dependencies import get_db_session
-from filemeta.utils import convert_human_readable_to_bytes, parse_date_string # New import for date parsing
+from dependencies import get_db_session, get_async_db_session, get_async_read_db_session, READ_YOUR_WRITES_COOKIE, READ_YOUR_WRITES_HEADER
+from admission import AdmissionController, AdmissionRejected, ADMISSION_ENABLED, request_client, rejection_response
+from filemeta.utils import convert_human_readable_to_bytes, parse_date_string, parse_field_list # New import for date parsing
 
 # Create the FastAPI app
 app = FastAPI(
@@ -418,38 +470,203 @@ app = FastAPI(
     description="A REST API for managing server file metadata with user authentication and roles."
 )
 
+FIELDS_QUERY_DESCRIPTION = (
+    "Comma-separated list of fields to return (e.g., 'id,filename,filepath'). "
+    "Valid fields: id, filename, filepath, owner, created_by, created_at, updated_at, inferred_tags, custom_tags."
+)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def _wants_ndjson(request: Request) -> bool:
+    """True if the client asked for newline-delimited JSON via the Accept header."""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def _stream_file_records_ndjson(fields: Optional[List[str]], criteria: Optional[Dict[str, Any]] = None) -> StreamingResponse:
+    """
+    Streams file records as NDJSON, one batch of lines per server-side cursor fetch.
+    The generator opens its own session so the cursor outlives the request handler.
+    """
+    if fields:
+        validate_file_fields(fields)
+
+    def generate_lines():
+        with get_db() as db:
+            for batch in iter_file_record_batches(db, fields=fields, criteria=criteria):
+                yield "".join(json.dumps(record.to_dict(), ensure_ascii=False) + "\n" for record in batch)
+
+    return StreamingResponse(generate_lines(), media_type=NDJSON_MEDIA_TYPE)
+
+# --- Conditional GET ---
+# Polling clients send back the ETag (or Last-Modified) of their copy; if the
+# version columns still match, the record is neither loaded nor serialized.
+
+def _make_etag(*parts) -> str:
+    """Strong ETag from the version values of a representation."""
+    return '"' + hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:32] + '"'
+
+def _http_date(value: datetime) -> str:
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def _is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Evaluates If-None-Match (or, when absent, If-Modified-Since) against the current
+    ETag and Last-Modified, as in RFC 7232.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # If-None-Match uses weak comparison, so W/ prefixes are ignored
+        client_etags = [tag.strip() for tag in if_none_match.split(",")]
+        return etag in [tag[2:] if tag.startswith("W/") else tag for tag in client_etags]
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution
+        return last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since
+    return False
+
+def _validator_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    return headers
+
+# --- Middleware ---
+# Debug setting: report the SQL statements issued per request in an X-SQL-Statement-Count
+# response header. Off by default, so production responses do not expose it.
+SQL_STATEMENT_COUNT_HEADER = os.getenv("SQL_STATEMENT_COUNT_HEADER", "0").strip().lower() in ("1", "true", "yes", "on")
+
+@app.middleware("http")
+async def count_sql_statements(request, call_next):
+    """
+    With SQL_STATEMENT_COUNT_HEADER set, counts the SQL statements issued while handling
+    each request and reports them in the X-SQL-Statement-Count response header.
+    """
+    if not SQL_STATEMENT_COUNT_HEADER:
+        return await call_next(request)
+    with count_statements() as counter:
+        response = await call_next(request)
+    response.headers["X-SQL-Statement-Count"] = str(counter.count)
+    return response
+
+@app.middleware("http")
+async def read_your_writes_marker(request: Request, call_next):
+    """
+    Hands a client that has just written the signed read-your-writes marker, as a cookie
+    and in the X-Primary-Until header, so its reads stay on the primary in every worker
+    process (see dependencies.py).
+    """
+    response = await call_next(request)
+    marker = getattr(request.state, "primary_until_marker", None)
+    if marker is not None:
+        response.headers[READ_YOUR_WRITES_HEADER] = marker
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE, marker, max_age=int(DB_READ_YOUR_WRITES_SECONDS) + 1,
+            httponly=True, samesite="lax"
+        )
+    return response
+
+# Requests that scan many rows or files. They get a lower per-user rate and concurrency
+# limit than other ('cheap') requests; see admission.py.
+EXPENSIVE_REQUESTS = (
+    ("GET", r"/files/search"),
+    ("GET", r"/files/find"),
+    ("GET", r"/files/?"),
+    ("POST", r"/files/batch-get"),
+    ("POST", r"/files/validate"),
+    ("PATCH", r"/files/tags"),
+    ("GET", r"/tags/"),
+    ("POST", r"/saved-searches/"),
+    ("POST", r"/saved-searches/[^/]+/refresh"),
+    ("GET", r"/saved-searches/[^/]+/files"),
+    ("GET", r"/stats/usage"),
+    ("GET", r"/analytics/.+"),
+)
+# /changes streams for as long as the client stays connected, so it must not hold an admission slot
+admission = AdmissionController(EXPENSIVE_REQUESTS, exempt_paths=("/token", "/docs", "/redoc", "/openapi.json", "/changes"))
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """
+    Bounds each user's request rate and concurrent requests per endpoint class, queueing
+    briefly and answering 429 with Retry-After before the database pool saturates.
+    """
+    endpoint_class = admission.classify(request.method, request.url.path) if ADMISSION_ENABLED else None
+    if endpoint_class is None:
+        return await call_next(request)
+    client = request_client(request.headers.get("authorization"), request.client.host if request.client else None)
+    try:
+        release = await admission.admit(client, endpoint_class)
+    except AdmissionRejected as rejected:
+        return rejection_response(rejected, endpoint_class)
+
+    try:
+        response = await call_next(request)
+    except BaseException:
+        release()
+        raise
+    # Streamed responses (e.g. NDJSON) keep their slot until the body has been sent
+    body_iterator = response.body_iterator
+
+    async def release_after_body():
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            release()
+    response.body_iterator = release_after_body()
+    return response
+
+# On first startup, while the users table is empty, an admin account is created from these
+# settings (as in create_initial_admin.py). There is no default password: without
+# INITIAL_ADMIN_PASSWORD no account is created.
+INITIAL_ADMIN_USERNAME = os.getenv("INITIAL_ADMIN_USERNAME", "admin")
+INITIAL_ADMIN_PASSWORD = os.getenv("INITIAL_ADMIN_PASSWORD")
+
 # --- API Lifecycle Events ---
 @app.on_event("startup")
 async def startup_event():
     """
-    On startup, initialize the file metadata database and create a default admin user
-    if they don't already exist in our in-memory user store.
+    On startup, initialize the file metadata database and, if the users table is
+    empty and INITIAL_ADMIN_PASSWORD is set, create the initial admin user.
+    Runs in every worker process; both steps are safe to run concurrently.
     """
     print("API starting up...")
     try:
-        # Initialize the file metadata database (tables)
+        # Initialize the file metadata database (tables, indexes, storage rollup backfill)
         filemeta_init_db()
         print("File metadata database tables initialized.")
     except OperationalError as e:
         print(f"ERROR: Database connection failed at startup: {e}", flush=True)
+    except ValueError as e: # Existing rows block a new unique index: needs an explicit cleanup command
+        print(f"ERROR: {e}", flush=True)
+        raise
     except Exception as e:
         print(f"ERROR: Unexpected error during file metadata DB init: {e}", flush=True)
 
-    # Initialize a default admin user if not exists
-    if "admin" not in FAKE_USERS_DB:
-        hashed_password = get_password_hash("adminpass") # Default admin password
-        FAKE_USERS_DB["admin"] = User(
-            id=1, username="admin", hashed_password=hashed_password, role="admin"
-        )
-        print("Default admin user 'admin' created with password 'adminpass'.")
-
-    # Initialize a default regular user if not exists
-    if "user1" not in FAKE_USERS_DB:
-        hashed_password = get_password_hash("userpass") # Default user password
-        FAKE_USERS_DB["user1"] = User(
-            id=2, username="user1", hashed_password=hashed_password, role="user"
-        )
-        print("Default user 'user1' created with password 'userpass'.")
+    try:
+        with get_db() as db:
+            if not list_users(db):
+                if INITIAL_ADMIN_PASSWORD:
+                    try:
+                        create_user(db, INITIAL_ADMIN_USERNAME, get_password_hash(INITIAL_ADMIN_PASSWORD), is_admin=True)
+                        print(f"Initial admin user '{INITIAL_ADMIN_USERNAME}' created.")
+                    except ValueError:
+                        pass # Created by another worker starting at the same time
+                else:
+                    print("WARNING: No users exist. Set INITIAL_ADMIN_PASSWORD (and optionally "
+                          "INITIAL_ADMIN_USERNAME) to create an admin user at startup.", flush=True)
+    except OperationalError as e:
+        print(f"ERROR: Database connection failed while creating the initial admin user: {e}", flush=True)
+    except Exception as e:
+        print(f"ERROR: Unexpected error while creating the initial admin user: {e}", flush=True)
 
     print("API startup complete.")
 
@@ -459,18 +676,101 @@ async def shutdown_event():
     On shutdown, close the database engine connection.
     """
     print("API shutting down...")
+    await change_feed.close()
     close_db_engine()
+    await close_async_db_engine()
     print("Database engine closed.")
+    shutdown_fs_executor()
     print("API shutdown complete.")
 
+def _parse_search_criteria(params: SearchQueryParams) -> Dict[str, Any]:
+    """
+    Parses raw search parameters (human-readable sizes, date strings) into
+    keyword arguments for search_files_by_criteria.
+    Raises HTTPException (400) if no criterion is given or a value is invalid.
+    """
+    # Check if any search criterion is provided
+    if not any([
+        params.keywords, params.size_gt, params.size_lt, params.size_between,
+        params.created_after, params.created_before, params.modified_after, params.modified_before,
+        params.accessed_after, params.accessed_before, params.created_between, params.modified_between, params.accessed_between
+    ]):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Please provide at least one search criterion."
+        )
+
+    # Parse size parameters
+    parsed_min_size_bytes = None
+    parsed_max_size_bytes = None
+    try:
+        if params.size_gt:
+            parsed_min_size_bytes = convert_human_readable_to_bytes(params.size_gt)
+        if params.size_lt:
+            parsed_max_size_bytes = convert_human_readable_to_bytes(params.size_lt)
+        if params.size_between:
+            parsed_min_size_bytes = convert_human_readable_to_bytes(params.size_between[0])
+            parsed_max_size_bytes = convert_human_readable_to_bytes(params.size_between[1])
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid size format: {e}")
+
+    # Parse date parameters
+    parsed_created_after: Optional[datetime] = None
+    parsed_created_before: Optional[datetime] = None
+    parsed_modified_after: Optional[datetime] = None
+    parsed_modified_before: Optional[datetime] = None
+    parsed_accessed_after: Optional[datetime] = None
+    parsed_accessed_before: Optional[datetime] = None
+
+    try:
+        if params.created_after:
+            parsed_created_after = parse_date_string(params.created_after)
+        if params.created_before:
+            parsed_created_before = parse_date_string(params.created_before)
+        if params.created_between:
+            parsed_created_after = parse_date_string(params.created_between[0])
+            parsed_created_before = parse_date_string(params.created_between[1])
+
+        if params.modified_after:
+            parsed_modified_after = parse_date_string(params.modified_after)
+        if params.modified_before:
+            parsed_modified_before = parse_date_string(params.modified_before)
+        if params.modified_between:
+            parsed_modified_after = parse_date_string(params.modified_between[0])
+            parsed_modified_before = parse_date_string(params.modified_between[1])
+
+        if params.accessed_after:
+            parsed_accessed_after = parse_date_string(params.accessed_after)
+        if params.accessed_before:
+            parsed_accessed_before = parse_date_string(params.accessed_before)
+        if params.accessed_between:
+            parsed_accessed_after = parse_date_string(params.accessed_between[0])
+            parsed_accessed_before = parse_date_string(params.accessed_between[1])
+
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid date format: {e}")
+
+    return dict(
+        keywords=params.keywords,
+        min_size_bytes=parsed_min_size_bytes,
+        max_size_bytes=parsed_max_size_bytes,
+        created_after=parsed_created_after,
+        created_before=parsed_created_before,
+        modified_after=parsed_modified_after,
+        modified_before=parsed_modified_before,
+        accessed_after=parsed_accessed_after,
+        accessed_before=parsed_accessed_before
+    )
+
 # --- Authentication Endpoints ---
 @app.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db_session)):
     """
     Endpoint for users to authenticate and get an access token.
     Requires `username` and `password` in the form data.
+    Runs in the thread pool: password hashing would otherwise block the event loop.
     """
-    user = authenticate_user(FAKE_USERS_DB, form_data.username, form_data.password)
+    user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -480,6 +780,25 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     access_token = create_access_token(data={"sub": user.username, "role": user.role})
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+def revoke_access_token_api(
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_session)
+):
+    """
+    Revokes the bearer token of this request (logout). It is rejected from then on by this
+    API process, and by the others once they reload the revoked tokens (every few seconds).
+    """
+    try:
+        revoke_access_token(db, token)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
 # --- User Management Endpoints (Admin Only) ---
 @app.get("/users/me", response_model=UserResponse)
 async def read_users_me(current_user: User = Depends(get_current_user)):
@@ -489,36 +808,41 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
     return UserResponse(id=current_user.id, username=current_user.username, role=current_user.role)
 
 @app.post("/users/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def create_new_user(user: UserCreate, current_admin_user: User = Depends(get_admin_user)):
+def create_new_user(user: UserCreate, current_admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db_session)):
     """
     Create a new user. Only accessible by admin users.
     Default role for new users is 'user'.
     """
-    if user.username in FAKE_USERS_DB:
+    try:
+        new_user = user_from_record(create_user(db, user.username, get_password_hash(user.password)))
+    except ValueError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
-    user_id = len(FAKE_USERS_DB) + 1 # Simple incrementing ID
-    hashed_password = get_password_hash(user.password)
-    new_user = User(
-        id=user_id, username=user.username, hashed_password=hashed_password, role="user"
-    )
-    FAKE_USERS_DB[user.username] = new_user
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
     return UserResponse(id=new_user.id, username=new_user.username, role=new_user.role)
 
 @app.get("/users/", response_model=List[UserResponse])
-async def list_all_users(current_admin_user: User = Depends(get_admin_user)):
+def list_all_users(current_admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db_session)):
     """
     List all registered users. Only accessible by admin users.
     """
-    return [UserResponse(id=u.id, username=u.username, role=u.role) for u in FAKE_USERS_DB.values()]
+    try:
+        users = [user_from_record(record) for record in list_users(db)]
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    return [UserResponse(id=u.id, username=u.username, role=u.role) for u in users]
 
 # --- File Metadata Endpoints (Admin & User) ---
 
 # IMPORTANT: Define the more specific /files/search route BEFORE /files/{file_id}
-@app.get("/files/search", response_model=List[FileResponse])
+@app.get("/files/search", response_model=Union[List[FileResponse], FileCountResponse, FileExistsResponse])
 async def search_files_api(
+    http_request: Request,
     keywords: Optional[List[str]] = Query(None, description="Keywords to search for in file metadata (filename, path, owner, tags). Can be repeated."),
     size_gt: Optional[str] = Query(None, description='Search for files larger than the specified size (e.g., "10MB", "1GB").'),
     size_lt: Optional[str] = Query(None, description='Search for files smaller than the specified size (e.g., "100KB", "1GB").'),
@@ -533,111 +857,106 @@ async def search_files_api(
     created_between: Optional[List[str]] = Query(None, min_items=2, max_items=2, description="Search for files created within this date/time range (e.g., ['2024-01-01', '2024-03-31'])."),
     modified_between: Optional[List[str]] = Query(None, min_items=2, max_items=2, description="Search for files modified within this date/time range."),
     accessed_between: Optional[List[str]] = Query(None, min_items=2, max_items=2, description="Search for files last accessed within this date/time range."),
+    count: bool = Query(False, description="If True, return only the number of matching files."),
+    exists: bool = Query(False, description="If True, return only whether any file matches."),
+    approximate: bool = Query(False, description="With count=true, allow a query planner estimate for very large result sets."),
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY_DESCRIPTION),
 
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_read_db_session),
     current_user: User = Depends(get_current_user)
 ):
     """
     Search for file metadata based on keywords, file size ranges, and date/time ranges.
+    Use count=true or exists=true to get a count or existence check without the file records.
+    Send `Accept: application/x-ndjson` to stream the matching records as NDJSON.
     """
-    # Check if any search criterion is provided
-    if not any([
-        keywords, size_gt, size_lt, size_between,
-        created_after, created_before, modified_after, modified_before,
-        accessed_after, accessed_before, created_between, modified_between, accessed_between
-    ]):
+    if count and exists:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Please provide at least one search criterion."
+            detail="Cannot use 'count' and 'exists' together."
+        )
+    if approximate and not count:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'approximate' can only be used with 'count'."
         )
 
-    # Parse size parameters
-    parsed_min_size_bytes = None
-    parsed_max_size_bytes = None
+    search_criteria = _parse_search_criteria(SearchQueryParams(
+        keywords=keywords, size_gt=size_gt, size_lt=size_lt, size_between=size_between,
+        created_after=created_after, created_before=created_before,
+        modified_after=modified_after, modified_before=modified_before,
+        accessed_after=accessed_after, accessed_before=accessed_before,
+        created_between=created_between, modified_between=modified_between,
+        accessed_between=accessed_between
+    ))
+
     try:
-        if size_gt:
-            parsed_min_size_bytes = convert_human_readable_to_bytes(size_gt)
-        if size_lt:
-            parsed_max_size_bytes = convert_human_readable_to_bytes(size_lt)
-        if size_between:
-            parsed_min_size_bytes = convert_human_readable_to_bytes(size_between[0])
-            parsed_max_size_bytes = convert_human_readable_to_bytes(size_between[1])
-    except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid size format: {e}")
+        if count:
+            file_count, is_estimate = await count_files_by_criteria_async(db, approximate=approximate, **search_criteria)
+            return FileCountResponse(count=file_count, approximate=is_estimate)
+        if exists:
+            return FileExistsResponse(exists=await files_exist_by_criteria_async(db, **search_criteria))
 
-    # Parse date parameters
-    parsed_created_after: Optional[datetime] = None
-    parsed_created_before: Optional[datetime] = None
-    parsed_modified_after: Optional[datetime] = None
-    parsed_modified_before: Optional[datetime] = None
-    parsed_accessed_after: Optional[datetime] = None
-    parsed_accessed_before: Optional[datetime] = None
+        if _wants_ndjson(http_request):
+            return _stream_file_records_ndjson(parse_field_list(fields), criteria=search_criteria)
 
-    try:
-        if created_after:
-            parsed_created_after = parse_date_string(created_after)
-        if created_before:
-            parsed_created_before = parse_date_string(created_before)
-        if created_between:
-            parsed_created_after = parse_date_string(created_between[0])
-            parsed_created_before = parse_date_string(created_between[1])
-
-        if modified_after:
-            parsed_modified_after = parse_date_string(modified_after)
-        if modified_before:
-            parsed_modified_before = parse_date_string(modified_before)
-        if modified_between:
-            parsed_modified_after = parse_date_string(modified_between[0])
-            parsed_modified_before = parse_date_string(modified_between[1])
-
-        if accessed_after:
-            parsed_accessed_after = parse_date_string(accessed_after)
-        if accessed_before:
-            parsed_accessed_before = parse_date_string(accessed_before)
-        if accessed_between:
-            parsed_accessed_after = parse_date_string(accessed_between[0])
-            parsed_accessed_before = parse_date_string(accessed_between[1])
+        # Read-only records are built from Core rows with tags aggregated in SQL and
+        # returned without re-validation through FileResponse
+        records = await search_file_records_async(db, fields=parse_field_list(fields), **search_criteria)
+        return FastJSONResponse(content=[record.to_dict() for record in records])
 
     except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid date format: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
 
-    try:
-        # Call the comprehensive search function
-        files = search_files_by_criteria(
-            db=db,
-            keywords=keywords,
-            min_size_bytes=parsed_min_size_bytes,
-            max_size_bytes=parsed_max_size_bytes,
-            created_after=parsed_created_after,
-            created_before=parsed_created_before,
-            modified_after=parsed_modified_after,
-            modified_before=parsed_modified_before,
-            accessed_after=parsed_accessed_after,
-            accessed_before=parsed_accessed_before
-        )
-        
-        return [FileResponse.from_orm(file) for file in files]
 
+@app.get("/files/find", response_model=List[FileMatchResponse])
+async def find_files_api(
+    name: str = Query(..., min_length=1, description="Filename (or part of one) to look for. Tolerates typos."),
+    limit: int = Query(20, gt=0, le=1000, description="Maximum number of matches to return."),
+    min_similarity: float = Query(0.3, ge=0, le=1, description="Minimum trigram similarity for fuzzy matches."),
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_read_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Finds files by filename, ranking prefix matches first and then by similarity.
+    """
+    try:
+        requested_fields = parse_field_list(fields)
+        matches = await find_files_by_name_async(db, name, limit=limit, min_similarity=min_similarity, fields=requested_fields)
+        return FastJSONResponse(content=[
+            {"score": score, "file": record.to_dict()} for record, score in matches
+        ])
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except OperationalError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
 
-
 @app.post("/files/", response_model=FileResponse, status_code=status.HTTP_201_CREATED)
 async def add_file_metadata_api(
     request: FileAddRequest,
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_db_session),
     current_user: User = Depends(get_current_user) # Authenticated access
 ):
     """
     Adds a new metadata record for an existing file on the server.
     """
     try:
-        file_record = add_file_metadata(db, request.filepath, request.tags)
+        inferred_data = await run_fs('stat', prepare_file_metadata, request.filepath)
+        file_record = await add_file_metadata_async(db, request.filepath, request.tags, inferred_data=inferred_data)
         return FileResponse.from_orm(file_record)
     except FileNotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except FilesystemTimeoutError as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except FilesystemBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except OperationalError as e:
@@ -648,17 +967,60 @@ async def add_file_metadata_api(
 @app.get("/files/{file_id}", response_model=FileResponse)
 async def get_file_metadata_api(
     file_id: int,
-    db: Session = Depends(get_db_session),
+    http_request: Request,
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_read_db_session),
     current_user: User = Depends(get_current_user)
 ):
     """
     Retrieves full metadata for a single file by its ID.
+    Use `fields` to return only a subset of the metadata.
+    Responses carry ETag and Last-Modified; send them back in If-None-Match or
+    If-Modified-Since to get a 304 Not Modified when the file has not changed.
     """
     try:
-        file_record = get_file_metadata(db, file_id)
-        return FileResponse.from_orm(file_record)
+        requested_fields = parse_field_list(fields)
+        if requested_fields:
+            validate_file_fields(requested_fields)
+        updated_at, row_version = await get_file_version_async(db, file_id)
+        etag = _make_etag(file_id, updated_at.isoformat() if updated_at else None, row_version, fields and ",".join(requested_fields))
+        headers = _validator_headers(etag, updated_at)
+        if _is_not_modified(http_request, etag, updated_at):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        file_record = await get_file_record_async(db, file_id, fields=requested_fields)
+        return FastJSONResponse(content=file_record.to_dict(), headers=headers)
     except NoResultFound as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.patch("/files/tags", response_model=FileTagsBulkUpdateResponse)
+async def bulk_update_tags_api(
+    request: FileTagsBulkUpdateRequest,
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Adds, modifies and removes tags on many files at once, selected by `ids` or by
+    search `criteria`, in one transaction. Returns the affected counts.
+    """
+    search_criteria = _parse_search_criteria(request.criteria) if request.criteria else None
+    try:
+        result = await bulk_update_tags_async(
+            db,
+            file_ids=request.ids,
+            criteria=search_criteria,
+            tags_to_add_modify=request.tags_to_add_modify,
+            tags_to_remove=request.tags_to_remove
+        )
+        return FileTagsBulkUpdateResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except OperationalError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
     except Exception as e:
@@ -668,7 +1030,7 @@ async def get_file_metadata_api(
 async def update_file_metadata_api(
     file_id: int,
     request: FileUpdateRequest,
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_db_session),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -687,19 +1049,26 @@ async def update_file_metadata_api(
         )
 
     try:
-        updated_file = update_file_tags(
+        if request.new_filepath:
+            await run_fs('exists', check_new_filepath, request.new_filepath)
+        updated_file = await update_file_tags_async(
             db,
             file_id,
             tags_to_add_modify=request.tags_to_add_modify,
             tags_to_remove=request.tags_to_remove,
             new_filepath=request.new_filepath,
-            overwrite_existing=request.overwrite
+            overwrite_existing=request.overwrite,
+            verify_new_filepath=False
         )
         return FileResponse.from_orm(updated_file)
     except NoResultFound as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except FilesystemTimeoutError as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except FilesystemBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except OperationalError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
     except Exception as e:
@@ -708,7 +1077,7 @@ async def update_file_metadata_api(
 @app.delete("/files/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_file_metadata_api(
     file_id: int,
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_db_session),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -716,7 +1085,7 @@ async def delete_file_metadata_api(
     This does NOT affect the actual file on the filesystem.
     """
     try:
-        delete_file_metadata(db, file_id)
+        await delete_file_metadata_async(db, file_id)
         return {"message": f"Metadata for file ID {file_id} deleted successfully."}
     except NoResultFound as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -725,17 +1094,82 @@ async def delete_file_metadata_api(
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
 
-@app.get("/files/", response_model=List[FileResponse])
+async def _batch_get_response(db: AsyncSession, file_ids: List[int], fields: Optional[List[str]]) -> JSONResponse:
+    """Fetches files by ID in one query; one item per requested ID, in request order."""
+    records = await get_file_records_async(db, file_ids, fields=fields)
+    return FastJSONResponse(content=[
+        {"id": file_id, "found": record is not None, "file": record.to_dict(fields) if record else None}
+        for file_id, record in zip(file_ids, records)
+    ])
+
+@app.post("/files/batch-get", response_model=List[FileBatchItem])
+async def batch_get_files_api(
+    request: FileBatchGetRequest,
+    db: AsyncSession = Depends(get_async_read_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Retrieves metadata for several files by ID in a single query.
+    Results follow the order of `ids`; IDs that do not exist have `found: false`.
+    """
+    try:
+        fields = [field.strip().lower() for field in request.fields] if request.fields else None
+        return await _batch_get_response(db, request.ids, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.get("/files", include_in_schema=False) # Serve /files?ids=... without a redirect
+@app.get("/files/", response_model=Union[List[FileResponse], List[FileBatchItem]])
 async def list_files_api(
-    db: Session = Depends(get_db_session),
+    http_request: Request,
+    ids: Optional[str] = Query(None, description="Comma-separated file IDs to fetch in one query (e.g., '3,1,2'). "
+                                                 "Results follow this order, with `found: false` for unknown IDs."),
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_read_db_session),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Displays all file metadata records currently stored in the database.
+    Displays all file metadata records currently stored in the database,
+    or only the files listed in `ids`.
+    Use `fields` to return only a subset of the metadata for each file.
+    Send `Accept: application/x-ndjson` to stream the records as NDJSON.
+    The full list carries an ETag; send it back in If-None-Match to get a
+    304 Not Modified while no file has been added, changed or deleted.
     """
     try:
-        files = list_files(db)
-        return [FileResponse.from_orm(file) for file in files]
+        requested_fields = parse_field_list(fields)
+        if ids is not None:
+            try:
+                file_ids = [int(file_id) for file_id in ids.split(',') if file_id.strip()]
+            except ValueError:
+                raise ValueError(f"Invalid ids '{ids}'. Expected comma-separated integers, e.g. '3,1,2'.")
+            return await _batch_get_response(db, file_ids, requested_fields)
+
+        if requested_fields:
+            validate_file_fields(requested_fields)
+        wants_ndjson = _wants_ndjson(http_request)
+        # No Last-Modified here: deleting a file does not move the latest updated_at
+        list_version = await get_file_list_version_async(db)
+        etag = _make_etag(list_version, fields and ",".join(requested_fields), wants_ndjson)
+        headers = _validator_headers(etag)
+        if _is_not_modified(http_request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        if wants_ndjson:
+            response = _stream_file_records_ndjson(requested_fields)
+            response.headers.update(headers)
+            return response
+
+        # Read-only records are built from Core rows with tags aggregated in SQL and
+        # returned without re-validation through FileResponse
+        records = await list_file_records_async(db, fields=requested_fields)
+        return FastJSONResponse(content=[record.to_dict() for record in records], headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except OperationalError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
     except Exception as e:
@@ -746,17 +1180,23 @@ async def list_files_api(
 async def rename_file_api(
     file_id: int,
     request: FileRenameRequest,
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_db_session),
     current_user: User = Depends(get_current_user) # Can be admin or regular user
 ):
     """
     Renames a file on the disk and updates its corresponding metadata entry in the database.
+    The rename itself has no timeout: the record is only updated once it is known to have happened.
     """
     try:
-        updated_file = rename_file_entry(db, file_id, request.new_name)
+        file_record = await get_file_record_async(db, file_id, fields=['filepath'])
+        new_filepath = await run_fs('rename', rename_file_on_disk, file_record.filepath, request.new_name,
+                                    wait_for_completion=True)
+        updated_file = await record_file_rename_async(db, file_id, new_filepath)
         return FileResponse.from_orm(updated_file)
     except NoResultFound as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except FilesystemBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except FileNotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"File not found on disk: {e}")
     except FileExistsError as e:
@@ -771,7 +1211,7 @@ async def rename_file_api(
 # NEW: Endpoint for listing and searching tags
 @app.get("/tags/", response_model=Union[List[TagResponse], List[UniqueTagKeyValuePair]])
 async def list_and_search_tags_api(
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_read_db_session),
     current_user: User = Depends(get_current_user),
     unique: bool = Query(False, description="If True, returns unique tag keys or unique key-value pairs."),
     sort_by: Optional[str] = Query(None, description="Sort results by 'key' or 'value'."),
@@ -790,8 +1230,8 @@ async def list_and_search_tags_api(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sort_order value. Must be 'asc' or 'desc'.")
 
     try:
-        results = list_and_search_tags(
-            db=db,
+        results = await list_and_search_tags_async(
+            db,
             unique=unique,
             sort_by=sort_by,
             sort_order=sort_order,
@@ -818,21 +1258,404 @@ async def list_and_search_tags_api(
 @app.post("/files/validate", response_model=List[FileValidationResult])
 async def validate_files_api(
     request: FileValidationRequest,
-    db: Session = Depends(get_db_session),
+    db: AsyncSession = Depends(get_async_read_db_session),
     current_user: User = Depends(get_current_user) # Can be admin or regular user
 ):
     """
     Validates file metadata records against file system existence and tag presence.
     """
     try:
-        validation_results = validate_file_metadata(
-            db=db,
+        validation_results = await validate_file_metadata_async(
+            db,
             check_all=request.check_all,
             criteria=request.criteria,
             tag_key=request.tag_key,
-            tag_value=request.tag_value
+            tag_value=request.tag_value,
+            check_disk=False
         )
+        filepaths = [result['filepath'] for result in validation_results]
+        disk_exists = await run_fs_batched('exists', files_exist_on_disk, filepaths)
+        for result, exists in zip(validation_results, disk_exists):
+            result['disk_exists'] = exists
         return validation_results
+    except FilesystemTimeoutError as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except FilesystemBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+# --- Saved Search (Smart Folder) Endpoints ---
+@app.post("/saved-searches/", response_model=SavedSearchResponse, status_code=status.HTTP_201_CREATED)
+async def create_saved_search_api(
+    request: SavedSearchCreateRequest,
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Saves a named search and materializes its current result set.
+    """
+    search_criteria = _parse_search_criteria(request.criteria)
+    try:
+        saved_search = await create_saved_search_async(db, request.name, search_criteria, created_by=current_user.username)
+        return SavedSearchResponse.from_orm(saved_search)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.get("/saved-searches/", response_model=List[SavedSearchResponse])
+async def list_saved_searches_api(
+    db: AsyncSession = Depends(get_async_read_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Lists all saved searches.
+    """
+    try:
+        return [SavedSearchResponse.from_orm(saved_search) for saved_search in await list_saved_searches_async(db)]
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.get("/saved-searches/{name}/files", response_model=List[FileResponse])
+async def list_saved_search_files_api(
+    name: str,
+    refresh: bool = Query(False, description="If True, incrementally refresh the saved search before reading it."),
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Returns the files in a saved search's materialized result set.
+    """
+    try:
+        requested_fields = parse_field_list(fields)
+        records = await list_saved_search_files_async(db, name, refresh=refresh, fields=requested_fields)
+        return FastJSONResponse(content=[record.to_dict() for record in records])
+    except NoResultFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.post("/saved-searches/{name}/refresh", response_model=SavedSearchRefreshResponse)
+async def refresh_saved_search_api(
+    name: str,
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Incrementally refreshes a saved search from the files changed since its last refresh.
+    """
+    try:
+        added = await refresh_saved_search_async(db, name)
+        return SavedSearchRefreshResponse(name=name, added=added)
+    except NoResultFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.delete("/saved-searches/{name}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_saved_search_api(
+    name: str,
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Deletes a saved search and its materialized result set. Files are not affected.
+    Only the user who created the saved search or an admin may delete it.
+    """
+    try:
+        await delete_saved_search_async(db, name, created_by=None if current_user.role == "admin" else current_user.username)
+    except NoResultFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.get("/stats/usage", response_model=StorageUsageResponse)
+async def storage_usage_api(
+    by: str = Query("directory", description=f"Usage dimension, one of: {', '.join(ROLLUP_DIMENSIONS)}."),
+    path: Optional[str] = Query(None, description="Directory to report on when by=directory (default: the root)."),
+    limit: Optional[int] = Query(None, gt=0, description="Maximum number of entries to return."),
+    db: AsyncSession = Depends(get_async_read_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    du-style bytes and file counts under a directory (per subdirectory), per owner
+    or per mime type, read from incrementally maintained rollups.
+    """
+    try:
+        return await get_storage_usage_async(db, dimension=by, path=path, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.get("/metrics")
+async def metrics_api(current_admin_user: User = Depends(get_admin_user)):
+    """
+    Operational metrics for this API process (admin only).
+    filesystem_io: the filesystem I/O executor's pending calls, rejections and per-operation latency, errors and timeouts.
+    database_pool: connections in use, pool saturation and checkout wait times per engine.
+    read_replicas: replication lag per replica and how read-only requests were routed.
+    admission: per endpoint class, requests in flight and queued, and 429 rejections.
+    change_feed: /changes subscribers and events delivered.
+    auth_token_cache: verified-token cache hits, misses and size, and the revoked tokens known to this process.
+    """
+    return {
+        'filesystem_io': fs_io_metrics(),
+        'database_pool': get_pool_metrics(),
+        'read_replicas': get_replica_status(),
+        'admission': admission.metrics(),
+        'change_feed': change_feed.metrics(),
+        'auth_token_cache': token_cache.metrics(),
+    }
+
+# --- Change Feed ---
+@app.get("/changes")
+async def stream_changes_api(
+    request: Request,
+    since: Optional[int] = Query(None, description="Resume after this sequence number (replaying missed changes)."),
+    last_event_id: Optional[str] = Header(None, description="Set by EventSource clients when reconnecting; used if 'since' is not given."),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streams file changes as Server-Sent Events instead of polling /files/.
+    Each 'change' event carries {seq, op, id, filepath, changed_fields, changed_at} with the
+    sequence number as its event ID; op is create, update, rename or delete. A 'ready'
+    event marks the switch from replay to live. 'reset' means changes after `since` were
+    already deleted (resynchronize from /files/); 'overflow' means the client fell too far
+    behind and should reconnect with the last sequence number it received.
+    """
+    if since is None and last_event_id:
+        try:
+            since = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Last-Event-ID must be a change sequence number.")
+    if since is not None and since < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'since' must not be negative.")
+    return StreamingResponse(
+        change_feed.stream(since, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# --- Background Jobs ---
+# Long-running operations are queued in the jobs table and run by 'filemeta jobs worker'
+# processes, off the request path; they keep running if the client disconnects.
+
+# Job kinds only admins may submit (import restores a backup from a server-side file)
+ADMIN_ONLY_JOB_KINDS = ('import',)
+
+def _job_owner(current_user: User) -> Optional[str]:
+    """Admins see every job; other users only the jobs they submitted."""
+    return None if current_user.role == "admin" else current_user.username
+
+@app.post("/jobs", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_job_api(
+    request: JobSubmitRequest,
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Queues a background job: validate, export, import (admin only), ingest or tag.
+    Follow it with GET /jobs/{id}; download its output from GET /jobs/{id}/result.
+    """
+    if request.kind in ADMIN_ONLY_JOB_KINDS and current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Only admins can submit {request.kind} jobs.")
+    try:
+        job = await submit_job_async(db, request.kind, request.params, created_by=current_user.username)
+        return job.to_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.get("/jobs", response_model=List[JobResponse])
+async def list_jobs_api(
+    job_status: Optional[str] = Query(None, alias="status", description=f"Only jobs with this status: {', '.join(JOB_STATUSES)}."),
+    limit: int = Query(50, gt=0, le=1000, description="Maximum number of jobs to return (newest first)."),
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Lists background jobs, newest first.
+    """
+    try:
+        found = await list_jobs_async(db, status=job_status, created_by=_job_owner(current_user), limit=limit)
+        return [job.to_dict() for job in found]
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job_api(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Returns a job's status, progress and result summary.
+    """
+    try:
+        job = await get_job_async(db, job_id, created_by=_job_owner(current_user))
+        return job.to_dict()
+    except NoResultFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.post("/jobs/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job_api(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Cancels a queued job, or asks a running job to stop at its next progress update.
+    """
+    try:
+        job = await cancel_job_async(db, job_id, created_by=_job_owner(current_user))
+        return job.to_dict()
+    except NoResultFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.get("/jobs/{job_id}/result")
+async def download_job_result_api(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Downloads the output file of a finished job (validation report, export).
+    """
+    try:
+        job = await get_job_async(db, job_id, created_by=_job_owner(current_user))
+    except NoResultFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+    if job.status != 'succeeded':
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job {job_id} has no result (status: {job.status}).")
+    if not job.result_path:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} did not produce an output file.")
+    if not await run_fs('exists', os.path.exists, job.result_path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"The output file of job {job_id} is no longer available.")
+    return FileDownloadResponse(job.result_path, filename=os.path.basename(job.result_path))
+
+# --- Analytics ---
+# Served from an in-memory columnar snapshot (filemeta.analytics) that is refreshed
+# incrementally, so these endpoints do not scan the files table on every call.
+
+ANALYTICS_GROUP_DESCRIPTION = f"Group results by one of: {', '.join(GROUP_BY_OPTIONS)}."
+ANALYTICS_REFRESH_DESCRIPTION = "If True, refresh the snapshot from the database before answering."
+
+@app.get("/analytics/size-histogram")
+def size_histogram_api(
+    by: Optional[str] = Query(None, description=ANALYTICS_GROUP_DESCRIPTION),
+    bins: int = Query(20, gt=0, le=1000, description="Number of size buckets."),
+    scale: str = Query("log", description=f"Bucket scale, one of: {', '.join(HISTOGRAM_SCALES)}."),
+    refresh: bool = Query(False, description=ANALYTICS_REFRESH_DESCRIPTION),
+    db: Session = Depends(get_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Counts files and bytes per file-size bucket, optionally per mime type or owner.
+    """
+    try:
+        snapshot = get_snapshot(db, refresh=refresh)
+        result = snapshot.size_histogram(bins=bins, by=by, scale=scale)
+        return FastJSONResponse(content={**result, "snapshot": snapshot.info()})
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.get("/analytics/size-percentiles")
+def size_percentiles_api(
+    by: Optional[str] = Query(None, description=ANALYTICS_GROUP_DESCRIPTION),
+    percentiles: str = Query("50,90,99", description="Comma-separated percentiles between 0 and 100."),
+    refresh: bool = Query(False, description=ANALYTICS_REFRESH_DESCRIPTION),
+    db: Session = Depends(get_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Computes file-size percentiles, overall or per mime type or owner.
+    """
+    try:
+        try:
+            requested_percentiles = [float(value) for value in percentiles.split(',') if value.strip()]
+        except ValueError:
+            raise ValueError(f"Invalid percentiles '{percentiles}'. Expected comma-separated numbers, e.g. '50,90,99'.")
+        snapshot = get_snapshot(db, refresh=refresh)
+        result = snapshot.size_percentiles(percentiles=requested_percentiles, by=by)
+        return FastJSONResponse(content={**result, "snapshot": snapshot.info()})
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except OperationalError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {e}")
+
+@app.get("/analytics/top-files")
+def top_files_api(
+    by: Optional[str] = Query(None, description=ANALYTICS_GROUP_DESCRIPTION),
+    key: str = Query("size", description=f"Rank by one of: {', '.join(TOP_KEYS)}."),
+    k: int = Query(100, gt=0, le=10000, description="Number of files to return (per group when grouped)."),
+    refresh: bool = Query(False, description=ANALYTICS_REFRESH_DESCRIPTION),
+    db: Session = Depends(get_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Returns the largest (or most recently modified/accessed) files, optionally per group.
+    """
+    try:
+        snapshot = get_snapshot(db, refresh=refresh)
+        result = snapshot.top_files(k=k, by=by, key=key)
+        attach_filepaths(db, result["files"])
+        return FastJSONResponse(content={**result, "snapshot": snapshot.info()})
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except OperationalError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
     except Exception as e:
@@ -232,6 +232,29 @@ class FileResponse(BaseModel):
 
         return cls(**data)
 
+# Schemas for count-only and exists-only search modes
+class FileCountResponse(BaseModel):
+    count: int
+    approximate: bool = Field(False, description="True if the count is a query planner estimate.")
+
+class FileExistsResponse(BaseModel):
+    exists: bool
+
+# Schema for fuzzy / prefix filename matches
+class FileMatchResponse(BaseModel):
+    score: float = Field(..., description="Trigram similarity between the filename and the query (0-1).")
+    file: FileResponse
+
+# Schemas for fetching several files by ID in one request
+class FileBatchGetRequest(BaseModel):
+    ids: List[int] = Field(..., min_items=1, description="File IDs to fetch. Results follow this order.")
+    fields: Optional[List[str]] = Field(None, description="Only return these fields for each file.")
+
+class FileBatchItem(BaseModel):
+    id: int
+    found: bool
+    file: Optional[FileResponse] = Field(None, description="The file's metadata, or null if the ID was not found.")
+
 
 class SearchQueryParams(BaseModel):
     keywords: Optional[List[str]] = None
@@ -248,3 +271,71 @@ class SearchQueryParams(BaseModel):
     modified_between: Optional[List[str]] = Field(None, min_items=2, max_items=2, description="Search for files modified within this date/time range.")
     accessed_between: Optional[List[str]] = Field(None, min_items=2, max_items=2, description="Search for files last accessed within this date/time range.")
 
+class FileTagsBulkUpdateRequest(BaseModel):
+    ids: Optional[List[int]] = Field(None, description="IDs of the files to change.")
+    criteria: Optional[SearchQueryParams] = Field(None, description="Search criteria selecting the files instead, as accepted by /files/search.")
+    tags_to_add_modify: Optional[Dict[str, Any]] = Field(None, description="Tags to add or modify on every file (key: value).")
+    tags_to_remove: Optional[List[str]] = Field(None, description="Tag keys to remove from every file.")
+
+class FileTagsBulkUpdateResponse(BaseModel):
+    files_matched: int
+    files_missing: int = Field(..., description="Requested IDs that do not exist.")
+    tags_added: int
+    tags_updated: int = Field(..., description="Existing tags whose value changed.")
+    tags_removed: int
+
+# --- Saved Search Schemas ---
+class SavedSearchCreateRequest(BaseModel):
+    name: str = Field(..., min_length=1, description="Unique name of the saved search.")
+    criteria: SearchQueryParams = Field(..., description="Search criteria, as accepted by /files/search.")
+
+class SavedSearchResponse(BaseModel):
+    id: int
+    name: str
+    criteria: Dict[str, Any]
+    created_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+    last_refreshed_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+class SavedSearchRefreshResponse(BaseModel):
+    name: str
+    added: int = Field(..., description="Number of files (re-)added to the saved search by this refresh.")
+
+# --- Storage Usage Schemas ---
+class StorageUsageEntry(BaseModel):
+    key: str = Field(..., description="Subdirectory path, owner or mime type.")
+    file_count: int
+    total_bytes: int
+
+class StorageUsageResponse(BaseModel):
+    dimension: str
+    path: Optional[str] = Field(None, description="Directory the totals refer to (directory usage only).")
+    file_count: int
+    total_bytes: int
+    entries: List[StorageUsageEntry]
+
+# --- Background Job Schemas ---
+class JobSubmitRequest(BaseModel):
+    kind: str = Field(..., description="One of: validate, export, import, ingest, tag.")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Parameters for the job kind.")
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    params: Dict[str, Any]
+    status: str = Field(..., description="queued, running, succeeded, failed or cancelled.")
+    cancel_requested: bool = False
+    progress_done: int = 0
+    progress_total: Optional[int] = Field(None, description="Total units of work, if known.")
+    message: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    has_result_file: bool = Field(False, description="If True, GET /jobs/{id}/result downloads the job's output.")
+    error: Optional[str] = None
+    attempts: int = 0
+    created_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,57 @@
+# tests/conftest.py
+import os
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from filemeta.models import Base
+
+# Tests that take the 'db' fixture need a PostgreSQL database they may create tables in,
+# given as TEST_DATABASE_URL, and are skipped without one. Everything they write, commits
+# included, is rolled back.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+@pytest.fixture
+def db():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(TEST_DATABASE_URL)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        Base.metadata.create_all(bind=connection)
+        session = Session(bind=connection, join_transaction_mode="create_savepoint")
+        try:
+            yield session
+        finally:
+            session.close()
+            transaction.rollback()
+    engine.dispose()
+
+@pytest.fixture
+def async_db():
+    """
+    Async counterpart of 'db'. An AsyncSession cannot outlive the event loop it was
+    opened on, so this returns an async context manager for use inside asyncio.run().
+    """
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    @asynccontextmanager
+    async def async_session():
+        engine = create_async_engine(make_url(TEST_DATABASE_URL).set(drivername="postgresql+asyncpg"))
+        async with engine.connect() as connection:
+            transaction = await connection.begin()
+            await connection.run_sync(Base.metadata.create_all)
+            session = AsyncSession(bind=connection, join_transaction_mode="create_savepoint",
+                                   autoflush=False, expire_on_commit=False)
+            try:
+                yield session
+            finally:
+                await session.close()
+                await transaction.rollback()
+        await engine.dispose()
+    return async_session
@@ -0,0 +1,121 @@
+# tests/test_admission.py
+import asyncio
+import json
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, TokenBucket, rejection_response
+
+# The token buckets run on a fake clock; the concurrency gates queue on the event loop
+# with short timeouts.
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+LIMITS = {
+    'cheap': {'rate': 1, 'burst': 2, 'per_user': 2, 'total': 3},
+    'expensive': {'rate': 1, 'burst': 10, 'per_user': 1, 'total': 1},
+}
+
+def _controller(clock=None, queue_timeout=0.05) -> AdmissionController:
+    return AdmissionController(
+        [("GET", r"/files/search")], exempt_paths=("/token",), limits=LIMITS,
+        queue_timeout=queue_timeout, clock=clock or FakeClock()
+    )
+
+def test_token_bucket_allows_bursts_then_the_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+    assert [bucket.reserve(max_wait=0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    with pytest.raises(AdmissionRejected) as rejected:
+        bucket.reserve(max_wait=0)
+    assert rejected.value.reason == 'rate'
+    assert rejected.value.retry_after == pytest.approx(0.5)
+
+    clock.advance(0.5)
+    assert bucket.reserve(max_wait=0) == 0.0
+    assert bucket.reserve(max_wait=1) == pytest.approx(0.5) # Admitted after waiting for the next token
+    assert not bucket.is_full()
+    clock.advance(10)
+    assert bucket.is_full()
+
+def test_classify():
+    admission = _controller()
+    assert admission.classify("GET", "/files/search") == 'expensive'
+    assert admission.classify("POST", "/files/search") == 'cheap'
+    assert admission.classify("GET", "/files/search/extra") == 'cheap'
+    assert admission.classify("POST", "/token") is None
+
+def test_rate_limit_rejects_until_tokens_refill():
+    clock = FakeClock()
+    admission = _controller(clock, queue_timeout=0)
+
+    async def run():
+        for _ in range(2):
+            (await admission.admit("user:a", 'cheap'))()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.admit("user:a", 'cheap')
+        assert rejected.value.reason == 'rate'
+        (await admission.admit("user:b", 'cheap'))() # Every user has a bucket of their own
+        clock.advance(1)
+        (await admission.admit("user:a", 'cheap'))()
+
+    asyncio.run(run())
+    metrics = admission.metrics()['classes']['cheap']
+    assert metrics['admitted'] == 4
+    assert metrics['rejected']['rate'] == 1
+
+def test_concurrency_limits_per_user_and_in_total():
+    admission = _controller()
+
+    async def run():
+        release_a = await admission.admit("user:a", 'expensive')
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.admit("user:a", 'expensive')
+        assert rejected.value.reason == 'user_concurrency'
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.admit("user:b", 'expensive')
+        assert rejected.value.reason == 'total_concurrency'
+        assert admission.metrics()['classes']['expensive']['in_flight'] == 1
+        release_a()
+        (await admission.admit("user:b", 'expensive'))()
+
+    asyncio.run(run())
+    metrics = admission.metrics()['classes']['expensive']
+    assert metrics['in_flight'] == 0
+    assert metrics['rejected'] == {'rate': 0, 'user_concurrency': 1, 'total_concurrency': 1}
+
+def test_queued_request_is_admitted_when_a_slot_frees_up():
+    admission = _controller(queue_timeout=1)
+
+    async def run():
+        release_first = await admission.admit("user:a", 'expensive')
+        second = asyncio.ensure_future(admission.admit("user:a", 'expensive'))
+        await asyncio.sleep(0.01)
+        assert not second.done()
+        assert admission.metrics()['classes']['expensive']['queue_depth'] == 1
+        release_first()
+        (await asyncio.wait_for(second, 1))()
+
+    asyncio.run(run())
+    metrics = admission.metrics()['classes']['expensive']
+    assert metrics['admitted'] == 2
+    assert metrics['queued'] == 1
+    assert metrics['queue_depth'] == 0
+
+def test_rejection_response_is_429_with_retry_after():
+    response = rejection_response(AdmissionRejected('rate', 0.2), 'expensive')
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert json.loads(response.body) == {"detail": "Too many expensive requests. Retry after 1 seconds."}
+
+    response = rejection_response(AdmissionRejected('total_concurrency', 2.5), 'cheap')
+    assert response.headers["Retry-After"] == "3"
+    assert "concurrent cheap requests" in json.loads(response.body)["detail"]
@@ -0,0 +1,66 @@
+# tests/test_async_sessions.py
+import asyncio
+
+from filemeta import database, metadata_manager
+from filemeta.metadata_manager import (
+    add_file_metadata_async, count_files_by_criteria_async, delete_file_metadata_async,
+    get_file_record_async, search_file_records_async, update_file_tags_async
+)
+
+# The *_async variants run the synchronous functions through run_sync(), so their
+# queries go through asyncpg.
+
+def _add_file_async(db, filepath, file_size, tags):
+    return add_file_metadata_async(
+        db, filepath, tags, inferred_data={"os_owner": "alice", "file_size": file_size, "mime_type": "text/plain"}
+    )
+
+def test_writes_return_files_with_their_tags_loaded(async_db):
+    async def run():
+        async with async_db() as db:
+            added = await _add_file_async(db, "/srv/async/one.txt", 100, {"project": "async"})
+            # to_dict() reads File.tags, which cannot be lazy-loaded outside run_sync()
+            assert added.to_dict()["Custom Tags"] == {"project": "async"}
+            updated = await update_file_tags_async(db, added.id, {"status": "done"})
+            assert updated.to_dict()["Custom Tags"] == {"project": "async", "status": "done"}
+            return (await get_file_record_async(db, added.id)).to_dict()["Custom Tags"]
+
+    assert asyncio.run(run()) == {"project": "async", "status": "done"}
+
+def test_reads_and_deletes(async_db):
+    async def run():
+        async with async_db() as db:
+            small = await _add_file_async(db, "/srv/async/small.txt", 10, {})
+            large = await _add_file_async(db, "/srv/async/large.txt", 10**9, {})
+            found = await search_file_records_async(db, keywords=["/srv/async/"], fields=['id'])
+            assert {record.id for record in found} == {small.id, large.id}
+            assert await count_files_by_criteria_async(db, keywords=["/srv/async/large"]) == (1, False)
+            await delete_file_metadata_async(db, small.id)
+            return await count_files_by_criteria_async(db, keywords=["/srv/async/"])
+
+    assert asyncio.run(run()) == (1, False)
+
+def test_approximate_count_explains_the_query_through_asyncpg(async_db, monkeypatch):
+    # The EXPLAIN is sent as driver SQL, with asyncpg's $1, $2 placeholders
+    monkeypatch.setattr(metadata_manager, "APPROXIMATE_COUNT_THRESHOLD", 0)
+
+    async def run():
+        async with async_db() as db:
+            return await count_files_by_criteria_async(
+                db, approximate=True, keywords=["/srv/async/", "report"])
+
+    estimate, approximate = asyncio.run(run())
+    assert approximate and estimate >= 0
+
+def test_commit_keeps_the_client_on_the_primary(async_db, monkeypatch):
+    monkeypatch.setattr(database, "read_replicas", [object()]) # Only checked for being non-empty
+    marked = []
+
+    async def run():
+        async with async_db() as db:
+            database._on_client_commit(db.sync_session, "erin", marked.append)
+            await _add_file_async(db, "/srv/async/written.txt", 1, {}) # Commits
+
+    asyncio.run(run())
+    assert len(marked) == 1
+    assert database._wrote_recently("erin")
@@ -0,0 +1,52 @@
+# tests/test_bulk_update_tags.py
+from filemeta.models import Tag
+from filemeta.metadata_manager import add_file_metadata, bulk_update_tags
+
+# bulk_update_tags() counts its changes from the set-based statements themselves: matched
+# (and locked) files, deleted rows, and upserted rows split by xmax into added and updated.
+
+def _add_files(db, directory, tags_per_file):
+    return [
+        add_file_metadata(db, f"/srv/{directory}/file{i}.txt", tags, inferred_data={"os_owner": "tester"})
+        for i, tags in enumerate(tags_per_file)
+    ]
+
+def _tags(db, file_id):
+    db.expire_all()
+    return {tag.key: tag.get_typed_value() for tag in db.query(Tag).filter(Tag.file_id == file_id)}
+
+def test_bulk_update_by_ids_counts_each_kind_of_change(db):
+    first, second, third = _add_files(db, "bulkids", [
+        {"stage": "draft", "old": 1},
+        {"stage": "final"},
+        {"other": "x"},
+    ])
+    missing_id = third.id + 1000
+
+    result = bulk_update_tags(
+        db, file_ids=[first.id, second.id, third.id, missing_id, first.id],
+        tags_to_add_modify={"stage": "final", "reviewed": True}, tags_to_remove=["old"]
+    )
+
+    assert result == {
+        'files_matched': 3,
+        'files_missing': 1,
+        'tags_added': 4,   # 'reviewed' on all three, 'stage' on the third
+        'tags_updated': 1, # 'stage' draft -> final on the first; the second already had it
+        'tags_removed': 1,
+    }
+    assert _tags(db, first.id) == {"stage": "final", "reviewed": True}
+    assert _tags(db, second.id) == {"stage": "final", "reviewed": True}
+    assert _tags(db, third.id) == {"other": "x", "stage": "final", "reviewed": True}
+
+def test_bulk_update_by_criteria_changes_only_matching_files(db):
+    matching = _add_files(db, "bulkcriteria", [{"team": "a"}, {"team": "b", "tmp": 1}])
+    other = add_file_metadata(db, "/srv/elsewhere/file.txt", {"team": "c", "tmp": 1}, inferred_data={"os_owner": "tester"})
+
+    result = bulk_update_tags(
+        db, criteria={"keywords": ["bulkcriteria"]}, tags_to_add_modify={"team": "a"}, tags_to_remove=["tmp"]
+    )
+
+    assert result == {'files_matched': 2, 'files_missing': 0, 'tags_added': 0, 'tags_updated': 1, 'tags_removed': 1}
+    assert [_tags(db, file.id) for file in matching] == [{"team": "a"}, {"team": "a"}]
+    assert _tags(db, other.id) == {"team": "c", "tmp": 1}
@@ -0,0 +1,132 @@
+# tests/test_change_feed.py
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from sqlalchemy import delete, func, select
+
+from filemeta import changes
+from filemeta.changes import ChangeFeed, _Subscription
+from filemeta.metadata_manager import add_file_metadata
+from filemeta.models import FileChange
+
+# The feed reads the outbox through changes.get_async_db(); here it hands out the test's
+# session. Events are inserted with explicit sequence numbers to lay out gaps.
+
+def _use_session(monkeypatch, db):
+    @asynccontextmanager
+    async def test_session():
+        yield db
+    monkeypatch.setattr(changes, "get_async_db", test_session)
+
+async def _insert_events(db, *seqs):
+    db.add_all(FileChange(seq=seq, op='update', file_id=1, filepath=f"/srv/feed/{seq}.txt") for seq in seqs)
+    await db.commit()
+
+async def _feed_after_existing_events(db) -> ChangeFeed:
+    feed = ChangeFeed()
+    feed.cursor = (await db.execute(select(func.coalesce(func.max(FileChange.seq), 0)))).scalar()
+    return feed
+
+def _queued_seqs(subscription: _Subscription):
+    seqs = []
+    while not subscription.queue.empty():
+        seqs.append(subscription.queue.get_nowait()["seq"])
+    return seqs
+
+def test_writes_add_outbox_events(db):
+    record = add_file_metadata(db, "/srv/feed/new.txt", {"project": "feed"},
+                               inferred_data={"os_owner": "alice", "file_size": 1, "mime_type": "text/plain"})
+    event = db.execute(select(FileChange).where(FileChange.file_id == record.id)).scalar_one()
+    assert (event.op, event.filepath) == ('create', "/srv/feed/new.txt")
+
+def test_delivery_waits_for_a_gap_to_fill(async_db, monkeypatch):
+    monkeypatch.setattr(changes, "CHANGE_FEED_GAP_TIMEOUT_SECONDS", 60)
+
+    async def run():
+        async with async_db() as db:
+            _use_session(monkeypatch, db)
+            feed = await _feed_after_existing_events(db)
+            subscription = _Subscription()
+            feed.subscribers.add(subscription)
+            base = feed.cursor
+
+            # base + 2 is still uncommitted in some other transaction
+            await _insert_events(db, base + 1, base + 3)
+            assert await feed._deliver_new_events() # Waiting on the gap
+            assert _queued_seqs(subscription) == [base + 1]
+
+            await _insert_events(db, base + 2)
+            assert not await feed._deliver_new_events()
+            assert _queued_seqs(subscription) == [base + 2, base + 3]
+            return feed
+
+    feed = asyncio.run(run())
+    assert feed.gaps_skipped == 0
+    assert feed.gap_since is None
+
+def test_delivery_skips_a_gap_after_the_timeout(async_db, monkeypatch):
+    monkeypatch.setattr(changes, "CHANGE_FEED_GAP_TIMEOUT_SECONDS", 0)
+
+    async def run():
+        async with async_db() as db:
+            _use_session(monkeypatch, db)
+            feed = await _feed_after_existing_events(db)
+            subscription = _Subscription()
+            feed.subscribers.add(subscription)
+            base = feed.cursor
+
+            await _insert_events(db, base + 2) # base + 1 was rolled back
+            assert not await feed._deliver_new_events()
+            assert _queued_seqs(subscription) == [base + 2]
+            return feed, base
+
+    feed, base = asyncio.run(run())
+    assert feed.gaps_skipped == 1
+    assert feed.cursor == base + 2
+
+def _parse(message: str):
+    fields = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    return fields["event"], json.loads(fields["data"])
+
+def test_stream_replays_then_goes_live_and_overflows(async_db, monkeypatch):
+    monkeypatch.setattr(changes, "CHANGE_FEED_QUEUE_SIZE", 1)
+
+    async def not_disconnected():
+        return False
+
+    async def run():
+        async with async_db() as db:
+            _use_session(monkeypatch, db)
+            await db.execute(delete(FileChange)) # Older events expired
+            feed = ChangeFeed()
+            base = (await db.execute(select(func.nextval('file_changes_seq_seq')))).scalar()
+            await _insert_events(db, base + 2, base + 3)
+            feed.cursor = base + 3
+
+            async def already_started():
+                pass
+            feed._start = already_started # No LISTEN connection or delivery task
+
+            stream = feed.stream(base, not_disconnected)
+            received = [_parse(await stream.__anext__()) for _ in range(4)]
+            assert [event for event, _ in received] == ["reset", "change", "change", "ready"]
+            assert received[0][1] == {"requested_since": base, "oldest_seq": base + 2}
+            assert [data["seq"] for _, data in received[1:3]] == [base + 2, base + 3]
+            assert received[3][1] == {"seq": base + 3}
+
+            # Events already replayed are not sent twice
+            live = asyncio.ensure_future(stream.__anext__())
+            feed._publish({"seq": base + 3})
+            await asyncio.sleep(0.01)
+            feed._publish({"seq": base + 4})
+            assert _parse(await live) == ("change", {"seq": base + 4})
+
+            # The queue holds one event; the second overflows it
+            feed._publish({"seq": base + 5})
+            feed._publish({"seq": base + 6})
+            assert _parse(await stream.__anext__()) == ("change", {"seq": base + 5})
+            assert _parse(await stream.__anext__()) == ("overflow", {"resume_from": base + 5})
+            assert not feed.subscribers
+
+    asyncio.run(run())
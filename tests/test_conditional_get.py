@@ -0,0 +1,52 @@
+# tests/test_conditional_get.py
+from datetime import datetime, timezone
+
+from starlette.requests import Request
+
+from main import _http_date, _is_not_modified, _make_etag
+
+# If-None-Match and If-Modified-Since handling for conditional GETs (RFC 7232)
+
+LAST_MODIFIED = datetime(2024, 5, 1, 12, 30, 15, 250000, tzinfo=timezone.utc)
+
+def _request(**headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/files/1",
+        "headers": [(name.replace("_", "-").lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+def test_make_etag_is_quoted_and_depends_on_every_part():
+    etag = _make_etag(1, "2024-05-01", "123")
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == _make_etag(1, "2024-05-01", "123")
+    assert etag != _make_etag(1, "2024-05-01", "124")
+    assert _make_etag(1, None) != _make_etag(1, "")
+
+def test_if_none_match():
+    etag = _make_etag(1, "v1")
+    assert _is_not_modified(_request(if_none_match=etag), etag)
+    assert _is_not_modified(_request(if_none_match=f"W/{etag}"), etag) # Weak comparison
+    assert _is_not_modified(_request(if_none_match=f'"other", {etag}'), etag)
+    assert _is_not_modified(_request(if_none_match="*"), etag)
+    assert not _is_not_modified(_request(if_none_match='"other"'), etag)
+    assert not _is_not_modified(_request(if_none_match=etag.strip('"')), etag)
+    assert not _is_not_modified(_request(), etag)
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    etag = _make_etag(1, "v1")
+    request = _request(if_none_match='"other"', if_modified_since=_http_date(LAST_MODIFIED))
+    assert not _is_not_modified(request, etag, LAST_MODIFIED)
+
+def test_if_modified_since_compares_at_one_second_resolution():
+    etag = _make_etag(1, "v1")
+    same_second = _http_date(LAST_MODIFIED) # Drops the 250 ms
+    assert _is_not_modified(_request(if_modified_since=same_second), etag, LAST_MODIFIED)
+    assert _is_not_modified(_request(if_modified_since="Wed, 01 May 2024 12:31:00 GMT"), etag, LAST_MODIFIED)
+    assert not _is_not_modified(_request(if_modified_since="Wed, 01 May 2024 12:30:14 GMT"), etag, LAST_MODIFIED)
+
+def test_if_modified_since_without_last_modified_or_unparsable():
+    etag = _make_etag(1, "v1")
+    assert not _is_not_modified(_request(if_modified_since=_http_date(LAST_MODIFIED)), etag)
+    assert not _is_not_modified(_request(if_modified_since="yesterday"), etag, LAST_MODIFIED)
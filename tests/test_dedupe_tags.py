@@ -0,0 +1,27 @@
+# tests/test_dedupe_tags.py
+from sqlalchemy import text
+
+from filemeta.models import File, FileChange, Tag
+from filemeta.metadata_manager import add_file_metadata, dedupe_tags
+
+# Removing duplicate tags changes the files they belong to, so those files must look
+# updated (updated_at, change feed) like after any other tag change
+
+def test_dedupe_tags_marks_affected_files_updated(db):
+    duplicated = add_file_metadata(db, "/srv/dedupe/a.txt", {"stage": "draft"}, inferred_data={"os_owner": "tester"})
+    untouched = add_file_metadata(db, "/srv/dedupe/b.txt", {"stage": "draft"}, inferred_data={"os_owner": "tester"})
+    db.execute(text("DROP INDEX uq_tags_file_id_key"))
+    db.add(Tag(file_id=duplicated.id, key="stage", value="final", value_type="str"))
+    db.commit()
+    updated_before = {file.id: file.updated_at for file in (duplicated, untouched)}
+    last_seq = db.query(FileChange.seq).order_by(FileChange.seq.desc()).limit(1).scalar()
+
+    assert dedupe_tags(db) == 1
+
+    db.expire_all()
+    assert [(tag.key, tag.value) for tag in db.query(Tag).filter(Tag.file_id == duplicated.id)] == [("stage", "final")]
+    assert db.get(File, duplicated.id).updated_at > updated_before[duplicated.id]
+    assert db.get(File, untouched.id).updated_at == updated_before[untouched.id]
+    events = db.query(FileChange).filter(FileChange.seq > last_seq).all()
+    assert [(event.op, event.file_id, event.changed_fields) for event in events] == [("update", duplicated.id, ["custom_tags"])]
+    assert "uq_tags_file_id_key" in db.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = 'tags'")).scalars().all()
@@ -0,0 +1,47 @@
+# tests/test_exports.py
+import csv
+import json
+import os
+
+import pytest
+
+from filemeta import exports
+from filemeta.exports import _tag_value_and_type, import_export_file
+from filemeta.models import convert_tag_value
+
+# Exported tags are typed JSON; importing them must restore the same typed value
+
+@pytest.mark.parametrize("value", ["007", "true", "None", "1.5", "text", 7, 0, 1.5, True, False, None])
+def test_imported_tag_values_round_trip(value):
+    stored_value, value_type = _tag_value_and_type(value)
+    restored = convert_tag_value(stored_value, value_type)
+    assert restored == value
+    assert type(restored) is type(value)
+
+def _write_ndjson_export(path, count):
+    with open(path, 'w', encoding='utf-8') as f:
+        for file_id in range(1, count + 1):
+            f.write(json.dumps({"ID": file_id, "Filename": f"{file_id}.txt", "Filepath": f"/srv/import/{file_id}.txt",
+                                "Owner": "alice", "Inferred Tags": {"file_size": file_id}, "Custom Tags": {}}) + "\n")
+
+def test_resumed_import_does_not_repeat_id_map_rows(db, tmp_path, monkeypatch):
+    input_path, checkpoint_path, id_map_path = tmp_path / "export.ndjson", tmp_path / "checkpoint", tmp_path / "ids.csv"
+    _write_ndjson_export(input_path, 5)
+    write_checkpoint = exports._write_checkpoint
+
+    def stop_after_first_checkpoint(*args):
+        if os.path.exists(checkpoint_path):
+            raise KeyboardInterrupt # The second batch is committed and mapped, but not checkpointed
+        write_checkpoint(*args)
+
+    monkeypatch.setattr(exports, "_write_checkpoint", stop_after_first_checkpoint)
+    with pytest.raises(KeyboardInterrupt):
+        import_export_file(db, str(input_path), batch_size=2, checkpoint_path=str(checkpoint_path), id_map_path=str(id_map_path))
+    monkeypatch.setattr(exports, "_write_checkpoint", write_checkpoint)
+
+    totals = import_export_file(db, str(input_path), batch_size=2, checkpoint_path=str(checkpoint_path), id_map_path=str(id_map_path))
+    assert (totals['resumed_from'], totals['imported'], totals['skipped']) == (2, 1, 2)
+    with open(id_map_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['old_id', 'new_id']
+    assert [old_id for old_id, _ in rows[1:]] == ["1", "2", "3", "4", "5"]
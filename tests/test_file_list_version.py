@@ -0,0 +1,18 @@
+# tests/test_file_list_version.py
+from filemeta.metadata_manager import (
+    add_file_metadata, delete_file_metadata, get_file_list_version, record_file_rename, update_file_tags
+)
+
+# The list ETag is built from get_file_list_version(); every kind of file write must move it
+
+def test_every_file_write_moves_the_list_version(db):
+    versions = [get_file_list_version(db)]
+    file_record = add_file_metadata(db, "/srv/listversion/a.txt", {"stage": "draft"}, inferred_data={"os_owner": "tester"})
+    versions.append(get_file_list_version(db))
+    update_file_tags(db, file_record.id, {"stage": "final"})
+    versions.append(get_file_list_version(db))
+    record_file_rename(db, file_record.id, "/srv/listversion/b.txt")
+    versions.append(get_file_list_version(db))
+    delete_file_metadata(db, file_record.id)
+    versions.append(get_file_list_version(db))
+    assert versions == sorted(set(versions))
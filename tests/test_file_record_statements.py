@@ -0,0 +1,44 @@
+# tests/test_file_record_statements.py
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from filemeta import metadata_manager
+from filemeta.models import FILE_FIELDS, SavedSearch
+from filemeta.metadata_manager import _file_records_statement, find_files_by_name, list_saved_search_files
+
+# Record statements are built from the requested fields only; every single-field
+# projection must still select FROM files. 'custom_tags' alone is a correlated
+# subquery and used to leave files out of the FROM clause.
+
+def _compile(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+@pytest.mark.parametrize("field", list(FILE_FIELDS))
+@pytest.mark.parametrize("criteria", [None, {"keywords": ["report"]}])
+def test_file_records_statement_selects_from_files(field, criteria):
+    statement, _ = _file_records_statement(None, [field], criteria)
+    sql = _compile(statement)
+    assert "\nFROM files" in sql
+
+class _RecordingSession:
+    """Stands in for a Session: records executed statements and returns no rows."""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        return []
+
+@pytest.mark.parametrize("field", list(FILE_FIELDS))
+def test_find_files_by_name_selects_from_files(field):
+    db = _RecordingSession()
+    find_files_by_name(db, "report", fields=[field])
+    assert "\nFROM files JOIN" in _compile(db.statements[-1])
+
+@pytest.mark.parametrize("field", list(FILE_FIELDS))
+def test_list_saved_search_files_selects_from_files(field, monkeypatch):
+    monkeypatch.setattr(metadata_manager, "get_saved_search", lambda db, name: SavedSearch(id=1, name=name))
+    db = _RecordingSession()
+    list_saved_search_files(db, "reports", fields=[field])
+    assert "\nFROM files JOIN saved_search_members" in _compile(db.statements[-1])
@@ -0,0 +1,91 @@
+# tests/test_io_executor.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from filemeta import io_executor
+from filemeta.io_executor import FilesystemBusyError, FilesystemTimeoutError, fs_io_metrics, run_fs, run_fs_batched
+
+# A hung filesystem call is simulated by a function blocked on an Event
+
+@pytest.fixture(autouse=True)
+def fresh_executor():
+    yield
+    io_executor.shutdown_fs_executor()
+
+def _blocked_call(release: threading.Event, result="done"):
+    def call():
+        release.wait(5)
+        return result
+    return call
+
+def _wait_for_pending(count: int):
+    deadline = time.monotonic() + 5
+    while fs_io_metrics()['pending'] != count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert fs_io_metrics()['pending'] == count
+
+def test_timeout_raises_and_the_call_stays_pending_until_it_returns():
+    release = threading.Event()
+
+    async def run():
+        with pytest.raises(FilesystemTimeoutError):
+            await run_fs('test_timeout', _blocked_call(release), timeout=0.05)
+
+    asyncio.run(run())
+    assert fs_io_metrics()['operations']['test_timeout']['timeouts'] == 1
+    assert fs_io_metrics()['pending'] == 1 # Still holds its worker
+    release.set()
+    _wait_for_pending(0)
+
+def test_busy_when_max_pending_calls_are_outstanding(monkeypatch):
+    monkeypatch.setattr(io_executor, "FS_IO_MAX_PENDING", 1)
+    release = threading.Event()
+    rejected_before = fs_io_metrics()['rejected']
+
+    async def run():
+        hung = asyncio.ensure_future(run_fs('test_busy', _blocked_call(release)))
+        await asyncio.sleep(0.01)
+        with pytest.raises(FilesystemBusyError):
+            await run_fs('test_busy', lambda: "never runs")
+        release.set()
+        assert await hung == "done"
+
+    asyncio.run(run())
+    assert fs_io_metrics()['rejected'] == rejected_before + 1
+    _wait_for_pending(0)
+
+def test_wait_for_completion_ignores_the_timeout(monkeypatch):
+    # A rename must not be abandoned while it may still succeed
+    monkeypatch.setattr(io_executor, "FS_IO_TIMEOUT_SECONDS", 0.01)
+
+    def slow_rename():
+        time.sleep(0.1)
+        return "/srv/renamed.txt"
+
+    async def run():
+        with pytest.raises(FilesystemTimeoutError):
+            await run_fs('test_slow', slow_rename)
+        return await run_fs('test_slow', slow_rename, wait_for_completion=True)
+
+    assert asyncio.run(run()) == "/srv/renamed.txt"
+    assert fs_io_metrics()['operations']['test_slow']['timeouts'] == 1
+
+def test_exceptions_propagate_unchanged_and_are_counted():
+    def missing():
+        raise FileNotFoundError("/srv/missing.txt")
+
+    async def run():
+        with pytest.raises(FileNotFoundError):
+            await run_fs('test_error', missing)
+
+    asyncio.run(run())
+    _wait_for_pending(0)
+    assert fs_io_metrics()['operations']['test_error']['errors'] == 1
+
+def test_batched_calls_keep_the_order_of_the_items():
+    items = list(range(25))
+    results = asyncio.run(run_fs_batched('test_batched', lambda batch: [item * 2 for item in batch], items, batch_size=4))
+    assert results == [item * 2 for item in items]
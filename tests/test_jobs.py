@@ -0,0 +1,123 @@
+# tests/test_jobs.py
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from filemeta import jobs
+from filemeta.jobs import (
+    JOB_MAX_ATTEMPTS, JobClaimLost, JobContext, claim_next_job, requeue_stale_jobs, run_job, send_heartbeats, submit_job
+)
+from filemeta.metadata_manager import add_file_metadata
+from filemeta.models import Job
+
+# Job progress, heartbeats and outcomes are written through jobs.get_db(); here it hands
+# out the test's session, so every write stays inside the test's transaction.
+
+@pytest.fixture
+def job_db(db, monkeypatch):
+    @contextmanager
+    def test_session():
+        yield db
+    monkeypatch.setattr(jobs, "get_db", test_session)
+    # Leave only this test's jobs in the queue
+    db.execute(update(Job).where(Job.status == 'queued').values(status='cancelled'))
+    db.commit()
+    return db
+
+def _tag_job(db) -> Job:
+    record = add_file_metadata(db, "/srv/jobs/report.txt", {"project": "jobs"},
+                               inferred_data={"os_owner": "alice", "file_size": 10, "mime_type": "text/plain"})
+    return submit_job(db, 'tag', {'ids': [record.id], 'tags_to_add_modify': {"status": "done"}})
+
+def _make_stale(db, job: Job):
+    job.heartbeat_at = datetime.now() - timedelta(seconds=jobs.JOB_STALE_SECONDS + 60)
+    db.commit()
+
+def _claim_again_elsewhere(db, job: Job) -> Job:
+    """Simulates a worker that stopped heartbeating while its job was taken over."""
+    _make_stale(db, job)
+    assert requeue_stale_jobs(db) == 1
+    return claim_next_job(db, "worker-b")
+
+def test_claim_marks_the_oldest_queued_job_running(job_db):
+    job = _tag_job(job_db)
+    claimed = claim_next_job(job_db, "worker-a")
+    assert claimed.id == job.id
+    assert (claimed.status, claimed.worker, claimed.attempts) == ('running', "worker-a", 1)
+    assert claim_next_job(job_db, "worker-b") is None
+
+def test_progress_from_a_superseded_claim_is_rejected(job_db):
+    job = _tag_job(job_db)
+    claim_next_job(job_db, "worker-a")
+    stale_context = JobContext(job.id, "worker-a", 1)
+    stale_context.progress(0, total=1, message="Tagging files")
+
+    reclaimed = _claim_again_elsewhere(job_db, job)
+    assert (reclaimed.worker, reclaimed.attempts) == ("worker-b", 2)
+    with pytest.raises(JobClaimLost):
+        stale_context.progress(1, message="Still tagging")
+    job_db.refresh(reclaimed)
+    assert reclaimed.message != "Still tagging"
+
+def test_run_job_does_not_record_the_outcome_of_a_lost_claim(job_db):
+    job = _tag_job(job_db)
+    claim_next_job(job_db, "worker-a")
+    _claim_again_elsewhere(job_db, job)
+
+    assert run_job(job.id, "worker-a", 1) == 'lost'
+    job_db.refresh(job)
+    assert (job.status, job.worker, job.finished_at) == ('running', "worker-b", None)
+
+    assert run_job(job.id, "worker-b", 2) == 'succeeded'
+    job_db.refresh(job)
+    assert job.status == 'succeeded'
+    assert job.result['tags_added'] == 1
+
+def test_stale_jobs_fail_after_the_last_attempt(job_db):
+    job = _tag_job(job_db)
+    claim_next_job(job_db, "worker-a")
+    job.attempts = JOB_MAX_ATTEMPTS
+    _make_stale(job_db, job)
+
+    assert requeue_stale_jobs(job_db) == 1
+    job_db.refresh(job)
+    assert job.status == 'failed'
+    assert "stopped responding" in job.error
+
+def test_heartbeats_survive_database_errors_and_skip_jobs_claimed_elsewhere(job_db, monkeypatch, capsys):
+    own_job = _tag_job(job_db)
+    claim_next_job(job_db, "worker-a")
+    other_job = submit_job(job_db, 'ingest', {'directory': "/srv/jobs"})
+    claim_next_job(job_db, "worker-b")
+    _make_stale(job_db, own_job)
+    _make_stale(job_db, other_job)
+    stale_heartbeat = own_job.heartbeat_at
+
+    stop_event = threading.Event()
+    calls = []
+
+    @contextmanager
+    def flaky_session():
+        calls.append(None)
+        if len(calls) == 1:
+            raise ConnectionError("server closed the connection unexpectedly")
+        yield job_db
+        stop_event.set()
+
+    monkeypatch.setattr(jobs, "get_db", flaky_session)
+    # worker-a still believes it runs other_job, whose claim worker-b has taken over
+    heartbeat_thread = threading.Thread(
+        target=send_heartbeats, args=("worker-a", lambda: [own_job.id, other_job.id], stop_event, 0.01))
+    heartbeat_thread.start()
+    heartbeat_thread.join(5)
+    assert not heartbeat_thread.is_alive()
+
+    assert len(calls) == 2
+    assert "Could not send heartbeats" in capsys.readouterr().err
+    job_db.refresh(own_job)
+    job_db.refresh(other_job)
+    assert own_job.heartbeat_at > stale_heartbeat
+    assert other_job.heartbeat_at < stale_heartbeat + timedelta(seconds=1)
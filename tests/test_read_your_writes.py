@@ -0,0 +1,28 @@
+# tests/test_read_your_writes.py
+import time
+
+from dependencies import sign_primary_until, verify_primary_until
+from filemeta import database
+
+# A client's reads stay on the primary after it writes: in the process that served the
+# write from memory, elsewhere from the signed marker the client sends back.
+
+def test_marker_round_trips_for_its_user():
+    until = time.time() + 10
+    marker = sign_primary_until("alice", until)
+    assert abs(verify_primary_until("alice", marker) - until) < 0.001
+
+def test_marker_is_rejected_for_another_user_or_when_altered():
+    marker = sign_primary_until("alice", time.time() + 10)
+    until, _, signature = marker.rpartition(".")
+    assert verify_primary_until("bob", marker) is None
+    assert verify_primary_until("alice", f"{float(until) + 3600:.3f}.{signature}") is None
+    assert verify_primary_until("alice", "not-a-marker") is None
+    assert verify_primary_until("alice", None) is None
+
+def test_recent_write_keeps_reads_on_primary_without_a_lookup():
+    assert not database._wrote_recently("carol")
+    assert database._wrote_recently("carol", time.time() + 5)
+    assert not database._wrote_recently("carol", time.time() - 1)
+    database.mark_client_write("carol", 5)
+    assert database._wrote_recently("carol")
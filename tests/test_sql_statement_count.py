@@ -0,0 +1,48 @@
+# tests/test_sql_statement_count.py
+from sqlalchemy.orm import Session
+
+from filemeta.database import count_statements
+from filemeta.metadata_manager import (
+    add_file_metadata, get_file_metadata, get_file_record, list_file_records, list_files,
+    search_file_records, search_files_by_criteria
+)
+
+# List, search and get must issue a fixed number of SQL statements however many files
+# (and tags) they return, i.e. no per-file queries.
+
+def _add_files(db: Session, start: int, count: int):
+    for i in range(start, start + count):
+        add_file_metadata(
+            db, f"/srv/sqlcount/dir{i}/report{i}.txt", {"project": "sqlcount", "index": i},
+            inferred_data={"os_owner": "tester", "file_size": 1024 + i}
+        )
+
+def _statement_counts(db: Session, file_id: int):
+    counts = {}
+    operations = {
+        'list_files': lambda: [f.to_dict() for f in list_files(db)],
+        'search_files_by_criteria': lambda: [f.to_dict() for f in search_files_by_criteria(db, keywords=["sqlcount"])],
+        'get_file_metadata': lambda: get_file_metadata(db, file_id).to_dict(),
+        'list_file_records': lambda: [r.to_dict() for r in list_file_records(db)],
+        'search_file_records': lambda: [r.to_dict() for r in search_file_records(db, keywords=["sqlcount"])],
+        'get_file_record': lambda: get_file_record(db, file_id).to_dict(),
+    }
+    for name, operation in operations.items():
+        db.expire_all() # Every call loads from the database, not from the identity map
+        with count_statements() as counter:
+            operation()
+        counts[name] = counter.count
+    return counts
+
+def test_read_paths_issue_constant_number_of_statements(db):
+    existing = len(list_file_records(db))
+    _add_files(db, 0, 2)
+    file_id = list_file_records(db)[0].id
+    few = _statement_counts(db, file_id)
+
+    _add_files(db, 2, 25)
+    assert len(list_file_records(db)) == existing + 27
+    many = _statement_counts(db, file_id)
+
+    assert many == few
+    assert all(count <= 2 for count in many.values()), many
@@ -0,0 +1,40 @@
+# tests/test_storage_rollups.py
+from filemeta.models import StorageRollup
+from filemeta.metadata_manager import (
+    add_file_metadata, delete_file_metadata, rebuild_storage_rollups, record_file_rename, update_file_tags
+)
+
+# Every file write adjusts storage_rollups in its own transaction; afterwards the rollups
+# must equal what a rebuild from the files table computes.
+
+def _rollups(db):
+    db.expire_all()
+    return {
+        (rollup.dimension, rollup.key): (rollup.parent, rollup.file_count, rollup.total_bytes)
+        for rollup in db.query(StorageRollup)
+    }
+
+def _add_file(db, filepath, owner, file_size, mime_type):
+    return add_file_metadata(
+        db, filepath, {"project": "rollups"},
+        inferred_data={"os_owner": owner, "file_size": file_size, "mime_type": mime_type}
+    )
+
+def test_file_writes_keep_rollups_equal_to_a_rebuild(db):
+    rebuild_storage_rollups(db) # Start from consistent rollups whatever the database holds
+
+    one = _add_file(db, "/srv/rollups/a/one.txt", "alice", 100, "text/plain")
+    two = _add_file(db, "/srv/rollups/a/b/two.pdf", "bob", 250, "application/pdf")
+    three = _add_file(db, "/srv/rollups/c/three.txt", "alice", 40, "text/plain")
+    update_file_tags(db, one.id, {"status": "moved"}, new_filepath="/srv/rollups/c/one.txt", verify_new_filepath=False)
+    update_file_tags(db, two.id, {"status": "final"})
+    record_file_rename(db, two.id, "/srv/rollups/a/b/renamed.pdf")
+    delete_file_metadata(db, three.id)
+
+    maintained = _rollups(db)
+    assert maintained[('directory', '/srv/rollups/a')] == ('/srv/rollups', 1, 250)
+    assert maintained[('directory', '/srv/rollups/c')] == ('/srv/rollups', 1, 100)
+    assert maintained[('directory', '/srv/rollups')] == ('/srv', 2, 350)
+
+    rebuild_storage_rollups(db)
+    assert _rollups(db) == maintained
@@ -0,0 +1,114 @@
+# tests/test_token_cache.py
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+import auth
+from auth import SECRET_KEY, ALGORITHM, VerifiedTokenCache, create_access_token, revoke_access_token, verify_token
+from filemeta.models import RevokedToken
+from filemeta.tokens import revoke_token
+
+# Each test verifies tokens through a fresh process-wide cache.
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    cache = VerifiedTokenCache(max_size=2)
+    monkeypatch.setattr(auth, "token_cache", cache)
+    return cache
+
+def _token(username="alice", minutes=5) -> str:
+    return create_access_token({"sub": username, "role": "user"}, expires_delta=timedelta(minutes=minutes))
+
+def _claims(token: str):
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+def _assert_rejected(token: str):
+    with pytest.raises(HTTPException) as rejected:
+        verify_token(token)
+    assert rejected.value.status_code == 401
+
+def test_verified_tokens_are_cached_until_evicted(fresh_cache):
+    first, second, third = _token("alice"), _token("bob"), _token("carol")
+    assert verify_token(first).username == "alice"
+    assert verify_token(first).username == "alice"
+    verify_token(second)
+    verify_token(third) # Evicts the least recently used: first
+    metrics = fresh_cache.metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["evictions"], metrics["size"]) == (1, 3, 1, 2)
+    assert fresh_cache.get(first) is None
+
+def test_expired_entries_are_dropped(fresh_cache):
+    token = _token()
+    verify_token(token)
+    fresh_cache.entries[token].expires = time.time() - 1
+    assert fresh_cache.get(token) is None
+    assert not fresh_cache.entries and not fresh_cache.tokens_by_jti
+
+def test_revocation_drops_the_cached_entry(fresh_cache):
+    token = _token()
+    verify_token(token)
+    claims = _claims(token)
+    fresh_cache.add_revocations({claims["jti"]: float(claims["exp"])})
+    assert fresh_cache.get(token) is None
+    _assert_rejected(token)
+    assert not fresh_cache.entries # A revoked token is not cached again
+
+def test_expired_revocations_are_forgotten(fresh_cache):
+    fresh_cache.add_revocations({"old": time.time() - 1})
+    fresh_cache.add_revocations({"new": time.time() + 60})
+    assert set(fresh_cache.revoked) == {"new"}
+
+def test_revoking_takes_effect_at_once_in_this_process(db):
+    token = _token()
+    verify_token(token)
+    revoke_access_token(db, token)
+    _assert_rejected(token)
+    assert db.get(RevokedToken, _claims(token)["jti"]).username == "alice"
+    revoke_access_token(db, _token()) # Other tokens stay valid
+
+def _use_session(monkeypatch, db):
+    @asynccontextmanager
+    async def test_session():
+        yield db
+    monkeypatch.setattr(auth, "get_async_db", test_session)
+
+def test_revocations_from_other_processes_are_picked_up_on_refresh(async_db, fresh_cache, monkeypatch):
+    fresh_cache.refresh_interval = 3600
+    token = _token()
+    claims = _claims(token)
+
+    async def revoke_elsewhere(db):
+        expires_at = datetime.fromtimestamp(claims["exp"], tz=timezone.utc)
+        await db.run_sync(revoke_token, claims["jti"], "alice", expires_at)
+
+    async def run():
+        async with async_db() as db:
+            _use_session(monkeypatch, db)
+            await fresh_cache.refresh_revocations()
+            verify_token(token)
+            await revoke_elsewhere(db)
+
+            await fresh_cache.refresh_revocations() # Within the refresh interval: not reloaded
+            verify_token(token)
+            fresh_cache.refreshed_at -= 3600
+            await fresh_cache.refresh_revocations()
+            _assert_rejected(token)
+
+    asyncio.run(run())
+
+def test_failed_refresh_keeps_the_previous_list(fresh_cache, monkeypatch, capsys):
+    @asynccontextmanager
+    async def unavailable():
+        raise ConnectionError("could not connect to server")
+        yield
+
+    monkeypatch.setattr(auth, "get_async_db", unavailable)
+    fresh_cache.add_revocations({"revoked": time.time() + 60})
+    asyncio.run(fresh_cache.refresh_revocations())
+    assert fresh_cache.is_revoked("revoked")
+    assert "Could not reload revoked tokens" in capsys.readouterr().err